@@ -41,6 +41,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'gestion.middleware.MetricasMiddleware',  # Primero: mide la petición completa (ver gestion/metricas.py)
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -48,6 +49,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'gestion.middleware.PerfiladorMiddleware',  # Último: perfila solo la vista (ver gestion/perfilador.py)
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -77,7 +79,38 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'CONN_MAX_AGE': 600,         # Segundos que se reutiliza la conexión entre peticiones (0 = una por petición)
+        'CONN_HEALTH_CHECKS': True,  # Comprueba la conexión reutilizada antes de la primera consulta de cada petición
+        'OPTIONS': {
+            # BEGIN IMMEDIATE: las transacciones toman el bloqueo de escritura al empezar y esperan
+            # busy_timeout, en lugar de fallar con "database is locked" al pasar de lectura a escritura
+            'transaction_mode': 'IMMEDIATE',
+        },
+    },
+    # Réplica para las vistas @solo_lectura (ver gestion/base_datos.py). Por defecto, el mismo archivo
+    # con una conexión de solo lectura; si apunta a otra copia, se refresca con manage.py sincronizar_replica
+    'lectura': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': 'PRAGMA query_only = ON',
+        },
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+DATABASE_ROUTERS = ['gestion.base_datos.EnrutadorLecturas']
+
+# Pragmas aplicados a cada conexión SQLite al abrirse (ver gestion/base_datos.py)
+SQLITE_PRAGMAS = {
+    'busy_timeout': 5000,      # ms esperando un bloqueo antes de "database is locked"
+    'journal_mode': 'WAL',     # Lectores y escritor no se bloquean entre sí (persistente en el archivo)
+    'synchronous': 'NORMAL',   # Con WAL no arriesga la integridad; solo las últimas transacciones ante un corte de luz
+    'cache_size': -20000,      # Caché de páginas por conexión en KiB (negativo) = ~20 MB
+    'mmap_size': 268435456,    # 256 MB del archivo leídos por mmap
+    'temp_store': 'MEMORY',    # Tablas temporales de ORDER BY / GROUP BY en memoria
 }
 
 
@@ -125,4 +158,71 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Redirecciones de Login/Logout
 LOGIN_REDIRECT_URL = 'dashboard'  # Nombre de la ruta a la que iremos al entrar
 LOGOUT_REDIRECT_URL = 'login'     # Nombre de la ruta al salir
-LOGIN_URL = 'login'               # Si intentan entrar sin permiso, van aquí
\ No newline at end of file
+LOGIN_URL = 'login'               # Si intentan entrar sin permiso, van aquí
+
+# Motor de Inferencia
+# 'python' usa el índice invertido; 'numpy' la matriz dispersa vectorizada (requiere NumPy instalado)
+INFERENCIA_BACKEND = 'python'
+INFERENCIA_METODO = 'coincidencia'  # 'coincidencia' o 'bayes' (aprendido del historial de diagnósticos)
+INFERENCIA_MAX_RESULTADOS = None  # Top-k de enfermedades a mostrar (None = todas las que coinciden)
+INFERENCIA_LOTE_MAX_CASOS = 1000  # Casos por petición en la API JSON por lotes
+INFERENCIA_CANDIDATOS_DISCRIMINAR = 10  # Candidatas entre las que se buscan pruebas que las distingan
+
+# Caché de rankings (LRU por proceso). ALIAS: nombre de un backend de CACHES compartido entre workers
+INFERENCIA_CACHE = {
+    'CAPACIDAD': 1024,
+    'TTL': 300,
+    'ALIAS': None,
+}
+
+# Paginación por cursor de los listados (historial de diagnósticos, pacientes)
+PAGINACION_TAM = 25       # Filas por página por defecto (?tam=N)
+PAGINACION_TAM_MAX = 100  # Máximo permitido para ?tam
+
+# Búsqueda de pacientes (índice FTS5 en SQLite)
+BUSQUEDA_PACIENTES_MAX = 50  # Resultados como máximo por búsqueda
+
+# Analítica de diagnósticos (gráficas sobre los resúmenes diarios)
+ANALITICA_DIAS = 30             # Rango por defecto cuando no se indica ?desde/?hasta
+ANALITICA_RANGO_MAX_DIAS = 731  # Rango máximo consultable en una petición
+
+# Exportación en streaming del historial de diagnósticos
+EXPORTACION_TAM_LOTE = 2000  # Diagnósticos por consulta (y por precarga de síntomas/pruebas/tratamientos)
+
+# Historial del paciente: fragmento HTML en caché (ver historial.py)
+HISTORIAL_CACHE_ALIAS = 'default'  # Backend de CACHES (en producción, uno compartido entre workers)
+HISTORIAL_CACHE_TTL = 3600         # Segundos; los cambios lo invalidan antes por señales
+
+# Métricas por vista expuestas en /metrics (formato Prometheus)
+METRICAS = {
+    'ACTIVAS': True,
+    'PRESUPUESTO_CONSULTAS': 50,  # Aviso en el log si una petición ejecuta más consultas (None = sin aviso)
+    'TOKEN': None,                # "Authorization: Bearer <TOKEN>" para el scraper; sin él, solo usuarios staff
+}
+
+# Perfilador de peticiones lentas (opcional). Resultados en /perfiles/ (solo staff)
+PERFILADOR = {
+    'ACTIVO': False,
+    'VISTAS': [],                # Nombres de URL a perfilar siempre, p. ej. ['motor_inferencia', 'lista_diagnosticos']
+    'FRACCION': 0.0,             # Fracción aleatoria del resto de peticiones (0.01 = una de cada cien)
+    'MODO': 'muestreo',          # 'muestreo' (pilas plegadas, sobrecarga mínima) o 'cprofile' (.prof, más costoso)
+    'INTERVALO': 0.005,          # Segundos entre muestras en modo 'muestreo'
+    'UMBRAL_SEGUNDOS': 0.0,      # Solo se guardan las peticiones que tarden al menos esto
+    'DIRECTORIO': BASE_DIR / 'perfiles',
+}
+
+# Importación masiva (manage.py importar_registros)
+IMPORTACION_TAM_LOTE = 5000  # Registros validados y escritos por transacción
+
+# Trabajos en segundo plano (cola en la tabla Trabajo, ejecutada por manage.py procesar_trabajos)
+TRABAJOS = {
+    'CONCURRENCIA': 2,           # Trabajos simultáneos por trabajador (--concurrencia)
+    'MODO': 'hilos',             # 'hilos' o 'procesos' (--modo)
+    'INTERVALO': 1.0,            # Segundos entre consultas a la cola cuando está vacía
+    'MAX_INTENTOS': 3,           # Por defecto para las tareas que no indican otro
+    'ESPERA_BASE': 10,           # Segundos antes del primer reintento; se duplica en cada uno
+    'ESPERA_MAX': 600,           # Tope de la espera entre reintentos
+    'ABANDONO': 300,             # Segundos sin latido tras los que un trabajo en curso vuelve a la cola
+    'AVANCE_SEGUNDOS': 1.0,      # Frecuencia máxima con la que se guarda el avance de una tarea
+    'DIRECTORIO': BASE_DIR / 'trabajos',  # Archivos generados (exportaciones)
+}
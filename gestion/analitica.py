@@ -0,0 +1,209 @@
+import datetime
+from collections import Counter, defaultdict
+
+from django.contrib.auth.models import User
+from django.db import connections, router, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Diagnostico, Enfermedad, ResumenDiarioDiagnostico, ResumenDiarioSintoma, Sintoma
+
+# ==========================================
+# ANALÍTICA DE DIAGNÓSTICOS (ROLLUPS)
+# Dos tablas pre-agregadas por día:
+#   ResumenDiarioDiagnostico -> diagnósticos por (día, enfermedad, médico)
+#   ResumenDiarioSintoma     -> síntomas presentados por (día, síntoma)
+# signals.py suma o resta cada alta, edición y baja, así que las gráficas
+# solo leen estas tablas (unas filas por día) y nunca el historial completo.
+# reconstruir() las recalcula desde cero (migración y comando reconstruir_analitica).
+# ==========================================
+
+SIN_ASIGNAR = 0  # id guardado cuando el diagnóstico no tiene enfermedad o médico
+PERIODOS = ('dia', 'semana')
+AGRUPACIONES = ('enfermedad', 'medico')
+
+
+def dia_de(fecha):
+    # Día local (TIME_ZONE) de un fecha_diagnostico, igual que TruncDate en SQL
+    return timezone.localdate(fecha) if timezone.is_aware(fecha) else fecha.date()
+
+
+def ajustar_diagnostico(dia, enfermedad_id, medico_id, delta):
+    if not delta:
+        return
+    clave = {
+        'fecha': dia,
+        'enfermedad_id': enfermedad_id or SIN_ASIGNAR,
+        'medico_id': medico_id or SIN_ASIGNAR,
+    }
+    # Igual que en bayes.py: garantizamos la fila y sumamos en SQL
+    ResumenDiarioDiagnostico.objects.bulk_create([ResumenDiarioDiagnostico(**clave)], ignore_conflicts=True)
+    ResumenDiarioDiagnostico.objects.filter(**clave).update(total=F('total') + delta)
+
+
+def _sumar_filas(modelo, columnas, filas):
+    """
+    filas: [(valores de las columnas clave..., delta), ...]. Un solo INSERT ... ON CONFLICT
+    DO UPDATE por lote (SQLite >= 3.24 y PostgreSQL): crea la fila o suma en SQL, sin
+    leerla antes y sin carreras con otras escrituras. columnas es la restricción única del modelo.
+    """
+    if not filas:
+        return
+    connection = connections[router.db_for_write(modelo)]
+    qn = connection.ops.quote_name
+    tabla = qn(modelo._meta.db_table)
+    clave = ', '.join(qn(c) for c in columnas)
+    sql = (
+        f'INSERT INTO {tabla} ({clave}, {qn("total")}) VALUES ({", ".join(["%s"] * (len(columnas) + 1))}) '
+        f'ON CONFLICT ({clave}) DO UPDATE SET {qn("total")} = {tabla}.{qn("total")} + excluded.{qn("total")}'
+    )
+    campos = [modelo._meta.get_field(c) for c in columnas]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [
+            [campo.get_db_prep_value(valor, connection) for campo, valor in zip(campos, fila)] + [fila[-1]]
+            for fila in filas
+        ])
+
+
+def ajustar_diagnosticos(conteos):
+    """Versión por lotes de ajustar_diagnostico (importaciones): {(dia, enfermedad_id, medico_id): delta}."""
+    filas = Counter()
+    for (dia, enfermedad_id, medico_id), delta in conteos.items():
+        filas[(dia, enfermedad_id or SIN_ASIGNAR, medico_id or SIN_ASIGNAR)] += delta
+    _sumar_filas(ResumenDiarioDiagnostico, ('fecha', 'enfermedad_id', 'medico_id'),
+                 [(*clave, delta) for clave, delta in filas.items() if delta])
+
+
+def pasar_a_sin_asignar(campo, valor):
+    """
+    Antes de borrar una enfermedad o un médico (campo 'enfermedad_id' o 'medico_id'):
+    SET_NULL deja sus diagnósticos sin él sin pasar por save() ni señales, así que
+    sus filas se suman aquí a las de SIN_ASIGNAR, donde las ajustarán las ediciones
+    y bajas posteriores. Solo toca las filas de ese id.
+    """
+    filas = ResumenDiarioDiagnostico.objects.filter(**{campo: valor})
+    for fecha, enfermedad_id, medico_id, total in list(filas.values_list('fecha', 'enfermedad_id', 'medico_id', 'total')):
+        if campo == 'enfermedad_id':
+            ajustar_diagnostico(fecha, SIN_ASIGNAR, medico_id, total)
+        else:
+            ajustar_diagnostico(fecha, enfermedad_id, SIN_ASIGNAR, total)
+    filas.delete()
+
+
+def descartar_sintoma(sintoma_id):
+    """
+    Antes de borrar un síntoma: sus filas de Diagnostico.sintomas_presentados se borran en
+    cascada sin m2m_changed y reconstruir() ya no las contaría; se quitan sus resúmenes.
+    """
+    ResumenDiarioSintoma.objects.filter(sintoma_id=sintoma_id).delete()
+
+
+def ajustar_sintomas(pares, delta):
+    # pares: [(dia, sintoma_id), ...]; un mismo par puede repetirse
+    if not pares or not delta:
+        return
+    _sumar_filas(ResumenDiarioSintoma, ('fecha', 'sintoma_id'),
+                 [(dia, sintoma_id, veces * delta) for (dia, sintoma_id), veces in Counter(pares).items()])
+
+
+def reconstruir():
+    """Recalcula ambas tablas con dos GROUP BY sobre el historial (solo para carga inicial o reparación)."""
+    with transaction.atomic():
+        ResumenDiarioDiagnostico.objects.all().delete()
+        ResumenDiarioSintoma.objects.all().delete()
+
+        por_diagnostico = (
+            Diagnostico.objects.annotate(dia=TruncDate('fecha_diagnostico'))
+            .values_list('dia', 'enfermedad_diagnosticada_id', 'medico_id').annotate(n=Count('id'))
+        )
+        ResumenDiarioDiagnostico.objects.bulk_create([
+            ResumenDiarioDiagnostico(fecha=dia, enfermedad_id=e or SIN_ASIGNAR, medico_id=m or SIN_ASIGNAR, total=n)
+            for dia, e, m, n in por_diagnostico.order_by()
+        ], batch_size=1000)
+
+        SintomaPresentado = Diagnostico.sintomas_presentados.through
+        por_sintoma = (
+            SintomaPresentado.objects.annotate(dia=TruncDate('diagnostico__fecha_diagnostico'))
+            .values_list('dia', 'sintoma_id').annotate(n=Count('id'))
+        )
+        ResumenDiarioSintoma.objects.bulk_create([
+            ResumenDiarioSintoma(fecha=dia, sintoma_id=s, total=n) for dia, s, n in por_sintoma.order_by()
+        ], batch_size=1000)
+
+
+# ==========================================
+# LECTURA (solo tablas de rollup)
+# ==========================================
+
+def rango_por_defecto(dias=30):
+    hasta = timezone.localdate()
+    return hasta - datetime.timedelta(days=dias - 1), hasta
+
+
+def _inicio_periodo(dia, periodo):
+    # Las semanas empiezan en lunes
+    return dia - datetime.timedelta(days=dia.weekday()) if periodo == 'semana' else dia
+
+
+def _periodos(desde, hasta, periodo):
+    paso = datetime.timedelta(days=7 if periodo == 'semana' else 1)
+    actual, periodos = _inicio_periodo(desde, periodo), []
+    while actual <= hasta:
+        periodos.append(actual)
+        actual += paso
+    return periodos
+
+
+def _nombres(agrupar, ids):
+    if agrupar == 'enfermedad':
+        nombres = dict(Enfermedad.objects.filter(pk__in=ids).values_list('id', 'nombre'))
+    else:
+        nombres = {
+            u.id: u.get_full_name() or u.username
+            for u in User.objects.filter(pk__in=ids).only('id', 'username', 'first_name', 'last_name')
+        }
+    nombres[SIN_ASIGNAR] = 'Sin enfermedad' if agrupar == 'enfermedad' else 'Sin médico'
+    return nombres
+
+
+def serie_diagnosticos(desde, hasta, agrupar='enfermedad', periodo='dia', top=10):
+    """
+    Diagnósticos por periodo para las `top` enfermedades (o médicos) con más casos en el rango.
+    Devuelve {'periodos': [fechas ISO], 'series': [{'id', 'nombre', 'total', 'valores'}, ...]}.
+    """
+    campo = 'enfermedad_id' if agrupar == 'enfermedad' else 'medico_id'
+    filas = (
+        ResumenDiarioDiagnostico.objects.filter(fecha__range=(desde, hasta), total__gt=0)
+        .values_list('fecha', campo).annotate(n=Sum('total')).order_by()
+    )
+    periodos = _periodos(desde, hasta, periodo)
+    posicion = {p: i for i, p in enumerate(periodos)}
+    valores, totales = defaultdict(lambda: [0] * len(periodos)), Counter()
+    for dia, clave, n in filas:
+        valores[clave][posicion[_inicio_periodo(dia, periodo)]] += n
+        totales[clave] += n
+
+    elegidos = [clave for clave, _ in totales.most_common(top)]
+    nombres = _nombres(agrupar, elegidos)
+    return {
+        'periodos': [p.isoformat() for p in periodos],
+        'series': [
+            {'id': clave, 'nombre': nombres.get(clave, f'#{clave} (eliminado)'),
+             'total': totales[clave], 'valores': valores[clave]}
+            for clave in elegidos
+        ],
+    }
+
+
+def sintomas_frecuentes(desde, hasta, top=10):
+    filas = (
+        ResumenDiarioSintoma.objects.filter(fecha__range=(desde, hasta), total__gt=0)
+        .values('sintoma_id').annotate(n=Sum('total')).order_by('-n', 'sintoma_id')[:top]
+    )
+    filas = list(filas)
+    nombres = dict(Sintoma.objects.filter(pk__in=[f['sintoma_id'] for f in filas]).values_list('id', 'nombre'))
+    return [
+        {'id': f['sintoma_id'], 'nombre': nombres.get(f['sintoma_id'], f"#{f['sintoma_id']} (eliminado)"), 'total': f['n']}
+        for f in filas
+    ]
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class GestionConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'gestion'
+
+    def ready(self):
+        # Registramos los receptores de señales (índice de inferencia, etc.)
+        from . import signals  # noqa: F401
+        # Receptores de connection_created (pragmas de SQLite, cronómetro de consultas):
+        # deben registrarse antes de que se abra la primera conexión
+        from . import base_datos, metricas  # noqa: F401
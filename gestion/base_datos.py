@@ -0,0 +1,113 @@
+import re
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# ==========================================
+# CAPA DE CONEXIÓN A SQLITE
+# - Pragmas (settings.SQLITE_PRAGMAS) al abrir cada conexión: WAL para que las
+#   lecturas no esperen a las escrituras, synchronous=NORMAL (seguro con WAL),
+#   caché de páginas, mmap y busy_timeout. Junto con CONN_MAX_AGE la conexión
+#   se abre y se configura una vez por hilo, no en cada petición.
+# - Réplica de lectura: las vistas con @solo_lectura leen del alias 'lectura'
+#   (EnrutadorLecturas, en DATABASE_ROUTERS). Por defecto es el mismo archivo
+#   con una conexión "PRAGMA query_only"; puede ser otra copia local que se
+#   refresca con manage.py sincronizar_replica. Las escrituras van siempre a
+#   'default', y sin alias 'lectura' todo se lee de 'default'.
+# Las vistas que guardan en caché lo que leen (detalle_paciente) no usan la
+# réplica: con una copia desfasada, el fragmento viejo quedaría en caché.
+# ==========================================
+
+ALIAS_LECTURA = 'lectura'
+
+_PRAGMA = re.compile(r'^\w+$')
+_VALOR = re.compile(r'^-?\w+$')
+
+
+@receiver(connection_created)
+def configurar_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    # Sobre la conexión de sqlite3 directamente: sin execute_wrappers ni registro de consultas
+    conexion = connection.connection
+    solo_lectura = conexion.execute('PRAGMA query_only').fetchone()[0]
+    for nombre, valor in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+        if not _PRAGMA.match(nombre) or not _VALOR.match(str(valor)):
+            raise ValueError(f'SQLITE_PRAGMAS: pragma inválido {nombre}={valor!r}')
+        if solo_lectura and nombre == 'journal_mode':
+            continue  # Se guarda en el archivo: lo fija la conexión de escritura
+        conexion.execute(f'PRAGMA {nombre} = {valor}')
+
+
+# ==========================================
+# RÉPLICA DE LECTURA
+# ==========================================
+
+_leyendo_replica = ContextVar('leyendo_replica', default=False)
+
+
+def solo_lectura(vista):
+    """Las consultas de la vista (síncrona o asíncrona) se leen de la réplica."""
+    if iscoroutinefunction(vista):
+        @wraps(vista)
+        async def envoltura_async(*args, **kwargs):
+            testigo = _leyendo_replica.set(True)
+            try:
+                return await vista(*args, **kwargs)
+            finally:
+                _leyendo_replica.reset(testigo)
+        return envoltura_async
+
+    @wraps(vista)
+    def envoltura(*args, **kwargs):
+        testigo = _leyendo_replica.set(True)
+        try:
+            return vista(*args, **kwargs)
+        finally:
+            _leyendo_replica.reset(testigo)
+    return envoltura
+
+
+def alias_sin_bloqueo():
+    """
+    Alias para leer lo último confirmado en 'default' dentro de una transacción sin tomar
+    el bloqueo de escritura ('default' abre sus transacciones con BEGIN IMMEDIATE):
+    'lectura' si abre el mismo archivo SQLite (query_only, BEGIN diferido; con WAL ve
+    una instantánea coherente sin frenar a los escritores). Si es otra copia, que puede
+    ir retrasada, o el motor no es SQLite, 'default'.
+    """
+    if ALIAS_LECTURA not in connections.settings:
+        return DEFAULT_DB_ALIAS
+    principal, replica = connections[DEFAULT_DB_ALIAS], connections[ALIAS_LECTURA]
+    if principal.vendor == replica.vendor == 'sqlite' and \
+            str(principal.settings_dict['NAME']) == str(replica.settings_dict['NAME']):
+        return ALIAS_LECTURA
+    return DEFAULT_DB_ALIAS
+
+
+class EnrutadorLecturas:
+    def db_for_read(self, model, **hints):
+        if _leyendo_replica.get() and ALIAS_LECTURA in settings.DATABASES:
+            return ALIAS_LECTURA
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Explícito: guardar un objeto leído de la réplica no debe intentar escribir en ella
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplica y principal contienen los mismos datos
+        if {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, ALIAS_LECTURA}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # El esquema de la réplica es el de 'default' (mismo archivo o copia completa)
+        if db == ALIAS_LECTURA:
+            return False
+        return None
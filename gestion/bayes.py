@@ -0,0 +1,120 @@
+import math
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from .inferencia import seleccionar_top
+from .models import ConteoEnfermedad, ConteoSintomaEnfermedad, Diagnostico
+
+# ==========================================
+# CLASIFICADOR NAIVE BAYES SOBRE EL HISTORIAL DE DIAGNÓSTICOS
+# Estima P(enfermedad | síntomas) con las tablas de conteo:
+#   ConteoEnfermedad         -> nº de diagnósticos por enfermedad (a priori)
+#   ConteoSintomaEnfermedad  -> nº de diagnósticos de la enfermedad con el síntoma
+# Las tablas se actualizan con cada Diagnóstico guardado, editado o borrado
+# (ver signals.py), así que puntuar solo lee conteos: la latencia no crece
+# con el tamaño del historial.
+# Diagnostico solo registra síntomas presentados, por eso los signos no puntúan aquí.
+# ==========================================
+
+def ajustar_prior(enfermedad_id, delta):
+    if enfermedad_id is None or not delta:
+        return
+    ConteoEnfermedad.objects.get_or_create(enfermedad_id=enfermedad_id)
+    ConteoEnfermedad.objects.filter(enfermedad_id=enfermedad_id).update(total=F('total') + delta)
+
+
+def ajustar_sintomas(enfermedad_id, ids_sintomas, delta):
+    ids_sintomas = list(ids_sintomas)
+    if enfermedad_id is None or not ids_sintomas or not delta:
+        return
+    # Primero garantizamos las filas y después sumamos en SQL: sin condiciones de carrera
+    ConteoSintomaEnfermedad.objects.bulk_create(
+        [ConteoSintomaEnfermedad(enfermedad_id=enfermedad_id, sintoma_id=s) for s in ids_sintomas],
+        ignore_conflicts=True,
+    )
+    ConteoSintomaEnfermedad.objects.filter(
+        enfermedad_id=enfermedad_id, sintoma_id__in=ids_sintomas
+    ).update(total=F('total') + delta)
+
+
+def ajustar_pares(pares, delta):
+    # pares: [(enfermedad_id, sintoma_id), ...], puede repetirse un mismo par.
+    # Agrupamos por (enfermedad, multiplicidad) para sumar cada par las veces que aparece.
+    grupos = {}
+    for (enfermedad_id, sintoma_id), veces in Counter(pares).items():
+        grupos.setdefault((enfermedad_id, veces), []).append(sintoma_id)
+    for (enfermedad_id, veces), ids_sintomas in grupos.items():
+        ajustar_sintomas(enfermedad_id, ids_sintomas, veces * delta)
+
+
+def sintomas_de(diagnostico_id):
+    return list(
+        Diagnostico.sintomas_presentados.through.objects
+        .filter(diagnostico_id=diagnostico_id).values_list('sintoma_id', flat=True)
+    )
+
+
+def reconstruir():
+    # Recalcula ambas tablas desde el historial recorriéndolo entero: solo para reparar los conteos
+    SintomaPresentado = Diagnostico.sintomas_presentados.through
+    with transaction.atomic():
+        ConteoEnfermedad.objects.all().delete()
+        ConteoSintomaEnfermedad.objects.all().delete()
+        priors = (
+            Diagnostico.objects.filter(enfermedad_diagnosticada__isnull=False)
+            .values_list('enfermedad_diagnosticada').annotate(n=Count('id')).order_by()
+        )
+        ConteoEnfermedad.objects.bulk_create(
+            [ConteoEnfermedad(enfermedad_id=e, total=n) for e, n in priors], batch_size=1000
+        )
+        pares = (
+            SintomaPresentado.objects.filter(diagnostico__enfermedad_diagnosticada__isnull=False)
+            .values_list('diagnostico__enfermedad_diagnosticada', 'sintoma').annotate(n=Count('id')).order_by()
+        )
+        ConteoSintomaEnfermedad.objects.bulk_create(
+            [ConteoSintomaEnfermedad(enfermedad_id=e, sintoma_id=s, total=n) for e, s, n in pares], batch_size=1000
+        )
+
+
+def rankear(ids_sintomas, limite=None, alfa=1.0):
+    """
+    Devuelve [(enfermedad_id, porcentaje, coincidencias, total_items), ...] como los
+    demás motores. porcentaje es la probabilidad a posteriori normalizada entre las
+    enfermedades con historial; coincidencias es cuántos de los síntomas consultados
+    se han visto alguna vez con la enfermedad, y total_items cuántos se consultaron.
+    """
+    ids_sintomas = set(ids_sintomas)
+    priors = dict(ConteoEnfermedad.objects.filter(total__gt=0).values_list('enfermedad_id', 'total'))
+    if not priors or not ids_sintomas:
+        return []
+
+    conteos = {}
+    for enfermedad_id, sintoma_id, total in ConteoSintomaEnfermedad.objects.filter(
+        sintoma_id__in=ids_sintomas, total__gt=0
+    ).values_list('enfermedad_id', 'sintoma_id', 'total'):
+        conteos.setdefault(enfermedad_id, {})[sintoma_id] = total
+
+    total_diagnosticos = sum(priors.values())
+    log_posteriores = {}
+    for enfermedad_id, n_enfermedad in priors.items():
+        vistos = conteos.get(enfermedad_id, {})
+        log_p = math.log(n_enfermedad / total_diagnosticos)
+        for sintoma_id in ids_sintomas:
+            # Suavizado de Laplace: un síntoma nunca visto no anula la probabilidad
+            log_p += math.log((vistos.get(sintoma_id, 0) + alfa) / (n_enfermedad + 2 * alfa))
+        log_posteriores[enfermedad_id] = log_p
+
+    # Normalización estable (log-sum-exp)
+    maximo = max(log_posteriores.values())
+    pesos = {e: math.exp(lp - maximo) for e, lp in log_posteriores.items()}
+    suma = sum(pesos.values())
+
+    ranking = []
+    for enfermedad_id, peso in pesos.items():
+        porcentaje = round(peso / suma * 100, 1)
+        if porcentaje > 0:
+            coincidencias = len(conteos.get(enfermedad_id, {}))
+            ranking.append((enfermedad_id, porcentaje, coincidencias, len(ids_sintomas)))
+    return seleccionar_top(ranking, limite)
@@ -0,0 +1,84 @@
+import re
+
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import Q
+
+from .models import Paciente
+
+# ==========================================
+# BÚSQUEDA DE PACIENTES
+# En SQLite se consulta el índice FTS5 gestion_paciente_fts (ver migración
+# 0009): cada palabra escrita se busca como prefijo, sin distinguir acentos
+# ni mayúsculas, y los resultados se ordenan por relevancia (bm25).
+# Nunca se recorre la tabla completa con icontains.
+# ==========================================
+
+# Peso de cada columna en bm25: coincidir en nombre/apellido pesa más que en email/teléfono
+PESOS = (10.0, 10.0, 2.0, 1.0)  # nombre, apellido, email, telefono
+
+# Por encima de este nº de coincidencias no se ordena por relevancia: bm25 tendría que
+# puntuar todas (una sola letra puede coincidir con cientos de miles de pacientes)
+MAX_CANDIDATOS_RANKING = 5000
+
+_PALABRA = re.compile(r'\w+')
+
+
+def expresion_fts(texto):
+    """
+    Convierte el texto del usuario en una consulta MATCH segura:
+    'José Pér' -> '"José"* "Pér"*' (todas las palabras, cada una como prefijo).
+    Las comillas evitan que operadores de FTS5 (OR, NEAR, -, ...) lleguen a la consulta.
+    Una sola letra se busca como palabra exacta: no hay índice de prefijos de 1 carácter.
+    """
+    return ' '.join(
+        f'"{palabra}"*' if len(palabra) > 1 else f'"{palabra}"'
+        for palabra in _PALABRA.findall(texto)
+    )
+
+
+def buscar_pacientes(texto, limite=None):
+    if limite is None:
+        limite = getattr(settings, 'BUSQUEDA_PACIENTES_MAX', 50)
+    expresion = expresion_fts(texto)
+    if not expresion:
+        return []
+
+    # Misma base de datos que el ORM (la réplica dentro de una vista @solo_lectura)
+    connection = connections[router.db_for_read(Paciente)]
+    if connection.vendor != 'sqlite':
+        # Sin FTS5: prefijo por palabra sobre nombre/apellido (puede usar índices, no recorre todo el texto)
+        filtro = Q()
+        for palabra in _PALABRA.findall(texto):
+            filtro &= Q(nombre__istartswith=palabra) | Q(apellido__istartswith=palabra)
+        return list(Paciente.objects.filter(filtro).order_by('apellido', 'nombre', 'id')[:limite])
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT rowid FROM gestion_paciente_fts WHERE gestion_paciente_fts MATCH %s LIMIT %s',
+            [expresion, MAX_CANDIDATOS_RANKING + 1],
+        )
+        candidatos = [fila[0] for fila in cursor.fetchall()]
+    if len(candidatos) > MAX_CANDIDATOS_RANKING:
+        # Búsqueda demasiado amplia: sin bm25, la primera página en orden alfabético. El orden y
+        # el límite van en SQL (un top-N sobre las coincidencias, sin traerlas a Python)
+        return list(Paciente.objects.raw(
+            """
+            SELECT p.* FROM gestion_paciente p
+            WHERE p.id IN (SELECT rowid FROM gestion_paciente_fts WHERE gestion_paciente_fts MATCH %s)
+            ORDER BY p.apellido, p.nombre, p.id
+            LIMIT %s
+            """,
+            [expresion, limite],
+        ))
+
+    return list(Paciente.objects.raw(
+        f"""
+        SELECT p.* FROM gestion_paciente_fts f
+        JOIN gestion_paciente p ON p.id = f.rowid
+        WHERE gestion_paciente_fts MATCH %s
+        ORDER BY bm25(gestion_paciente_fts, {', '.join(map(str, PESOS))}), p.id
+        LIMIT %s
+        """,
+        [expresion, limite],
+    ))
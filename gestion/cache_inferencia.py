@@ -0,0 +1,136 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+# ==========================================
+# MEMORIZACIÓN DE RANKINGS
+# Las combinaciones frecuentes (p. ej. fiebre + cefalea + fatiga) se calculan
+# una sola vez. La clave incluye la versión de la base de conocimiento, así que
+# una edición del catálogo nunca devuelve un ranking viejo: simplemente deja de
+# coincidir la clave. Configuración en settings.INFERENCIA_CACHE:
+#   CAPACIDAD: nº máximo de entradas del LRU local (0 desactiva la memorización)
+#   TTL:       segundos de vida de cada entrada
+#   ALIAS:     alias de settings.CACHES compartido entre procesos (opcional)
+# La configuración se lee en cada llamada (capacidad y TTL del LRU incluidos).
+# Aciertos, fallos y expulsiones de ambos niveles se publican en /metrics.
+# ==========================================
+
+_FALTA = object()
+
+
+class CacheLRU:
+    def __init__(self, capacidad, ttl):
+        self.capacidad = capacidad
+        self.ttl = ttl
+        self._datos = OrderedDict()  # clave -> (expira, valor)
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.expulsiones = 0
+
+    def obtener(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None or entrada[0] < time.monotonic():
+                if entrada is not None:
+                    del self._datos[clave]
+                self.fallos += 1
+                return _FALTA
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return entrada[1]
+
+    def guardar(self, clave, valor):
+        with self._lock:
+            self._datos[clave] = (time.monotonic() + self.ttl, valor)
+            self._datos.move_to_end(clave)
+            self._recortar()
+
+    def ajustar(self, capacidad, ttl):
+        # Aplica la configuración vigente; al reducir la capacidad se expulsan las más antiguas
+        if capacidad == self.capacidad and ttl == self.ttl:
+            return
+        with self._lock:
+            self.capacidad = capacidad
+            self.ttl = ttl
+            self._recortar()
+
+    def _recortar(self):
+        while len(self._datos) > self.capacidad:
+            self._datos.popitem(last=False)
+            self.expulsiones += 1
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'entradas': len(self._datos),
+                'capacidad': self.capacidad,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'expulsiones': self.expulsiones,
+            }
+
+
+def _configuracion():
+    config = getattr(settings, 'INFERENCIA_CACHE', {})
+    return config.get('CAPACIDAD', 1024), config.get('TTL', 300), config.get('ALIAS')
+
+
+_capacidad, _ttl, _ = _configuracion()
+cache_local = CacheLRU(_capacidad, _ttl)
+
+# Consultas a la caché compartida (ALIAS): solo se hacen tras un fallo del LRU local
+_compartida = {'aciertos': 0, 'fallos': 0}
+_lock_compartida = threading.Lock()
+
+
+def _contar_compartida(resultado):
+    with _lock_compartida:
+        _compartida[resultado] += 1
+
+
+def estadisticas():
+    """Contadores de ambos niveles (por proceso), para /metrics."""
+    with _lock_compartida:
+        compartida = dict(_compartida)
+    return {'local': cache_local.estadisticas(), 'compartida': compartida}
+
+
+def clave_canonica(version, ids_sintomas, ids_signos, limite):
+    # Mismo conjunto de síntomas/signos en cualquier orden -> misma clave
+    return (version, tuple(sorted(set(ids_sintomas))), tuple(sorted(set(ids_signos))), limite)
+
+
+def rankear(base, ids_sintomas, ids_signos, limite=None):
+    """Ranking de base.motor memorizado por (versión, síntomas, signos, límite)."""
+    capacidad, ttl, alias = _configuracion()
+    cache_local.ajustar(capacidad, ttl)
+    if not capacidad:
+        return base.motor.rankear(ids_sintomas, ids_signos, limite=limite)
+
+    clave = clave_canonica(base.version, ids_sintomas, ids_signos, limite)
+    ranking = cache_local.obtener(clave)
+    if ranking is not _FALTA:
+        return ranking
+
+    clave_compartida = None
+    if alias:
+        version, sintomas, signos, _ = clave
+        clave_compartida = 'inferencia:v{}:{}:{}:{}'.format(
+            version, ','.join(map(str, sintomas)), ','.join(map(str, signos)), limite
+        )
+        ranking = caches[alias].get(clave_compartida)
+        _contar_compartida('fallos' if ranking is None else 'aciertos')
+        if ranking is not None:
+            ranking = tuple(ranking)
+            cache_local.guardar(clave, ranking)
+            return ranking
+
+    ranking = tuple(base.motor.rankear(ids_sintomas, ids_signos, limite=limite))
+    cache_local.guardar(clave, ranking)
+    if clave_compartida:
+        caches[alias].set(clave_compartida, ranking, ttl)
+    return ranking
@@ -0,0 +1,258 @@
+import csv
+import json
+from typing import NamedTuple
+
+from django.db import transaction
+
+from .catalogos import normalizar
+from .conocimiento import invalidar_base_conocimiento, recontar_caracteristicas
+from .models import Enfermedad, PruebaLaboratorio, PruebaPosMortem, Signo, Sintoma
+
+try:
+    import yaml
+except ImportError:  # PyYAML es opcional: solo se necesita para archivos .yaml
+    yaml = None
+
+# ==========================================
+# CARGA DE LA BASE DE CONOCIMIENTO DESDE ARCHIVO (JSON / YAML / CSV)
+# En lugar de get_or_create + add() por cada nombre, se hace:
+#   1. una consulta por catálogo para resolver todos los nombres del archivo
+#   2. bulk_create de los nombres que faltan y de las enfermedades nuevas,
+#      bulk_update de las descripciones que cambian
+#   3. bulk_create(ignore_conflicts=True) de las filas intermedias
+#   4. un recuento de num_* y un único incremento de versión
+# La carga es aditiva: nunca borra enfermedades, catálogos ni relaciones.
+#
+# Formato JSON/YAML:
+#   {"sintomas": ["Tos", ...], "signos": [...], "pruebas": [...], "postmortem": [...],
+#    "enfermedades": [{"nombre": ..., "descripcion": ..., "sintomas": [...], "signos": [...],
+#                      "pruebas": [...], "postmortem": [...]}, ...]}
+# (los catálogos de primer nivel son opcionales; una lista sola = enfermedades).
+# CSV: una fila por enfermedad con las columnas nombre, descripcion, sintomas,
+# signos, pruebas, postmortem; las listas separadas por ';'.
+# Los nombres se comparan con catalogos.normalizar (sin acentos ni mayúsculas),
+# como en el importador y el typeahead: "tos seca" es el "Tos seca" que ya
+# existe. Dos escrituras equivalentes dentro del mismo archivo son un error.
+# ==========================================
+
+FORMATOS = ('json', 'yaml', 'csv')
+SEPARADOR_LISTA = ';'
+
+# Clave en el archivo -> (relación de Enfermedad, modelo del catálogo)
+RELACIONES = {
+    'sintomas': ('sintomas', Sintoma),
+    'signos': ('signos', Signo),
+    'pruebas': ('pruebas_lab', PruebaLaboratorio),
+    'postmortem': ('pruebas_postmortem', PruebaPosMortem),
+}
+
+
+class EnfermedadArchivo(NamedTuple):
+    nombre: str
+    descripcion: str
+    caracteristicas: dict  # clave de RELACIONES -> tuple de nombres
+
+
+class Cambios(NamedTuple):
+    catalogos_nuevos: dict       # clave de RELACIONES -> [nombres a crear]
+    enfermedades_nuevas: list    # nombres
+    descripciones: list          # nombres de enfermedades cuya descripción cambia
+    relaciones_nuevas: dict      # nombre de enfermedad -> {clave de RELACIONES: [nombres]}
+
+    @property
+    def vacio(self):
+        return not (any(self.catalogos_nuevos.values()) or self.enfermedades_nuevas
+                    or self.descripciones or self.relaciones_nuevas)
+
+
+# ==========================================
+# LECTURA DEL ARCHIVO
+# ==========================================
+
+def _nombres(valor, donde):
+    if isinstance(valor, str):
+        valor = valor.split(SEPARADOR_LISTA)
+    elif valor is not None and not isinstance(valor, (list, tuple)):
+        raise ValueError(f'{donde}: se esperaba una lista o un texto separado por "{SEPARADOR_LISTA}", '
+                         f'no {type(valor).__name__} ({valor!r}).')
+    nombres = []
+    for item in valor or []:
+        nombre = (item.get('nombre', '') if isinstance(item, dict) else str(item)).strip()
+        if nombre and nombre not in nombres:
+            nombres.append(nombre)
+    return tuple(nombres)
+
+
+def leer_archivo(ruta, formato=None):
+    """Devuelve (catalogos, enfermedades): {clave: (nombres,)} y [EnfermedadArchivo, ...]."""
+    formato = formato or ruta.rsplit('.', 1)[-1].lower().replace('yml', 'yaml')
+    if formato not in FORMATOS:
+        raise ValueError(f'Formato desconocido: {formato}.')
+    with open(ruta, encoding='utf-8', newline='') as archivo:
+        if formato == 'csv':
+            datos = {'enfermedades': list(csv.DictReader(archivo))}
+        elif formato == 'yaml':
+            if yaml is None:
+                raise ValueError('Leer archivos YAML requiere tener PyYAML instalado.')
+            datos = yaml.safe_load(archivo) or {}
+        else:
+            datos = json.load(archivo)
+    if isinstance(datos, list):
+        datos = {'enfermedades': datos}
+    return preparar_datos(datos)
+
+
+def _comprobar_equivalentes(catalogos, enfermedades):
+    # Dos escrituras del mismo nombre (tras normalizar) crearían filas casi duplicadas
+    for clave in RELACIONES:
+        escrituras = {}
+        for nombres in (catalogos[clave], *(e.caracteristicas[clave] for e in enfermedades)):
+            for nombre in nombres:
+                escrituras.setdefault(normalizar(nombre), {})[nombre] = None
+        choques = [' / '.join(f'"{n}"' for n in variantes) for variantes in escrituras.values() if len(variantes) > 1]
+        if choques:
+            raise ValueError(f'"{clave}": nombres que solo se diferencian en mayúsculas o acentos: {"; ".join(choques)}.')
+
+
+def preparar_datos(datos):
+    # Normaliza el diccionario leído (o construido en código, como en los seeds).
+    # Un archivo con otra forma (un escalar, una enfermedad que no es un objeto...)
+    # se rechaza con ValueError indicando la entrada, nunca con AttributeError/TypeError.
+    if not isinstance(datos, dict):
+        raise ValueError('El archivo debe contener un objeto con "enfermedades" o una lista de enfermedades, '
+                         f'no {type(datos).__name__} ({datos!r:.80}).')
+    catalogos = {clave: _nombres(datos.get(clave), f'"{clave}"') for clave in RELACIONES}
+    lista = datos.get('enfermedades') or []
+    if not isinstance(lista, (list, tuple)):
+        raise ValueError(f'"enfermedades" debe ser una lista, no {type(lista).__name__} ({lista!r:.80}).')
+    enfermedades, vistas = [], {}
+    for numero, fila in enumerate(lista, start=1):
+        if not isinstance(fila, dict):
+            raise ValueError(f'La enfermedad n.º {numero} debe ser un objeto con "nombre", '
+                             f'no {type(fila).__name__} ({fila!r:.80}).')
+        nombre = str(fila.get('nombre') or '').strip()
+        if not nombre:
+            raise ValueError(f'La enfermedad n.º {numero} no tiene nombre.')
+        anterior = vistas.get(normalizar(nombre))
+        if anterior == nombre:
+            raise ValueError(f'La enfermedad "{nombre}" aparece más de una vez.')
+        if anterior is not None:
+            raise ValueError(f'Las enfermedades "{anterior}" y "{nombre}" solo se diferencian en mayúsculas o acentos.')
+        vistas[normalizar(nombre)] = nombre
+        enfermedades.append(EnfermedadArchivo(
+            nombre, str(fila.get('descripcion') or '').strip(),
+            {clave: _nombres(fila.get(clave), f'"{clave}" de la enfermedad "{nombre}"') for clave in RELACIONES},
+        ))
+    _comprobar_equivalentes(catalogos, enfermedades)
+    return catalogos, enfermedades
+
+
+# ==========================================
+# DIFERENCIAS Y APLICACIÓN
+# ==========================================
+
+def _ids_por_nombre(modelo, nombres):
+    # {nombre del archivo: id} comparando con normalizar(); una consulta por catálogo (se lee
+    # entero, son tablas pequeñas). Si la base ya tiene nombres equivalentes se usa el id más bajo
+    por_clave = {}
+    for item_id, nombre in modelo.objects.order_by('-id').values_list('id', 'nombre'):
+        por_clave[normalizar(nombre)] = item_id
+    ids = {}
+    for nombre in nombres:
+        item_id = por_clave.get(normalizar(nombre))
+        if item_id is not None:
+            ids[nombre] = item_id
+    return ids
+
+
+def _nombres_por_catalogo(catalogos, enfermedades):
+    todos = {clave: dict.fromkeys(nombres) for clave, nombres in catalogos.items()}
+    for enfermedad in enfermedades:
+        for clave, nombres in enfermedad.caracteristicas.items():
+            todos[clave].update(dict.fromkeys(nombres))
+    return {clave: list(nombres) for clave, nombres in todos.items()}
+
+
+def _relaciones_existentes(ids_enfermedades):
+    # {(enfermedad_id, clave): {catalogo_id, ...}} con una consulta por relación
+    existentes = {}
+    for clave, (relacion, _) in RELACIONES.items():
+        intermedia = getattr(Enfermedad, relacion).through
+        columna = Enfermedad._meta.get_field(relacion).m2m_reverse_name()
+        for enfermedad_id, item_id in intermedia.objects.filter(
+            enfermedad_id__in=ids_enfermedades
+        ).values_list('enfermedad_id', columna):
+            existentes.setdefault((enfermedad_id, clave), set()).add(item_id)
+    return existentes
+
+
+def calcular_cambios(catalogos, enfermedades):
+    """Lo que cargar() cambiaría, sin escribir nada (modo --simular)."""
+    nombres = _nombres_por_catalogo(catalogos, enfermedades)
+    ids_catalogo = {clave: _ids_por_nombre(RELACIONES[clave][1], nombres[clave]) for clave in RELACIONES}
+    catalogos_nuevos = {
+        clave: [n for n in nombres[clave] if n not in ids_catalogo[clave]] for clave in RELACIONES
+    }
+
+    ids_actuales = _ids_por_nombre(Enfermedad, [e.nombre for e in enfermedades])
+    descripciones_actuales = dict(Enfermedad.objects.filter(pk__in=ids_actuales.values()).values_list('id', 'descripcion'))
+    actuales = {nombre: (enfermedad_id, descripciones_actuales[enfermedad_id]) for nombre, enfermedad_id in ids_actuales.items()}
+    existentes = _relaciones_existentes([enfermedad_id for enfermedad_id, _ in actuales.values()])
+
+    enfermedades_nuevas, descripciones, relaciones_nuevas = [], [], {}
+    for enfermedad in enfermedades:
+        if enfermedad.nombre not in actuales:
+            enfermedades_nuevas.append(enfermedad.nombre)
+            enfermedad_id = None
+        else:
+            enfermedad_id, descripcion = actuales[enfermedad.nombre]
+            if enfermedad.descripcion and enfermedad.descripcion != descripcion:
+                descripciones.append(enfermedad.nombre)
+        nuevas = {}
+        for clave, nombres_item in enfermedad.caracteristicas.items():
+            ya = existentes.get((enfermedad_id, clave), set())
+            faltan = [n for n in nombres_item if ids_catalogo[clave].get(n) not in ya]
+            if faltan:
+                nuevas[clave] = faltan
+        if nuevas:
+            relaciones_nuevas[enfermedad.nombre] = nuevas
+    return Cambios(catalogos_nuevos, enfermedades_nuevas, descripciones, relaciones_nuevas)
+
+
+def cargar(catalogos, enfermedades, simular=False, tam_lote=1000):
+    """Aplica el archivo en una transacción y devuelve los Cambios (con simular=True solo los calcula)."""
+    with transaction.atomic():
+        cambios = calcular_cambios(catalogos, enfermedades)
+        if simular or cambios.vacio:
+            return cambios
+
+        nombres = _nombres_por_catalogo(catalogos, enfermedades)
+        ids_catalogo = {}
+        for clave, (_, modelo) in RELACIONES.items():
+            modelo.objects.bulk_create([modelo(nombre=n) for n in cambios.catalogos_nuevos[clave]], batch_size=tam_lote)
+            ids_catalogo[clave] = _ids_por_nombre(modelo, nombres[clave])
+
+        por_nombre = {e.nombre: e for e in enfermedades}
+        Enfermedad.objects.bulk_create(
+            [Enfermedad(nombre=n, descripcion=por_nombre[n].descripcion) for n in cambios.enfermedades_nuevas],
+            batch_size=tam_lote,
+        )
+        ids_enfermedades = _ids_por_nombre(Enfermedad, list(por_nombre))
+        if cambios.descripciones:
+            Enfermedad.objects.bulk_update(
+                [Enfermedad(id=ids_enfermedades[n], descripcion=por_nombre[n].descripcion) for n in cambios.descripciones],
+                ['descripcion'], batch_size=tam_lote,
+            )
+
+        for clave, (relacion, _) in RELACIONES.items():
+            intermedia = getattr(Enfermedad, relacion).through
+            columna = Enfermedad._meta.get_field(relacion).m2m_reverse_name()
+            intermedia.objects.bulk_create([
+                intermedia(**{'enfermedad_id': ids_enfermedades[nombre], columna: ids_catalogo[clave][n]})
+                for nombre, nuevas in cambios.relaciones_nuevas.items() for n in nuevas.get(clave, ())
+            ], batch_size=tam_lote, ignore_conflicts=True)
+
+        # bulk_create no emite señales: recuento e invalidación explícitos
+        recontar_caracteristicas([ids_enfermedades[n] for n in cambios.relaciones_nuevas])
+        invalidar_base_conocimiento()
+    return cambios
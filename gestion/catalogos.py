@@ -0,0 +1,66 @@
+import bisect
+import re
+import unicodedata
+
+# ==========================================
+# BÚSQUEDA POR PREFIJO EN LOS CATÁLOGOS (typeahead)
+# Por cada catálogo (síntomas, signos, pruebas) se guarda un arreglo ordenado
+# de claves normalizadas; buscar "cab" es un bisect más un recorrido de los
+# k resultados, sin consultas. Se indexa el nombre completo y también desde
+# cada palabra, para que "cab" encuentre "Dolor de cabeza".
+# Los índices cuelgan del snapshot de la base de conocimiento (conocimiento.py),
+# así que se reconstruyen solos cuando cambia un catálogo.
+# ==========================================
+
+# Nombre del catálogo en la URL -> atributo de BaseConocimiento con {id: nombre}
+CATALOGOS = {
+    'sintomas': 'nombres_sintomas',
+    'signos': 'nombres_signos',
+    'pruebas_lab': 'nombres_pruebas_lab',
+    'pruebas_postmortem': 'nombres_pruebas_postmortem',
+}
+
+_INICIO_PALABRA = re.compile(r'\b\w')
+
+
+def normalizar(texto):
+    # Sin acentos y en minúsculas: "Cefalea Intensa" -> "cefalea intensa"
+    descompuesto = unicodedata.normalize('NFKD', texto)
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c)).casefold().strip()
+
+
+class IndicePrefijos:
+    def __init__(self, nombres):
+        self.nombres = nombres  # {id: nombre}
+        completos, palabras = [], []
+        for item_id, nombre in nombres.items():
+            clave = normalizar(nombre)
+            completos.append((clave, item_id))
+            for inicio in _INICIO_PALABRA.finditer(clave):
+                if inicio.start():
+                    palabras.append((clave[inicio.start():], item_id))
+        completos.sort()
+        palabras.sort()
+        self._completos = completos
+        self._palabras = palabras
+
+    @staticmethod
+    def _recorrer(entradas, prefijo):
+        posicion = bisect.bisect_left(entradas, (prefijo,))
+        while posicion < len(entradas) and entradas[posicion][0].startswith(prefijo):
+            yield entradas[posicion][1]
+            posicion += 1
+
+    def buscar(self, texto, limite=20):
+        """Primero los nombres que empiezan por el texto y después los que lo tienen al inicio de otra palabra."""
+        prefijo = normalizar(texto)
+        if not prefijo:
+            return []
+        vistos = []
+        for entradas in (self._completos, self._palabras):
+            for item_id in self._recorrer(entradas, prefijo):
+                if item_id not in vistos:
+                    vistos.append(item_id)
+                    if len(vistos) == limite:
+                        return [(i, self.nombres[i]) for i in vistos]
+        return [(i, self.nombres[i]) for i in vistos]
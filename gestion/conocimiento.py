@@ -0,0 +1,235 @@
+import threading
+from contextlib import contextmanager
+from typing import NamedTuple
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .base_datos import alias_sin_bloqueo
+from .catalogos import CATALOGOS, IndicePrefijos
+from .inferencia import construir_motor
+from .models import Enfermedad, Sintoma, Signo, PruebaLaboratorio, PruebaPosMortem, VersionConocimiento
+
+# ==========================================
+# BASE DE CONOCIMIENTO EN MEMORIA
+# Cada proceso guarda una copia inmutable (snapshot) de enfermedades y sus
+# características (con los nombres de catálogo necesarios para mostrar los
+# resultados), etiquetada con la versión de VersionConocimiento.
+# En cada consulta solo se lee esa fila; si la versión cambió (otro proceso
+# editó el catálogo), la copia se reconstruye de forma perezosa.
+# ==========================================
+
+class FichaEnfermedad(NamedTuple):
+    id: int
+    nombre: str
+    sintomas: frozenset
+    signos: frozenset
+    pruebas_lab: tuple         # ids de PruebaLaboratorio
+    pruebas_postmortem: tuple  # ids de PruebaPosMortem
+    total_items: int           # num_sintomas + num_signos (denominador del porcentaje)
+
+
+class ResultadoInferencia(NamedTuple):
+    # Registro compacto de una enfermedad del ranking, listo para plantillas y JSON
+    enfermedad_id: int
+    nombre: str
+    porcentaje: float
+    coincidencias: int
+    total_items: int
+    sintomas_coincidentes: tuple  # nombres
+    signos_coincidentes: tuple    # nombres
+    pruebas_lab: tuple            # nombres de las pruebas recomendadas
+
+
+class BaseConocimiento:
+    def __init__(self, version, fichas, nombres_sintomas, nombres_signos, nombres_pruebas_lab,
+                 nombres_pruebas_postmortem):
+        self.version = version
+        self.fichas = fichas                            # {enfermedad_id: FichaEnfermedad}
+        self.nombres_sintomas = nombres_sintomas        # {sintoma_id: nombre}
+        self.nombres_signos = nombres_signos            # {signo_id: nombre}
+        self.nombres_pruebas_lab = nombres_pruebas_lab  # {prueba_id: nombre}
+        self.nombres_pruebas_postmortem = nombres_pruebas_postmortem
+        self._motor = None
+        self._indices_catalogo = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def construir(cls):
+        # Lectura dentro de una transacción para que versión y datos sean coherentes. Es de solo
+        # lectura: con SQLite va por el alias 'lectura' (BEGIN diferido) para no retener el
+        # bloqueo de escritura de 'default' mientras se construye (ver base_datos.alias_sin_bloqueo)
+        alias = alias_sin_bloqueo()
+        with transaction.atomic(using=alias):
+            version = version_actual(alias)
+            enfermedades = list(Enfermedad.objects.using(alias).values_list('id', 'nombre', 'num_sintomas', 'num_signos'))
+            sintomas = _agrupar(Enfermedad.sintomas.through, 'sintoma_id', alias)
+            signos = _agrupar(Enfermedad.signos.through, 'signo_id', alias)
+            pruebas = _agrupar(Enfermedad.pruebas_lab.through, 'pruebalaboratorio_id', alias)
+            postmortem = _agrupar(Enfermedad.pruebas_postmortem.through, 'pruebaposmortem_id', alias)
+            nombres_sintomas = dict(Sintoma.objects.using(alias).values_list('id', 'nombre'))
+            nombres_signos = dict(Signo.objects.using(alias).values_list('id', 'nombre'))
+            nombres_pruebas = dict(PruebaLaboratorio.objects.using(alias).values_list('id', 'nombre'))
+            nombres_postmortem = dict(PruebaPosMortem.objects.using(alias).values_list('id', 'nombre'))
+
+        fichas = {
+            enfermedad_id: FichaEnfermedad(
+                enfermedad_id,
+                nombre,
+                frozenset(sintomas.get(enfermedad_id, ())),
+                frozenset(signos.get(enfermedad_id, ())),
+                tuple(sorted(pruebas.get(enfermedad_id, ()))),
+                tuple(sorted(postmortem.get(enfermedad_id, ()))),
+                num_sintomas + num_signos,
+            )
+            for enfermedad_id, nombre, num_sintomas, num_signos in enfermedades
+        }
+        return cls(version, fichas, nombres_sintomas, nombres_signos, nombres_pruebas, nombres_postmortem)
+
+    @property
+    def motor(self):
+        # El backend de ranking se construye una sola vez por snapshot
+        if self._motor is None:
+            with self._lock:
+                if self._motor is None:
+                    self._motor = construir_motor(self.fichas.values())
+        return self._motor
+
+    def indice_catalogo(self, catalogo):
+        # Índice de prefijos para el typeahead de un catálogo (ver catalogos.py), perezoso como el motor
+        indice = self._indices_catalogo.get(catalogo)
+        if indice is None:
+            with self._lock:
+                indice = self._indices_catalogo.get(catalogo)
+                if indice is None:
+                    indice = IndicePrefijos(getattr(self, CATALOGOS[catalogo]))
+                    self._indices_catalogo[catalogo] = indice
+        return indice
+
+    def resultados(self, ranking, ids_sintomas, ids_signos):
+        """
+        Convierte las filas (enfermedad_id, porcentaje, coincidencias, total_items)
+        del motor en ResultadoInferencia sin ninguna consulta a la base de datos.
+        """
+        ids_sintomas = set(ids_sintomas)
+        ids_signos = set(ids_signos)
+        resultados = []
+        for enfermedad_id, porcentaje, coincidencias, total_items in ranking:
+            ficha = self.fichas.get(enfermedad_id)
+            if ficha is None:
+                continue
+            resultados.append(ResultadoInferencia(
+                enfermedad_id,
+                ficha.nombre,
+                porcentaje,
+                coincidencias,
+                total_items,
+                tuple(sorted(self.nombres_sintomas[s] for s in ficha.sintomas & ids_sintomas)),
+                tuple(sorted(self.nombres_signos[s] for s in ficha.signos & ids_signos)),
+                tuple(self.nombres_pruebas_lab[p] for p in ficha.pruebas_lab),
+            ))
+        return resultados
+
+
+def _agrupar(modelo_intermedio, campo, alias):
+    agrupado = {}
+    for valor, enfermedad_id in modelo_intermedio.objects.using(alias).values_list(campo, 'enfermedad_id').iterator():
+        agrupado.setdefault(enfermedad_id, []).append(valor)
+    return agrupado
+
+
+def version_actual(alias=DEFAULT_DB_ALIAS):
+    return VersionConocimiento.objects.using(alias).filter(pk=1).values_list('version', flat=True).first() or 0
+
+
+_base = None
+_lock_base = threading.Lock()
+
+
+def obtener_base():
+    global _base
+    version = version_actual()
+    base = _base
+    if base is None or base.version != version:
+        with _lock_base:
+            base = _base
+            if base is None or base.version != version:
+                base = _base = BaseConocimiento.construir()
+    return base
+
+
+def descartar_copia_local():
+    # Fuerza la reconstrucción del snapshot de este proceso (p. ej. tras cambiar de backend)
+    global _base
+    _base = None
+
+
+# ==========================================
+# INVALIDACIÓN
+# Las señales (signals.py) llaman a invalidar_base_conocimiento(). Dentro de
+# cambios_en_lote() las invalidaciones se acumulan y la versión se incrementa
+# una sola vez al salir (útil en formularios y comandos de carga).
+# ==========================================
+
+_estado_lote = threading.local()
+
+
+def invalidar_base_conocimiento():
+    if getattr(_estado_lote, 'profundidad', 0):
+        _estado_lote.pendiente = True
+        return
+    _incrementar_version()
+
+
+def _incrementar_version():
+    global _base
+    # Se incrementa en la misma transacción que el cambio: si éste se revierte, la versión también
+    actualizadas = VersionConocimiento.objects.filter(pk=1).update(version=F('version') + 1)
+    if not actualizadas:
+        VersionConocimiento.objects.get_or_create(pk=1, defaults={'version': 1})
+    _base = None
+
+
+@contextmanager
+def cambios_en_lote():
+    profundidad = getattr(_estado_lote, 'profundidad', 0)
+    if profundidad == 0:
+        _estado_lote.pendiente = False
+    _estado_lote.profundidad = profundidad + 1
+    try:
+        yield
+    finally:
+        _estado_lote.profundidad = profundidad
+        if profundidad == 0 and _estado_lote.pendiente:
+            _estado_lote.pendiente = False
+            # Si la transacción en curso se va a revertir, sus cambios tampoco llegarán a la base
+            if not transaction.get_connection().needs_rollback:
+                _incrementar_version()
+
+
+# ==========================================
+# CONTEOS DESNORMALIZADOS DE ENFERMEDAD
+# num_sintomas, num_signos, num_pruebas_lab y num_pruebas_postmortem se
+# recalculan solo para las enfermedades afectadas, con una única UPDATE.
+# ==========================================
+
+RELACIONES_CONTADAS = ('sintomas', 'signos', 'pruebas_lab', 'pruebas_postmortem')
+
+
+def recontar_caracteristicas(ids_enfermedades=None, relaciones=RELACIONES_CONTADAS):
+    """Recalcula los conteos de las enfermedades indicadas (todas si es None)."""
+    valores = {}
+    for relacion in relaciones:
+        conteo = (
+            getattr(Enfermedad, relacion).through.objects.filter(enfermedad_id=OuterRef('pk'))
+            .order_by().values('enfermedad_id').annotate(n=Count('pk')).values('n')
+        )
+        valores[f'num_{relacion}'] = Coalesce(Subquery(conteo), Value(0))
+    enfermedades = Enfermedad.objects.all()
+    if ids_enfermedades is not None:
+        ids_enfermedades = list(ids_enfermedades)
+        if not ids_enfermedades:
+            return
+        enfermedades = enfermedades.filter(pk__in=ids_enfermedades)
+    enfermedades.update(**valores)
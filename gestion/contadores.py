@@ -0,0 +1,55 @@
+from django.db.models import F
+
+from .models import ContadorResumen, Diagnostico, Paciente
+
+# ==========================================
+# CONTADORES DEL PANEL
+# Totales mantenidos de forma incremental por signals.py: cada alta suma 1 y
+# cada baja resta 1, dentro de la transacción del cambio (las vistas que crean
+# guardan en transaction.atomic; los borrados ya son atómicos). Las cargas masivas
+# (bulk_create, update/delete en SQL) no emiten señales: deben llamar a
+# ajustar() o ejecutar "manage.py reconciliar_contadores".
+# ==========================================
+
+MODELOS = {
+    'pacientes': Paciente,
+    'diagnosticos': Diagnostico,
+}
+
+
+def ajustar(nombre, delta):
+    if not delta:
+        return
+    actualizadas = ContadorResumen.objects.filter(nombre=nombre).update(total=F('total') + delta)
+    if not actualizadas:
+        # Primera vez: se parte del conteo real (ya incluye la fila que disparó la señal)
+        ContadorResumen.objects.get_or_create(nombre=nombre, defaults={'total': MODELOS[nombre].objects.count()})
+
+
+def leer():
+    # Una sola consulta por el índice único de nombre
+    totales = dict(ContadorResumen.objects.filter(nombre__in=MODELOS).values_list('nombre', 'total'))
+    return {nombre: totales.get(nombre, 0) for nombre in MODELOS}
+
+
+async def aleer():
+    # Versión para vistas asíncronas
+    filas = ContadorResumen.objects.filter(nombre__in=MODELOS).values_list('nombre', 'total')
+    totales = {nombre: total async for nombre, total in filas}
+    return {nombre: totales.get(nombre, 0) for nombre in MODELOS}
+
+
+def reconciliar(corregir=True):
+    """
+    Compara cada contador con un COUNT(*) real y, si corregir es True, guarda el valor real.
+    Devuelve {nombre: (guardado, real)} solo de los que no coincidían.
+    """
+    guardados = leer()
+    diferencias = {}
+    for nombre, modelo in MODELOS.items():
+        real = modelo.objects.count()
+        if guardados[nombre] != real:
+            diferencias[nombre] = (guardados[nombre], real)
+            if corregir:
+                ContadorResumen.objects.update_or_create(nombre=nombre, defaults={'total': real})
+    return diferencias
@@ -0,0 +1,131 @@
+import csv
+import datetime
+import itertools
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from .models import Diagnostico, PruebaLaboratorio, Sintoma, Tratamiento
+
+# ==========================================
+# EXPORTACIÓN DEL HISTORIAL DE DIAGNÓSTICOS (CSV / NDJSON)
+# Se genera fila a fila: el queryset se recorre con .iterator(chunk_size) y
+# las relaciones (síntomas, pruebas, tratamientos) se precargan una vez por
+# lote, no por fila. La memoria no crece con el tamaño del historial, así que
+# sirve igual para StreamingHttpResponse y para el comando exportar_diagnosticos.
+# Bajo ASGI, StreamingHttpResponse consume un iterador síncrono con
+# sync_to_async(list), es decir, todo de una vez: ahí se usa alineas(), que
+# pide las líneas lote a lote al mismo hilo de la petición.
+# ==========================================
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+COLUMNAS = [
+    'id', 'fecha', 'paciente_id', 'paciente', 'medico_id', 'medico',
+    'enfermedad_id', 'enfermedad', 'sintomas', 'pruebas', 'tratamientos', 'notas',
+]
+
+
+def diagnosticos_a_exportar(desde=None, hasta=None, ids_enfermedades=None):
+    """
+    Historial en orden cronológico (índice de fecha_diagnostico, id).
+    desde/hasta son fechas incluidas; se convierten a límites de fecha y hora para no
+    envolver la columna en una función y poder usar el índice.
+    """
+    diagnosticos = Diagnostico.objects.select_related('paciente', 'medico', 'enfermedad_diagnosticada')
+    if desde:
+        diagnosticos = diagnosticos.filter(fecha_diagnostico__gte=_inicio_del_dia(desde))
+    if hasta:
+        diagnosticos = diagnosticos.filter(fecha_diagnostico__lt=_inicio_del_dia(hasta + datetime.timedelta(days=1)))
+    if ids_enfermedades:
+        diagnosticos = diagnosticos.filter(enfermedad_diagnosticada_id__in=ids_enfermedades)
+    return diagnosticos.prefetch_related(
+        Prefetch('sintomas_presentados', queryset=Sintoma.objects.only('id', 'nombre')),
+        Prefetch('pruebas_realizadas', queryset=PruebaLaboratorio.objects.only('id', 'nombre')),
+        Prefetch('tratamientos', queryset=Tratamiento.objects.order_by('fecha_inicio', 'id')),
+    ).order_by('fecha_diagnostico', 'id')
+
+
+def _inicio_del_dia(dia):
+    inicio = datetime.datetime.combine(dia, datetime.time.min)
+    return timezone.make_aware(inicio) if settings.USE_TZ else inicio
+
+
+def registros(diagnosticos, tam_lote=None):
+    # Un dict por diagnóstico; con chunk_size, Django ejecuta los prefetch por cada lote
+    if tam_lote is None:
+        tam_lote = getattr(settings, 'EXPORTACION_TAM_LOTE', 2000)
+    for d in diagnosticos.iterator(chunk_size=tam_lote):
+        yield {
+            'id': d.id,
+            'fecha': d.fecha_diagnostico.isoformat(),
+            'paciente_id': d.paciente_id,
+            'paciente': f'{d.paciente.nombre} {d.paciente.apellido}',
+            'medico_id': d.medico_id,
+            'medico': (d.medico.get_full_name() or d.medico.username) if d.medico else None,
+            'enfermedad_id': d.enfermedad_diagnosticada_id,
+            'enfermedad': d.enfermedad_diagnosticada.nombre if d.enfermedad_diagnosticada else None,
+            'sintomas': [s.nombre for s in d.sintomas_presentados.all()],
+            'pruebas': [p.nombre for p in d.pruebas_realizadas.all()],
+            'tratamientos': [
+                {
+                    'descripcion': t.descripcion,
+                    'fecha_inicio': t.fecha_inicio.isoformat(),
+                    'fecha_fin': t.fecha_fin.isoformat() if t.fecha_fin else None,
+                }
+                for t in d.tratamientos.all()
+            ],
+            'notas': d.notas_adicionales or '',
+        }
+
+
+class _Eco:
+    # Pseudo-archivo para csv.writer: devuelve la línea en lugar de guardarla
+    def write(self, valor):
+        return valor
+
+
+def _celda_csv(registro):
+    fila = dict(registro)
+    fila['sintomas'] = '; '.join(registro['sintomas'])
+    fila['pruebas'] = '; '.join(registro['pruebas'])
+    fila['tratamientos'] = ' | '.join(
+        f"{t['descripcion']} ({t['fecha_inicio']} - {t['fecha_fin'] or 'en curso'})" for t in registro['tratamientos']
+    )
+    return [fila[columna] if fila[columna] is not None else '' for columna in COLUMNAS]
+
+
+def lineas(diagnosticos, formato='csv', tam_lote=None):
+    """Genera el texto de la exportación línea a línea (cabecera incluida en CSV)."""
+    if formato not in FORMATOS:
+        raise ValueError(f'Formato desconocido: {formato}.')
+    if formato == 'csv':
+        escritor = csv.writer(_Eco())
+        yield escritor.writerow(COLUMNAS)
+        for registro in registros(diagnosticos, tam_lote):
+            yield escritor.writerow(_celda_csv(registro))
+    else:
+        for registro in registros(diagnosticos, tam_lote):
+            yield json.dumps(registro, ensure_ascii=False) + '\n'
+
+
+async def alineas(diagnosticos, formato='csv', tam_lote=None):
+    """Igual que lineas(), como generador asíncrono: entrega un bloque de texto por lote."""
+    if tam_lote is None:
+        tam_lote = getattr(settings, 'EXPORTACION_TAM_LOTE', 2000)
+    generador = lineas(diagnosticos, formato, tam_lote)
+    # thread_sensitive (por defecto): cada bloque se lee en el hilo de la petición, el
+    # mismo que tiene abierta la conexión y el cursor del .iterator()
+    siguiente_bloque = sync_to_async(lambda: ''.join(itertools.islice(generador, tam_lote)))
+    try:
+        while bloque := await siguiente_bloque():
+            yield bloque
+    finally:
+        # Si el cliente corta la descarga, se cierra el cursor en lugar de esperar al recolector
+        await sync_to_async(generador.close)()
@@ -1,7 +1,37 @@
 from django import forms
+from django.conf import settings
 from django.contrib.auth.models import User, Group
+from django.urls import reverse
 from .models import Paciente, Diagnostico, Enfermedad, Sintoma, Signo, PruebaLaboratorio, PruebaPosMortem
 
+# Widget de selección para catálogos grandes: en lugar de una casilla por cada
+# elemento, solo se dibujan las casillas de lo ya elegido y un buscador que
+# consulta /catalogos/<catalogo>/buscar/. Se envían los mismos ids que con
+# CheckboxSelectMultiple, así que el campo y su validación no cambian.
+class SelectorCatalogo(forms.CheckboxSelectMultiple):
+    template_name = 'gestion/widgets/selector_catalogo.html'
+
+    def __init__(self, catalogo, attrs=None):
+        super().__init__(attrs)
+        self.catalogo = catalogo
+
+    def optgroups(self, name, value, attrs=None):
+        # Solo los elegidos: una consulta por sus ids en vez de recorrer todo el catálogo
+        seleccionados = [v for v in value if str(v).isdigit()]
+        if not seleccionados:
+            return []
+        queryset = self.choices.queryset.filter(pk__in=seleccionados)
+        opciones = [
+            self.create_option(name, str(obj.pk), self.choices.field.label_from_instance(obj), True, indice, attrs=attrs)
+            for indice, obj in enumerate(queryset)
+        ]
+        return [(None, opciones, 0)]
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['url_busqueda'] = reverse('api_catalogo_buscar', args=[self.catalogo])
+        return context
+
 # Formulario para PACIENTES
 class PacienteForm(forms.ModelForm):
     class Meta:
@@ -48,11 +78,11 @@ class EnfermedadForm(forms.ModelForm):
             'nombre': forms.TextInput(attrs={'class': 'form-control'}),
             'descripcion': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
             
-            # Widgets de Selección Múltiple (Checkboxes)
-            'sintomas': forms.CheckboxSelectMultiple(),
-            'signos': forms.CheckboxSelectMultiple(),
-            'pruebas_lab': forms.CheckboxSelectMultiple(),
-            'pruebas_postmortem': forms.CheckboxSelectMultiple(),
+            # Selección con buscador (no se dibuja el catálogo completo)
+            'sintomas': SelectorCatalogo('sintomas'),
+            'signos': SelectorCatalogo('signos'),
+            'pruebas_lab': SelectorCatalogo('pruebas_lab'),
+            'pruebas_postmortem': SelectorCatalogo('pruebas_postmortem'),
         }
 
 class SignoForm(forms.ModelForm):
@@ -83,24 +113,43 @@ class DiagnosticoForm(forms.ModelForm):
             'enfermedad_diagnosticada': forms.Select(attrs={'class': 'form-select'}),
             'notas_adicionales': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
             
-            # Usamos checkboxes para que el médico marque lo que vio
-            'sintomas_presentados': forms.CheckboxSelectMultiple(),
-            'pruebas_realizadas': forms.CheckboxSelectMultiple(),
+            # El médico busca y marca lo que vio
+            'sintomas_presentados': SelectorCatalogo('sintomas'),
+            'pruebas_realizadas': SelectorCatalogo('pruebas_lab'),
         }
 
 # --- FORMULARIOS PARA INFERIR ---
+METODOS = {
+    'coincidencia': 'Coincidencia con la base de conocimiento',
+    'bayes': 'Probabilidad según el historial (Naive Bayes)',
+}
+
 class InferenciaForm(forms.Form):
     # Usamos ModelMultipleChoiceField para que Django maneje los IDs correctamente
     sintomas = forms.ModelMultipleChoiceField(
         queryset=Sintoma.objects.all(),
-        widget=forms.CheckboxSelectMultiple,
+        widget=SelectorCatalogo('sintomas'),
         required=False,
         label="Seleccione los Síntomas del Paciente"
     )
     signos = forms.ModelMultipleChoiceField(
         queryset=Signo.objects.all(),
-        widget=forms.CheckboxSelectMultiple,
+        widget=SelectorCatalogo('signos'),
         required=False,
         label="Seleccione los Signos Observados"
     )
+    metodo = forms.ChoiceField(
+        choices=METODOS.items(),
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'}),
+        label="Método de cálculo"
+    )
+    caso_fatal = forms.BooleanField(
+        required=False,
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+        label="Caso fatal (incluir pruebas post-mortem)"
+    )
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['metodo'].initial = getattr(settings, 'INFERENCIA_METODO', 'coincidencia')
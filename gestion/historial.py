@@ -0,0 +1,81 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.utils import make_template_fragment_key
+from django.db import transaction
+from django.db.models import Prefetch
+
+from .models import Diagnostico, PruebaLaboratorio, Sintoma, Tratamiento
+
+# ==========================================
+# HISTORIA CLÍNICA DEL PACIENTE (línea de tiempo)
+# La página del paciente carga todos sus diagnósticos con un número fijo de
+# consultas (diagnósticos + 3 Prefetch) y guarda el fragmento HTML ya
+# renderizado con {% cache %}. La clave lleva el id del paciente y una
+# "generación" guardada en la propia caché:
+#   - signals.py borra la clave del paciente cuando cambian sus diagnósticos,
+#     síntomas, pruebas o tratamientos
+#   - renombrar una enfermedad, un catálogo o un médico (o una carga masiva sin
+#     señales) incrementa la generación y deja obsoletos todos los fragmentos
+# Configuración: HISTORIAL_CACHE_ALIAS (backend de settings.CACHES) y HISTORIAL_CACHE_TTL.
+# ==========================================
+
+FRAGMENTO = 'historial_paciente'
+CLAVE_GENERACION = 'historial_paciente:generacion'
+
+
+def alias_cache():
+    return getattr(settings, 'HISTORIAL_CACHE_ALIAS', 'default')
+
+
+def ttl_cache():
+    return getattr(settings, 'HISTORIAL_CACHE_TTL', 3600)
+
+
+def generacion():
+    cache = caches[alias_cache()]
+    valor = cache.get(CLAVE_GENERACION)
+    if valor is None:
+        # Valor inicial basado en la hora: si la clave se pierde, nunca se reutiliza una generación vieja
+        cache.add(CLAVE_GENERACION, time.time_ns(), timeout=None)
+        valor = cache.get(CLAVE_GENERACION)
+    return valor
+
+
+def diagnosticos_del_paciente(paciente_id):
+    # Perezoso: con el fragmento en caché no se llega a ejecutar ninguna de estas consultas
+    return (
+        Diagnostico.objects.filter(paciente_id=paciente_id)
+        .select_related('medico', 'enfermedad_diagnosticada')
+        .prefetch_related(
+            Prefetch('sintomas_presentados', queryset=Sintoma.objects.only('id', 'nombre').order_by('nombre')),
+            Prefetch('pruebas_realizadas', queryset=PruebaLaboratorio.objects.only('id', 'nombre').order_by('nombre')),
+            Prefetch('tratamientos', queryset=Tratamiento.objects.order_by('fecha_inicio', 'id')),
+        )
+        .order_by('-fecha_diagnostico', '-id')
+    )
+
+
+def invalidar_pacientes(ids_pacientes):
+    # Tras el commit: si se borrara antes, otra petición podría volver a guardar el estado viejo
+    ids_pacientes = {pid for pid in ids_pacientes if pid is not None}
+    if not ids_pacientes:
+        return
+
+    def borrar():
+        actual = generacion()
+        caches[alias_cache()].delete_many(
+            [make_template_fragment_key(FRAGMENTO, [pid, actual]) for pid in ids_pacientes]
+        )
+    transaction.on_commit(borrar)
+
+
+def invalidar_todo():
+    def incrementar():
+        cache = caches[alias_cache()]
+        try:
+            cache.incr(CLAVE_GENERACION)
+        except ValueError:  # la clave no existe: generacion() crea una nueva
+            generacion()
+    transaction.on_commit(incrementar)
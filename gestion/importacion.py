@@ -0,0 +1,430 @@
+import csv
+import functools
+import itertools
+import json
+import os
+import time
+from collections import Counter
+from typing import NamedTuple
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management.color import no_style
+from django.db import connections, router, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import analitica, bayes, contadores, historial
+from .catalogos import normalizar
+from .models import Diagnostico, Enfermedad, Paciente, ProgresoImportacion, PruebaLaboratorio, Sintoma, Tratamiento
+
+# ==========================================
+# IMPORTACIÓN MASIVA (pacientes, diagnósticos, tratamientos)
+# Lee CSV o JSONL en streaming y procesa lotes: cada lote se valida con unas
+# pocas consultas (existencia de pacientes, diagnósticos, ids repetidos) y se
+# escribe con bulk_create (las tablas intermedias de síntomas y pruebas, con
+# un INSERT por lote vía executemany) en una transacción que también guarda el progreso. Si el proceso
+# se corta, la siguiente ejecución sigue en el primer lote no confirmado; si
+# ya terminó, no vuelve a importar nada salvo que se pida reiniciar.
+#
+# bulk_create no emite señales, así que aquí se mantiene lo que harían:
+#   - contadores del panel: se ajustan en cada lote
+#   - índice FTS de pacientes: lo actualizan sus triggers (migración 0009)
+#   - conteos bayesianos y resúmenes de analítica: se suman en cada lote, en
+#     su misma transacción, con los diagnósticos y síntomas recién insertados
+#     (agrupados por clave: unas pocas consultas por lote, nunca el historial)
+#   - historiales de pacientes en caché: se invalidan los de los pacientes del lote
+# ==========================================
+
+TIPOS = ('pacientes', 'diagnosticos', 'tratamientos')
+FORMATOS = ('csv', 'jsonl')
+SEPARADOR_LISTA = ';'  # Celdas CSV con varios valores: "Fiebre; Tos"
+
+
+class ErrorRegistro(NamedTuple):
+    numero: int     # Posición del registro en el archivo (1 = primer registro de datos)
+    mensaje: str
+
+
+class ResultadoImportacion(NamedTuple):
+    registros: int      # Registros procesados en esta ejecución
+    importados: int
+    errores: int
+    omitidos: int       # Registros saltados por estar ya importados (reanudación)
+    segundos: float
+
+
+# ==========================================
+# LECTURA
+# ==========================================
+
+def leer_registros(ruta, formato=None):
+    """Genera (numero, registro, error) por cada registro del archivo, sin cargarlo entero."""
+    formato = formato or ('csv' if ruta.lower().endswith('.csv') else 'jsonl')
+    if formato not in FORMATOS:
+        raise ValueError(f'Formato desconocido: {formato}.')
+    with open(ruta, encoding='utf-8', newline='') as archivo:
+        if formato == 'csv':
+            for numero, fila in enumerate(csv.DictReader(archivo), start=1):
+                yield numero, fila, None
+            return
+        numero = 0
+        for linea in archivo:
+            if not linea.strip():
+                continue
+            numero += 1
+            try:
+                registro = json.loads(linea)
+            except ValueError as error:
+                yield numero, None, f'JSON inválido: {error}'
+                continue
+            if not isinstance(registro, dict):
+                yield numero, None, 'Cada línea debe ser un objeto JSON.'
+                continue
+            yield numero, registro, None
+
+
+def _texto(registro, campo):
+    valor = registro.get(campo)
+    return '' if valor is None else str(valor).strip()
+
+
+def _entero(registro, campo):
+    # '' o ausente -> None; lanza ValueError si no es un entero
+    valor = _texto(registro, campo)
+    return int(valor) if valor else None
+
+
+def _lista(registro, campo):
+    valor = registro.get(campo) or []
+    if isinstance(valor, str):
+        valor = valor.split(SEPARADOR_LISTA)
+    return [str(v).strip() for v in valor if str(v).strip()]
+
+
+def _mensaje(error):
+    if hasattr(error, 'message_dict'):
+        return '; '.join(f"{campo}: {' '.join(mensajes)}" for campo, mensajes in error.message_dict.items())
+    return ' '.join(getattr(error, 'messages', [str(error)]))
+
+
+# ==========================================
+# VALIDACIÓN POR LOTES
+# Cada función recibe [(numero, registro), ...] y devuelve (objetos, extras, errores).
+# ==========================================
+
+class _Referencias:
+    # Catálogos y médicos se resuelven en memoria: se cargan una vez por importación.
+    # Con nombres equivalentes tras normalizar gana el id más bajo, como en carga_conocimiento
+    def __init__(self):
+        self.enfermedades = {normalizar(n): i for i, n in Enfermedad.objects.order_by('-id').values_list('id', 'nombre')}
+        self.ids_enfermedades = set(Enfermedad.objects.values_list('id', flat=True))
+        self.sintomas = {normalizar(n): i for i, n in Sintoma.objects.order_by('-id').values_list('id', 'nombre')}
+        self.pruebas = {normalizar(n): i for i, n in PruebaLaboratorio.objects.order_by('-id').values_list('id', 'nombre')}
+        self.medicos = dict(User.objects.values_list('username', 'id'))
+        self.ids_medicos = set(self.medicos.values())
+        # Los mismos nombres se repiten en millones de filas: normalizamos cada uno una vez
+        self._normalizar = functools.lru_cache(maxsize=100_000)(normalizar)
+
+    def ids_catalogo(self, nombres, catalogo, etiqueta):
+        ids, desconocidos = set(), []
+        for nombre in nombres:
+            item_id = catalogo.get(self._normalizar(nombre))
+            if item_id is None:
+                desconocidos.append(nombre)
+            else:
+                ids.add(item_id)
+        if desconocidos:
+            raise ValueError(f"{etiqueta} desconocido(s): {', '.join(desconocidos)}")
+        return ids
+
+
+def _ids_ocupados(modelo, lote):
+    # ids explícitos del lote que ya existen en la base (una consulta por lote)
+    ids = set()
+    for _, registro in lote:
+        try:
+            if _entero(registro, 'id') is not None:
+                ids.add(_entero(registro, 'id'))
+        except ValueError:
+            pass
+    return set(modelo.objects.filter(pk__in=ids).values_list('pk', flat=True)) if ids else set()
+
+
+def _id_explicito(registro, ocupados, vistos):
+    item_id = _entero(registro, 'id')
+    if item_id is not None:
+        if item_id in ocupados or item_id in vistos:
+            raise ValueError(f'El id {item_id} ya existe.')
+        vistos.add(item_id)
+    return item_id
+
+
+def _preparar_pacientes(lote, referencias):
+    objetos, errores = [], []
+    ocupados, vistos = _ids_ocupados(Paciente, lote), set()
+    for numero, registro in lote:
+        try:
+            paciente = Paciente(
+                id=_id_explicito(registro, ocupados, vistos),
+                **{campo: _texto(registro, campo) for campo in
+                   ('nombre', 'apellido', 'fecha_nacimiento', 'direccion', 'telefono', 'email')},
+            )
+            paciente.clean_fields(exclude=['id', 'creado_por'])
+        except (ValueError, ValidationError) as error:
+            errores.append(ErrorRegistro(numero, _mensaje(error)))
+            continue
+        objetos.append(paciente)
+    return objetos, None, errores
+
+
+def _preparar_diagnosticos(lote, referencias):
+    objetos, relaciones, errores = [], [], []
+    ocupados, vistos = _ids_ocupados(Diagnostico, lote), set()
+    ids_pacientes = set()
+    for _, registro in lote:
+        try:
+            ids_pacientes.add(_entero(registro, 'paciente_id'))
+        except ValueError:
+            pass
+    pacientes_existentes = set(Paciente.objects.filter(pk__in=ids_pacientes).values_list('pk', flat=True))
+
+    for numero, registro in lote:
+        try:
+            paciente_id = _entero(registro, 'paciente_id')
+            if paciente_id not in pacientes_existentes:
+                raise ValueError(f'Paciente inexistente: {paciente_id}.')
+
+            medico_id = _entero(registro, 'medico_id')
+            if medico_id is None and _texto(registro, 'medico'):
+                medico_id = referencias.medicos.get(_texto(registro, 'medico'))
+                if medico_id is None:
+                    raise ValueError(f"Médico desconocido: {_texto(registro, 'medico')}.")
+            elif medico_id is not None and medico_id not in referencias.ids_medicos:
+                raise ValueError(f'Médico inexistente: {medico_id}.')
+
+            enfermedad_id = _entero(registro, 'enfermedad_id')
+            if enfermedad_id is None and _texto(registro, 'enfermedad'):
+                enfermedad_id = referencias.ids_catalogo([_texto(registro, 'enfermedad')], referencias.enfermedades, 'Enfermedad').pop()
+            elif enfermedad_id is not None and enfermedad_id not in referencias.ids_enfermedades:
+                raise ValueError(f'Enfermedad inexistente: {enfermedad_id}.')
+
+            fecha = timezone.now()
+            if _texto(registro, 'fecha'):
+                fecha = parse_datetime(_texto(registro, 'fecha'))
+                if fecha is None:
+                    raise ValueError(f"Fecha inválida: {_texto(registro, 'fecha')}.")
+                if settings.USE_TZ and timezone.is_naive(fecha):
+                    fecha = timezone.make_aware(fecha)
+
+            diagnostico = Diagnostico(
+                id=_id_explicito(registro, ocupados, vistos),
+                paciente_id=paciente_id, medico_id=medico_id, enfermedad_diagnosticada_id=enfermedad_id,
+                fecha_diagnostico=fecha, notas_adicionales=_texto(registro, 'notas') or None,
+            )
+            sintomas = referencias.ids_catalogo(_lista(registro, 'sintomas'), referencias.sintomas, 'Síntoma')
+            pruebas = referencias.ids_catalogo(_lista(registro, 'pruebas'), referencias.pruebas, 'Prueba')
+        except ValueError as error:
+            errores.append(ErrorRegistro(numero, _mensaje(error)))
+            continue
+        objetos.append(diagnostico)
+        relaciones.append((sintomas, pruebas))
+    return objetos, relaciones, errores
+
+
+def _preparar_tratamientos(lote, referencias):
+    objetos, errores = [], []
+    ids_diagnosticos = set()
+    for _, registro in lote:
+        try:
+            ids_diagnosticos.add(_entero(registro, 'diagnostico_id'))
+        except ValueError:
+            pass
+    existentes = set(Diagnostico.objects.filter(pk__in=ids_diagnosticos).values_list('pk', flat=True))
+
+    for numero, registro in lote:
+        try:
+            diagnostico_id = _entero(registro, 'diagnostico_id')
+            if diagnostico_id not in existentes:
+                raise ValueError(f'Diagnóstico inexistente: {diagnostico_id}.')
+            tratamiento = Tratamiento(
+                diagnostico_id=diagnostico_id,
+                descripcion=_texto(registro, 'descripcion'),
+                fecha_inicio=_texto(registro, 'fecha_inicio'),
+                fecha_fin=_texto(registro, 'fecha_fin') or None,
+            )
+            tratamiento.clean_fields(exclude=['diagnostico'])
+        except (ValueError, ValidationError) as error:
+            errores.append(ErrorRegistro(numero, _mensaje(error)))
+            continue
+        objetos.append(tratamiento)
+    return objetos, None, errores
+
+
+# ==========================================
+# ESCRITURA
+# ==========================================
+
+def _conexion(modelo):
+    # La SQL directa va a la misma base de datos que el bulk_create del modelo
+    return connections[router.db_for_write(modelo)]
+
+
+def _insertar_filas(modelo_intermedio, columnas, filas, tam_lote):
+    # INSERT directo con executemany: sin instanciar un objeto del ORM por cada fila intermedia
+    if not filas:
+        return
+    connection = _conexion(modelo_intermedio)
+    qn = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        qn(modelo_intermedio._meta.db_table),
+        ', '.join(qn(modelo_intermedio._meta.get_field(c).column) for c in columnas),
+        ', '.join(['%s'] * len(columnas)),
+    )
+    with connection.cursor() as cursor:
+        for inicio in range(0, len(filas), tam_lote):
+            cursor.executemany(sql, filas[inicio:inicio + tam_lote])
+
+
+def _guardar_relaciones(diagnosticos, relaciones, tam_lote):
+    _insertar_filas(
+        Diagnostico.sintomas_presentados.through, ('diagnostico', 'sintoma'),
+        [(d.pk, s) for d, (sintomas, _) in zip(diagnosticos, relaciones) for s in sintomas], tam_lote,
+    )
+    _insertar_filas(
+        Diagnostico.pruebas_realizadas.through, ('diagnostico', 'pruebalaboratorio'),
+        [(d.pk, p) for d, (_, pruebas) in zip(diagnosticos, relaciones) for p in pruebas], tam_lote,
+    )
+
+
+def _derivados_diagnosticos(diagnosticos, relaciones):
+    # Lo que harían las señales de signals.py por cada diagnóstico, sumado por lote
+    priors = Counter(d.enfermedad_diagnosticada_id for d in diagnosticos if d.enfermedad_diagnosticada_id)
+    for enfermedad_id, n in priors.items():
+        bayes.ajustar_prior(enfermedad_id, n)
+    bayes.ajustar_pares([
+        (d.enfermedad_diagnosticada_id, s)
+        for d, (sintomas, _) in zip(diagnosticos, relaciones) if d.enfermedad_diagnosticada_id for s in sintomas
+    ], 1)
+    dias = [analitica.dia_de(d.fecha_diagnostico) for d in diagnosticos]
+    analitica.ajustar_diagnosticos(Counter(
+        (dia, d.enfermedad_diagnosticada_id, d.medico_id) for dia, d in zip(dias, diagnosticos)
+    ))
+    analitica.ajustar_sintomas([(dia, s) for dia, (sintomas, _) in zip(dias, relaciones) for s in sintomas], 1)
+    historial.invalidar_pacientes({d.paciente_id for d in diagnosticos})
+
+
+def _derivados_tratamientos(tratamientos, relaciones):
+    historial.invalidar_pacientes(
+        Diagnostico.objects.filter(pk__in={t.diagnostico_id for t in tratamientos})
+        .values_list('paciente_id', flat=True).distinct()
+    )
+
+
+# tipo -> (modelo, preparación del lote, contador del panel, actualización de datos derivados)
+IMPORTADORES = {
+    'pacientes': (Paciente, _preparar_pacientes, 'pacientes', None),
+    'diagnosticos': (Diagnostico, _preparar_diagnosticos, 'diagnosticos', _derivados_diagnosticos),
+    'tratamientos': (Tratamiento, _preparar_tratamientos, None, _derivados_tratamientos),
+}
+
+
+def _campos_auto_now_add(modelo):
+    return [campo for campo in modelo._meta.concrete_fields if getattr(campo, 'auto_now_add', False)]
+
+
+def _restaurar_campos(modelo, objetos, campos, valores):
+    """
+    bulk_create pone la hora actual en los campos auto_now_add (fecha_diagnostico) y pisa
+    la fecha del archivo: se vuelve a escribir con un UPDATE por fila vía executemany, dentro
+    de la transacción del lote (bulk_update arma un CASE por fila y es ~10 veces más lento).
+    No se toca la definición del campo, que comparten los demás hilos del proceso.
+    """
+    connection = _conexion(modelo)
+    qn = connection.ops.quote_name
+    asignaciones = ', '.join(f'{qn(campo.column)} = %s' for campo in campos)
+    sql = f'UPDATE {qn(modelo._meta.db_table)} SET {asignaciones} WHERE {qn(modelo._meta.pk.column)} = %s'
+    filas = []
+    for objeto, originales in zip(objetos, valores):
+        for campo, valor in zip(campos, originales):
+            setattr(objeto, campo.attname, valor)
+        filas.append([campo.get_db_prep_value(valor, connection) for campo, valor in zip(campos, originales)] + [objeto.pk])
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, filas)
+
+
+def _reiniciar_secuencia(modelo):
+    # Con ids explícitos, PostgreSQL necesita reajustar la secuencia (en SQLite no hace nada)
+    connection = _conexion(modelo)
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [modelo]):
+            cursor.execute(sql)
+
+
+def importar(ruta, tipo, formato=None, tam_lote=None, reiniciar=False, al_error=None, al_avanzar=None):
+    """
+    Importa `ruta` y devuelve un ResultadoImportacion.
+    al_error(ErrorRegistro) recibe cada registro rechazado; al_avanzar(procesados, importados, segundos)
+    se llama tras confirmar cada lote.
+    """
+    if tipo not in IMPORTADORES:
+        raise ValueError(f'Tipo desconocido: {tipo}.')
+    if tam_lote is None:
+        tam_lote = getattr(settings, 'IMPORTACION_TAM_LOTE', 5000)
+    modelo, preparar, contador, derivados = IMPORTADORES[tipo]
+
+    clave = f'{tipo}:{os.path.abspath(ruta)}'[:255]
+    if reiniciar:
+        ProgresoImportacion.objects.filter(clave=clave).delete()
+    progreso, _ = ProgresoImportacion.objects.get_or_create(clave=clave)
+    omitidos = progreso.registros
+
+    referencias = _Referencias()
+    registros = itertools.islice(leer_registros(ruta, formato), omitidos, None)
+    procesados = importados = errores = 0
+    inicio = time.monotonic()
+    campos_auto = _campos_auto_now_add(modelo)
+    try:
+        while True:
+            bloque = list(itertools.islice(registros, tam_lote))
+            if not bloque:
+                break
+            lote, rechazados = [], []
+            for numero, registro, error in bloque:
+                if error:
+                    rechazados.append(ErrorRegistro(numero, error))
+                else:
+                    lote.append((numero, registro))
+
+            objetos, relaciones, invalidos = preparar(lote, referencias)
+            rechazados.extend(invalidos)
+            originales = [[getattr(o, campo.attname) for campo in campos_auto] for o in objetos] if campos_auto else None
+            with transaction.atomic(using=router.db_for_write(modelo)):
+                modelo.objects.bulk_create(objetos, batch_size=tam_lote)
+                if originales:
+                    _restaurar_campos(modelo, objetos, campos_auto, originales)
+                if relaciones is not None:
+                    _guardar_relaciones(objetos, relaciones, tam_lote)
+                if contador:
+                    contadores.ajustar(contador, len(objetos))
+                if derivados and objetos:
+                    derivados(objetos, relaciones)
+                progreso.registros += len(bloque)
+                progreso.importados += len(objetos)
+                progreso.errores += len(rechazados)
+                progreso.save()
+
+            procesados += len(bloque)
+            importados += len(objetos)
+            errores += len(rechazados)
+            if al_error:
+                for error in sorted(rechazados):
+                    al_error(error)
+            if al_avanzar:
+                al_avanzar(procesados, importados, time.monotonic() - inicio)
+    finally:
+        if importados:
+            _reiniciar_secuencia(modelo)
+
+    return ResultadoImportacion(procesados, importados, errores, omitidos, time.monotonic() - inicio)
@@ -0,0 +1,184 @@
+import heapq
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional: solo lo necesita el backend 'numpy'
+    np = None
+
+# ==========================================
+# MOTOR DE INFERENCIA
+# Dos backends intercambiables con la misma interfaz:
+#   - 'python': índice invertido (listas de publicación en diccionarios)
+#   - 'numpy':  matriz de incidencia dispersa Enfermedad x (Síntoma ∪ Signo)
+# Ambos devuelven [(enfermedad_id, porcentaje, coincidencias, total_items), ...]
+# ordenado de mayor a menor porcentaje (empates por id).
+# ==========================================
+
+def _clave_orden(fila):
+    # Mayor porcentaje primero; en empate, por id, igual que el recorrido original del catálogo
+    return (-fila[1], fila[0])
+
+
+def seleccionar_top(ranking, limite=None):
+    if limite is not None and limite < len(ranking):
+        # Top-k con un montículo en lugar de ordenar todos los candidatos
+        return heapq.nsmallest(limite, ranking, key=_clave_orden)
+    return sorted(ranking, key=_clave_orden)
+
+
+class IndiceInvertido:
+    """
+    Backend 'python': para cada síntoma/signo, qué enfermedades lo tienen.
+    Una consulta solo toca las enfermedades que comparten algo con la entrada.
+    """
+
+    def __init__(self, por_sintoma, por_signo, total_items):
+        self.por_sintoma = por_sintoma  # {sintoma_id: (enfermedad_id, ...)}
+        self.por_signo = por_signo      # {signo_id: (enfermedad_id, ...)}
+        self.total_items = total_items  # {enfermedad_id: nº de síntomas + signos}
+
+    @classmethod
+    def desde_relaciones(cls, filas_sintomas, filas_signos, totales):
+        por_sintoma = defaultdict(list)
+        por_signo = defaultdict(list)
+
+        for sintoma_id, enfermedad_id in filas_sintomas:
+            por_sintoma[sintoma_id].append(enfermedad_id)
+        for signo_id, enfermedad_id in filas_signos:
+            por_signo[signo_id].append(enfermedad_id)
+
+        return cls(
+            {k: tuple(v) for k, v in por_sintoma.items()},
+            {k: tuple(v) for k, v in por_signo.items()},
+            totales,
+        )
+
+    def rankear(self, ids_sintomas, ids_signos, limite=None):
+        coincidencias = Counter()
+        for sintoma_id in set(ids_sintomas):
+            coincidencias.update(self.por_sintoma.get(sintoma_id, ()))
+        for signo_id in set(ids_signos):
+            coincidencias.update(self.por_signo.get(signo_id, ()))
+
+        ranking = []
+        for enfermedad_id, total_coincidencias in coincidencias.items():
+            total = self.total_items[enfermedad_id]
+            # Fórmula: (Coincidencias / Total de la Enfermedad) * 100
+            porcentaje = round((total_coincidencias / total) * 100, 1)
+            ranking.append((enfermedad_id, porcentaje, total_coincidencias, total))
+
+        return seleccionar_top(ranking, limite)
+
+    def publicaciones(self, tipo, caracteristica_id):
+        """Enfermedades que contienen el síntoma/signo indicado (tipo: 'sintoma' o 'signo')."""
+        return (self.por_sintoma if tipo == 'sintoma' else self.por_signo).get(caracteristica_id, ())
+
+
+class MatrizIncidencia:
+    """
+    Backend 'numpy': la incidencia Enfermedad x característica se guarda por
+    columnas (formato CSC): para la columna c, indices[indptr[c]:indptr[c+1]]
+    son las filas (enfermedades) que la contienen. El conteo de coincidencias
+    de todas las enfermedades se obtiene con un único np.bincount.
+    """
+
+    def __init__(self, ids_enfermedades, totales, col_sintoma, col_signo, indptr, indices):
+        self.ids_enfermedades = ids_enfermedades  # fila -> enfermedad_id (ascendente)
+        self.totales = totales                    # fila -> nº de síntomas + signos
+        self.col_sintoma = col_sintoma            # {sintoma_id: columna}
+        self.col_signo = col_signo                # {signo_id: columna}
+        self.indptr = indptr
+        self.indices = indices
+
+    @classmethod
+    def desde_relaciones(cls, filas_sintomas, filas_signos, totales):
+        if np is None:
+            raise ImproperlyConfigured("INFERENCIA_BACKEND = 'numpy' requiere tener NumPy instalado.")
+
+        ids_enfermedades = np.array(
+            sorted({e for _, e in filas_sintomas} | {e for _, e in filas_signos}), dtype=np.int64
+        )
+        fila_de = {enfermedad_id: fila for fila, enfermedad_id in enumerate(ids_enfermedades.tolist())}
+
+        # Columnas: primero los síntomas, después los signos (sus ids pueden coincidir)
+        col_sintoma = {s: c for c, s in enumerate(sorted({s for s, _ in filas_sintomas}))}
+        col_signo = {s: c + len(col_sintoma) for c, s in enumerate(sorted({s for s, _ in filas_signos}))}
+
+        columnas = np.array(
+            [col_sintoma[s] for s, _ in filas_sintomas] + [col_signo[s] for s, _ in filas_signos],
+            dtype=np.int64,
+        )
+        filas = np.array(
+            [fila_de[e] for _, e in filas_sintomas] + [fila_de[e] for _, e in filas_signos],
+            dtype=np.int32,
+        )
+
+        orden = np.argsort(columnas, kind='stable')
+        indices = filas[orden]
+        indptr = np.zeros(len(col_sintoma) + len(col_signo) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(columnas, minlength=len(indptr) - 1), out=indptr[1:])
+        totales = np.array([totales[e] for e in ids_enfermedades.tolist()], dtype=np.int64)
+
+        return cls(ids_enfermedades, totales, col_sintoma, col_signo, indptr, indices)
+
+    def rankear(self, ids_sintomas, ids_signos, limite=None):
+        columnas = [self.col_sintoma[s] for s in set(ids_sintomas) if s in self.col_sintoma]
+        columnas += [self.col_signo[s] for s in set(ids_signos) if s in self.col_signo]
+        if not columnas:
+            return []
+
+        filas = np.concatenate([self.indices[self.indptr[c]:self.indptr[c + 1]] for c in columnas])
+        conteos = np.bincount(filas, minlength=len(self.ids_enfermedades))
+        candidatos = np.flatnonzero(conteos)
+
+        # Porcentaje redondeado a décimas como entero (0..1000) para ordenar sin flotantes
+        decimas = np.rint(np.round(conteos[candidatos] / self.totales[candidatos] * 100, 1) * 10).astype(np.int64)
+        # Clave compuesta: mayor porcentaje primero y, en empate, menor fila (= menor id)
+        clave = -decimas * len(self.ids_enfermedades) + candidatos
+
+        if limite is not None and limite < len(candidatos):
+            # Selección parcial O(n) y orden solo de los k elegidos
+            elegidos = np.argpartition(clave, limite - 1)[:limite]
+            elegidos = elegidos[np.argsort(clave[elegidos])]
+        else:
+            elegidos = np.argsort(clave)
+
+        ranking = []
+        for fila in candidatos[elegidos].tolist():
+            total_coincidencias = int(conteos[fila])
+            total = int(self.totales[fila])
+            porcentaje = round((total_coincidencias / total) * 100, 1)
+            ranking.append((int(self.ids_enfermedades[fila]), porcentaje, total_coincidencias, total))
+        return ranking
+
+    def publicaciones(self, tipo, caracteristica_id):
+        columna = (self.col_sintoma if tipo == 'sintoma' else self.col_signo).get(caracteristica_id)
+        if columna is None:
+            return ()
+        return self.ids_enfermedades[self.indices[self.indptr[columna]:self.indptr[columna + 1]]].tolist()
+
+
+BACKENDS = {
+    'python': IndiceInvertido,
+    'numpy': MatrizIncidencia,
+}
+
+
+def construir_motor(fichas):
+    """Construye el backend configurado en INFERENCIA_BACKEND a partir de las fichas del snapshot."""
+    nombre = getattr(settings, 'INFERENCIA_BACKEND', 'python')
+    try:
+        clase = BACKENDS[nombre]
+    except KeyError:
+        raise ImproperlyConfigured(
+            f"INFERENCIA_BACKEND desconocido: {nombre!r}. Opciones: {', '.join(BACKENDS)}."
+        )
+    filas_sintomas = [(s, ficha.id) for ficha in fichas for s in ficha.sintomas]
+    filas_signos = [(s, ficha.id) for ficha in fichas for s in ficha.signos]
+    # El denominador sale de los conteos desnormalizados de Enfermedad
+    totales = {ficha.id: ficha.total_items for ficha in fichas}
+    return clase.desde_relaciones(filas_sintomas, filas_signos, totales)
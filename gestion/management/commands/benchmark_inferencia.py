@@ -0,0 +1,138 @@
+import json
+import platform
+import random
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from gestion.conocimiento import descartar_copia_local, obtener_base
+from gestion.inferencia import BACKENDS, np
+from gestion.sintetico import generar_base_sintetica
+
+class ContadorConsultas:
+    # Se instala con connection.execute_wrapper para contar las consultas SQL
+    def __init__(self):
+        self.total = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.total += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = ('Mide la latencia del ranking del motor de inferencia con bases sintéticas de varios tamaños. '
+            'Los datos se generan dentro de una transacción que se revierte al terminar.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanos', default='1000,10000,100000', help='Nº de enfermedades, separados por comas')
+        parser.add_argument('--anchos', default='1,3,8', help='Síntomas+signos por consulta, separados por comas')
+        parser.add_argument('--consultas', type=int, default=200, help='Consultas por combinación')
+        parser.add_argument('--backends', default=','.join(BACKENDS), help='Backends a medir')
+        parser.add_argument('--sintomas', type=int, default=2000)
+        parser.add_argument('--signos', type=int, default=1000)
+        parser.add_argument('--media', type=int, default=8, help='Características por enfermedad (media)')
+        parser.add_argument('--limite', type=int, default=10, help='Top-k pedido al motor')
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--salida', default='benchmark_inferencia.json', help='Archivo JSON de resultados')
+
+    def handle(self, *args, **opciones):
+        tamanos = [int(t) for t in opciones['tamanos'].split(',')]
+        anchos = [int(a) for a in opciones['anchos'].split(',')]
+        backends = opciones['backends'].split(',')
+        desconocidos = set(backends) - set(BACKENDS)
+        if desconocidos:
+            raise CommandError(f"Backends desconocidos: {', '.join(sorted(desconocidos))}")
+        if 'numpy' in backends and np is None:
+            self.stdout.write(self.style.WARNING('NumPy no está instalado: se omite el backend numpy.'))
+            backends.remove('numpy')
+
+        rng = random.Random(opciones['semilla'])
+        resultados = []
+        for tamano in tamanos:
+            self.stdout.write(self.style.WARNING(f'Generando {tamano} enfermedades...'))
+            with transaction.atomic():
+                ids_sintomas, ids_signos = generar_base_sintetica(
+                    tamano, opciones['sintomas'], opciones['signos'],
+                    media=opciones['media'], semilla=opciones['semilla'], prefijo=f'Benchmark {tamano}',
+                )
+                for backend in backends:
+                    with override_settings(INFERENCIA_BACKEND=backend):
+                        resultados += self._medir(tamano, backend, anchos, ids_sintomas, ids_signos, rng, opciones)
+                # Nada de lo generado queda en la base de datos
+                transaction.set_rollback(True)
+        descartar_copia_local()
+
+        informe = {
+            'fecha': datetime.now(timezone.utc).isoformat(),
+            'commit': self._commit(),
+            'python': platform.python_version(),
+            'parametros': {k: opciones[k] for k in ('consultas', 'sintomas', 'signos', 'media', 'limite', 'semilla')},
+            'resultados': resultados,
+        }
+        with open(opciones['salida'], 'w', encoding='utf-8') as archivo:
+            json.dump(informe, archivo, indent=2, ensure_ascii=False)
+        self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {opciones['salida']}"))
+
+    def _medir(self, tamano, backend, anchos, ids_sintomas, ids_signos, rng, opciones):
+        # 1. Construcción del snapshot y del backend: tiempo, consultas y memoria pico
+        descartar_copia_local()
+        contador = ContadorConsultas()
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        with connection.execute_wrapper(contador):
+            obtener_base().motor
+        construccion_ms = (time.perf_counter() - inicio) * 1000
+        memoria_pico_mb = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        tracemalloc.stop()
+        consultas_construccion = contador.total
+
+        # 2. Camino de cada consulta: comprobación de versión + ranking top-k
+        filas = []
+        fraccion_sintomas = len(ids_sintomas) / max(1, len(ids_sintomas) + len(ids_signos))
+        for ancho in anchos:
+            latencias = []
+            contador = ContadorConsultas()
+            with connection.execute_wrapper(contador):
+                for _ in range(opciones['consultas']):
+                    n_sintomas = sum(rng.random() < fraccion_sintomas for _ in range(ancho))
+                    sintomas = rng.sample(ids_sintomas, min(n_sintomas, len(ids_sintomas)))
+                    signos = rng.sample(ids_signos, min(ancho - n_sintomas, len(ids_signos)))
+                    inicio = time.perf_counter()
+                    obtener_base().motor.rankear(sintomas, signos, limite=opciones['limite'])
+                    latencias.append((time.perf_counter() - inicio) * 1000)
+
+            percentiles = statistics.quantiles(latencias, n=100) if len(latencias) > 1 else latencias * 99
+            fila = {
+                'enfermedades': tamano,
+                'backend': backend,
+                'ancho': ancho,
+                'p50_ms': round(percentiles[49], 4),
+                'p95_ms': round(percentiles[94], 4),
+                'p99_ms': round(percentiles[98], 4),
+                'consultas_sql_por_peticion': contador.total / max(1, len(latencias)),
+                'construccion_ms': round(construccion_ms, 1),
+                'consultas_sql_construccion': consultas_construccion,
+                'memoria_pico_mb': round(memoria_pico_mb, 2),
+            }
+            filas.append(fila)
+            self.stdout.write(
+                f"{tamano:>8} {backend:>7} ancho={ancho:<3} p50={fila['p50_ms']:.3f}ms "
+                f"p95={fila['p95_ms']:.3f}ms p99={fila['p99_ms']:.3f}ms "
+                f"sql/petición={fila['consultas_sql_por_peticion']:.1f} "
+                f"construcción={fila['construccion_ms']}ms memoria={fila['memoria_pico_mb']}MB"
+            )
+        return filas
+
+    def _commit(self):
+        # Identifica la versión del código para comparar resultados entre commits
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
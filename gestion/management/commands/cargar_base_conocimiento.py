@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+from gestion.carga_conocimiento import FORMATOS, RELACIONES, cargar, leer_archivo
+
+class Command(BaseCommand):
+    help = 'Carga enfermedades y catálogos desde un archivo JSON, YAML o CSV con operaciones en bloque'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo')
+        parser.add_argument('--formato', choices=FORMATOS, help='Por defecto se deduce de la extensión')
+        parser.add_argument('--simular', action='store_true',
+                            help='Muestra lo que cambiaría sin escribir nada en la base de datos')
+
+    def handle(self, *args, **opciones):
+        try:
+            catalogos, enfermedades = leer_archivo(opciones['archivo'], opciones['formato'])
+        except (OSError, ValueError) as error:
+            raise CommandError(str(error))
+
+        cambios = cargar(catalogos, enfermedades, simular=opciones['simular'])
+        mostrar_cambios(self, cambios, detalle=opciones['simular'])
+        if opciones['simular']:
+            self.stdout.write(self.style.WARNING('Sin cambios (--simular).'))
+        elif not cambios.vacio:
+            self.stdout.write(self.style.SUCCESS(f'✔ {len(enfermedades)} enfermedad(es) procesada(s).'))
+
+
+def mostrar_cambios(comando, cambios, detalle=True):
+    if cambios.vacio:
+        comando.stdout.write(comando.style.SUCCESS('✔ La base de conocimiento ya contiene todo el archivo.'))
+        return
+    for clave, nombres in cambios.catalogos_nuevos.items():
+        if nombres:
+            comando.stdout.write(f'+ {len(nombres)} {clave} nuevo(s)' + (f": {', '.join(nombres)}" if detalle else ''))
+    for nombre in cambios.enfermedades_nuevas:
+        comando.stdout.write(f'+ Enfermedad: {nombre}')
+    for nombre in cambios.descripciones:
+        comando.stdout.write(f'~ Descripción de: {nombre}')
+    total = sum(len(n) for nuevas in cambios.relaciones_nuevas.values() for n in nuevas.values())
+    comando.stdout.write(f'+ {total} relación(es) nueva(s) en {len(cambios.relaciones_nuevas)} enfermedad(es)')
+    if detalle:
+        for nombre, nuevas in cambios.relaciones_nuevas.items():
+            for clave in RELACIONES:
+                if nuevas.get(clave):
+                    comando.stdout.write(f"    {nombre} / {clave}: {', '.join(nuevas[clave])}")
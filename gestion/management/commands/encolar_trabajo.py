@@ -0,0 +1,35 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from gestion.trabajos import TAREAS, encolar
+
+class Command(BaseCommand):
+    help = 'Añade un trabajo a la cola de segundo plano (lo ejecuta manage.py procesar_trabajos)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('tipo', choices=sorted(TAREAS))
+        parser.add_argument('--parametros', default='{}',
+                            help='Objeto JSON, p. ej. \'{"tipo": "diagnosticos", "archivo": "/datos/diag.csv"}\'')
+        parser.add_argument('--usuario', help='Usuario al que se atribuye el trabajo')
+        parser.add_argument('--intentos', type=int, help='Máximo de intentos (por defecto, el de la tarea o settings)')
+
+    def handle(self, *args, **opciones):
+        try:
+            parametros = json.loads(opciones['parametros'])
+        except ValueError as error:
+            raise CommandError(f'--parametros no es JSON válido: {error}')
+        if not isinstance(parametros, dict):
+            raise CommandError('--parametros debe ser un objeto JSON.')
+        if opciones['intentos'] is not None and opciones['intentos'] < 1:
+            raise CommandError('--intentos debe ser mayor que 0.')
+
+        usuario = None
+        if opciones['usuario']:
+            try:
+                usuario = User.objects.get(username=opciones['usuario'])
+            except User.DoesNotExist:
+                raise CommandError(f"No existe el usuario \"{opciones['usuario']}\".")
+
+        trabajo = encolar(opciones['tipo'], parametros, usuario=usuario, max_intentos=opciones['intentos'])
+        self.stdout.write(self.style.SUCCESS(f'✔ Encolado {trabajo}.'))
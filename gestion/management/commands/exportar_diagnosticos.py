@@ -0,0 +1,35 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from gestion.exportacion import FORMATOS, diagnosticos_a_exportar, lineas
+
+class Command(BaseCommand):
+    help = 'Exporta el historial de diagnósticos en CSV o NDJSON, en streaming (memoria constante)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--formato', choices=sorted(FORMATOS), default='csv')
+        parser.add_argument('--desde', type=datetime.date.fromisoformat, help='Primer día incluido (AAAA-MM-DD)')
+        parser.add_argument('--hasta', type=datetime.date.fromisoformat, help='Último día incluido (AAAA-MM-DD)')
+        parser.add_argument('--enfermedad', type=int, action='append', dest='enfermedades',
+                            help='Id de enfermedad a incluir (se puede repetir)')
+        parser.add_argument('--salida', help='Archivo de destino (por defecto, la salida estándar)')
+        parser.add_argument('--lote', type=int, default=None, help='Diagnósticos leídos por consulta')
+
+    def handle(self, *args, **opciones):
+        if opciones['desde'] and opciones['hasta'] and opciones['desde'] > opciones['hasta']:
+            raise CommandError('--desde no puede ser posterior a --hasta.')
+
+        diagnosticos = diagnosticos_a_exportar(opciones['desde'], opciones['hasta'], opciones['enfermedades'])
+        archivo = open(opciones['salida'], 'w', encoding='utf-8', newline='') if opciones['salida'] else None
+        escribir = archivo.write if archivo else (lambda linea: self.stdout.write(linea, ending=''))
+        total = -1 if opciones['formato'] == 'csv' else 0  # la cabecera CSV no cuenta
+        try:
+            for linea in lineas(diagnosticos, opciones['formato'], opciones['lote']):
+                escribir(linea)
+                total += 1
+        finally:
+            if archivo:
+                archivo.close()
+
+        if opciones['salida']:
+            self.stdout.write(self.style.SUCCESS(f"✔ {total} diagnóstico(s) exportado(s) a {opciones['salida']}."))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+from gestion.sintetico import DISTRIBUCIONES, generar_base_sintetica
+
+class Command(BaseCommand):
+    help = 'Genera una base de conocimiento sintética (enfermedades, síntomas y signos) para pruebas de rendimiento'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--enfermedades', type=int, default=1000, help='Número de enfermedades (N)')
+        parser.add_argument('--sintomas', type=int, default=500, help='Número de síntomas')
+        parser.add_argument('--signos', type=int, default=300, help='Número de signos')
+        parser.add_argument('--distribucion', choices=DISTRIBUCIONES, default='poisson',
+                            help='Distribución del nº de características por enfermedad')
+        parser.add_argument('--media', type=int, default=8, help='Características por enfermedad (media)')
+        parser.add_argument('--zipf', type=float, default=1.0,
+                            help='Exponente de popularidad de las características (0 = uniforme)')
+        parser.add_argument('--semilla', type=int, default=None)
+        parser.add_argument('--prefijo', default='Sintético', help='Prefijo de los nombres generados')
+
+    def handle(self, *args, **opciones):
+        self.stdout.write(self.style.WARNING('Generando base de conocimiento sintética...'))
+        try:
+            ids_sintomas, ids_signos = generar_base_sintetica(
+                opciones['enfermedades'], opciones['sintomas'], opciones['signos'],
+                distribucion=opciones['distribucion'], media=opciones['media'],
+                zipf=opciones['zipf'], semilla=opciones['semilla'], prefijo=opciones['prefijo'],
+            )
+        except IntegrityError:
+            raise CommandError(f"Ya existen enfermedades con el prefijo '{opciones['prefijo']}'. Use --prefijo.")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✔ {opciones['enfermedades']} enfermedades, {len(ids_sintomas)} síntomas y {len(ids_signos)} signos generados."
+        ))
@@ -0,0 +1,50 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from gestion.importacion import FORMATOS, TIPOS, importar
+
+class Command(BaseCommand):
+    help = 'Importa pacientes, diagnósticos o tratamientos desde CSV/JSONL por lotes (reanudable)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('tipo', choices=TIPOS)
+        parser.add_argument('archivo', help='Archivo .csv o .jsonl')
+        parser.add_argument('--formato', choices=FORMATOS, help='Por defecto se deduce de la extensión')
+        parser.add_argument('--lote', type=int, default=None, help='Registros por transacción')
+        parser.add_argument('--reiniciar', action='store_true',
+                            help='Ignora el progreso guardado y empieza desde el primer registro')
+        parser.add_argument('--errores', help='Guarda los registros rechazados en este archivo (JSONL)')
+
+    def handle(self, *args, **opciones):
+        archivo_errores = open(opciones['errores'], 'w', encoding='utf-8') if opciones['errores'] else None
+        mostrados = []
+
+        def al_error(error):
+            if archivo_errores:
+                archivo_errores.write(json.dumps(error._asdict(), ensure_ascii=False) + '\n')
+            elif len(mostrados) < 20:
+                mostrados.append(error)
+                self.stdout.write(self.style.WARNING(f'- Registro {error.numero}: {error.mensaje}'))
+
+        def al_avanzar(procesados, importados, segundos):
+            self.stdout.write(f'  {procesados} registros, {importados} importados ({procesados / max(segundos, 1e-9):.0f} registros/s)')
+
+        try:
+            resultado = importar(
+                opciones['archivo'], opciones['tipo'], formato=opciones['formato'], tam_lote=opciones['lote'],
+                reiniciar=opciones['reiniciar'], al_error=al_error, al_avanzar=al_avanzar,
+            )
+        except (OSError, ValueError) as error:
+            raise CommandError(str(error))
+        finally:
+            if archivo_errores:
+                archivo_errores.close()
+
+        if resultado.omitidos:
+            self.stdout.write(self.style.WARNING(f'Reanudado: {resultado.omitidos} registro(s) ya procesados se omitieron.'))
+        if not resultado.registros and resultado.omitidos:
+            self.stdout.write(self.style.WARNING('Nada nuevo que importar (use --reiniciar para repetir el archivo).'))
+        self.stdout.write(self.style.SUCCESS(
+            f'✔ {resultado.importados} importado(s), {resultado.errores} rechazado(s) en {resultado.segundos:.1f} s '
+            f'({resultado.registros / max(resultado.segundos, 1e-9):.0f} registros/s).'
+        ))
@@ -0,0 +1,124 @@
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from gestion import trabajos
+from gestion.models import Trabajo
+
+MODOS = ('hilos', 'procesos')
+
+
+class Command(BaseCommand):
+    help = ('Ejecuta los trabajos en segundo plano de la cola (tabla Trabajo) con un grupo de hilos o de '
+            'procesos. Se pueden lanzar varios a la vez, en la misma máquina o en otras con acceso a la base '
+            'de datos. SIGTERM o Ctrl+C dejan de reclamar trabajos y esperan a que acaben los que están en curso.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrencia', type=int, help="Trabajos simultáneos (por defecto, TRABAJOS['CONCURRENCIA'])")
+        parser.add_argument('--modo', choices=MODOS,
+                            help="'hilos' (tareas que esperan a la base de datos o al disco) o 'procesos' "
+                                 "(tareas de CPU: sin GIL compartido). Por defecto, TRABAJOS['MODO']")
+        parser.add_argument('--agotar', action='store_true',
+                            help='Termina cuando no quedan trabajos disponibles ni en curso (cron, pruebas)')
+
+    def handle(self, *args, **opciones):
+        config = trabajos.configuracion()
+        concurrencia = opciones['concurrencia'] or config['concurrencia']
+        modo = opciones['modo'] or config['modo']
+        if concurrencia < 1:
+            raise CommandError('--concurrencia debe ser mayor que 0.')
+        if modo not in MODOS:
+            raise CommandError(f"TRABAJOS['MODO'] debe ser uno de: {', '.join(MODOS)}.")
+
+        self.trabajador = f'{socket.gethostname()}:{os.getpid()}'[:100]
+        self.parar = threading.Event()
+        for senal in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(senal, self._al_recibir_senal)
+
+        self.stdout.write(self.style.WARNING(
+            f'Trabajador {self.trabajador}: {concurrencia} {modo} (Ctrl+C para terminar)...'
+        ))
+        completados = fallidos = 0
+        grupo = self._grupo(modo, concurrencia)
+        en_curso = {}  # futuro -> id del trabajo
+        ultima_revision = 0.0
+        try:
+            while True:
+                if time.monotonic() - ultima_revision >= config['intervalo']:
+                    ultima_revision = time.monotonic()
+                    trabajos.latir(self.trabajador, list(en_curso.values()))
+                    devueltos, perdidos = trabajos.recuperar_abandonados(config)
+                    if devueltos or perdidos:
+                        self.stdout.write(self.style.WARNING(
+                            f'Abandonados: {devueltos} devuelto(s) a la cola, {perdidos} fallido(s).'
+                        ))
+
+                while not self.parar.is_set() and len(en_curso) < concurrencia:
+                    trabajo = trabajos.reclamar(self.trabajador)
+                    if trabajo is None:
+                        break
+                    self.stdout.write(f'→ {trabajo} (intento {trabajo.intentos}/{trabajo.max_intentos})')
+                    en_curso[grupo.submit(trabajos.ejecutar_trabajo, trabajo.id, self.trabajador)] = trabajo.id
+
+                if not en_curso:
+                    if self.parar.is_set() or opciones['agotar']:
+                        break
+                    self.parar.wait(config['intervalo'])
+                    continue
+
+                hechos, _ = wait(en_curso, timeout=config['intervalo'], return_when=FIRST_COMPLETED)
+                roto = False
+                for futuro in hechos:
+                    id_trabajo = en_curso.pop(futuro)
+                    try:
+                        estado = futuro.result()
+                    except BrokenProcessPool:
+                        # Un proceso murió (memoria, señal): cuenta como intento fallido
+                        roto = True
+                        estado = trabajos.registrar_fallo(id_trabajo, self.trabajador, 'El proceso del trabajo terminó inesperadamente.')
+                    except (Exception, KeyboardInterrupt) as error:
+                        # KeyboardInterrupt: Ctrl+C llegó a un proceso hijo en mitad de la tarea
+                        estado = trabajos.registrar_fallo(id_trabajo, self.trabajador, repr(error))
+                    completados += estado == Trabajo.COMPLETADO
+                    fallidos += estado == Trabajo.FALLIDO
+                    self._informar(id_trabajo, estado)
+                if roto:
+                    grupo.shutdown(wait=False, cancel_futures=True)
+                    grupo = self._grupo(modo, concurrencia)
+        finally:
+            grupo.shutdown(wait=True)
+
+        self.stdout.write(self.style.SUCCESS(f'✔ {completados} trabajo(s) completado(s), {fallidos} fallido(s).'))
+
+    def _grupo(self, modo, concurrencia):
+        if modo == 'hilos':
+            return ThreadPoolExecutor(max_workers=concurrencia, thread_name_prefix='trabajo')
+        # 'spawn': procesos limpios, sin heredar conexiones abiertas ni hilos del proceso principal.
+        # En modo procesos, Ctrl+C en la terminal llega también a los hijos: sus trabajos en curso
+        # se cortan y vuelven a la cola como un intento fallido (SIGTERM solo llega al principal).
+        connections.close_all()
+        return ProcessPoolExecutor(
+            max_workers=concurrencia, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup,
+        )
+
+    def _informar(self, id_trabajo, estado):
+        if estado == Trabajo.COMPLETADO:
+            self.stdout.write(self.style.SUCCESS(f'✔ Trabajo #{id_trabajo} completado.'))
+        elif estado == Trabajo.FALLIDO:
+            self.stdout.write(self.style.ERROR(f'✘ Trabajo #{id_trabajo} fallido.'))
+        elif estado == Trabajo.PENDIENTE:
+            disponible = Trabajo.objects.filter(id=id_trabajo).values_list('disponible_desde', flat=True).first()
+            self.stdout.write(self.style.WARNING(f'↻ Trabajo #{id_trabajo} se reintentará desde {disponible:%H:%M:%S}.'))
+
+    def _al_recibir_senal(self, senal, marco):
+        if not self.parar.is_set():
+            self.stderr.write('Terminando: no se reclaman más trabajos y se esperan los que están en curso.')
+            self.parar.set()
@@ -0,0 +1,179 @@
+import http.client
+import json
+import platform
+import queue
+import random
+import statistics
+import subprocess
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.crypto import get_random_string
+from gestion.models import Signo, Sintoma
+
+RUTAS = '/dashboard/,/pacientes/,/enfermedades/,/diagnosticos/'
+RUTA_LOTE = '/inferencia/api/lote/'
+
+
+class Command(BaseCommand):
+    help = ('Prueba de carga contra un servidor en marcha (WSGI o ASGI, ver README): peticiones por segundo '
+            'y latencias p50/p95/p99 por ruta con N clientes concurrentes. Usa una sesión temporal del '
+            'usuario indicado, creada en la misma base de datos que usa el servidor.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Servidor a probar')
+        parser.add_argument('--rutas', default=RUTAS, help='Rutas GET separadas por comas')
+        parser.add_argument('--concurrencia', type=int, default=50, help='Clientes simultáneos')
+        parser.add_argument('--peticiones', type=int, default=2000, help='Peticiones en total')
+        parser.add_argument('--lote-casos', type=int, default=0,
+                            help=f'Si es > 0, añade POST a {RUTA_LOTE} con este nº de casos por petición')
+        parser.add_argument('--usuario', help='Usuario con el que se autentican los clientes (por defecto, el primer staff)')
+        parser.add_argument('--etiqueta', default='', help='Nombre de la ejecución en el JSON (p. ej. wsgi, asgi)')
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--salida', default='prueba_carga.json', help='Archivo JSON de resultados')
+
+    def handle(self, *args, **opciones):
+        url = urlsplit(opciones['url'])
+        if url.scheme not in ('http', 'https') or not url.hostname:
+            raise CommandError(f"URL inválida: {opciones['url']}")
+        if opciones['concurrencia'] < 1 or opciones['peticiones'] < 1:
+            raise CommandError('--concurrencia y --peticiones deben ser mayores que 0.')
+
+        usuario = self._usuario(opciones['usuario'])
+        sesion = SessionStore()
+        sesion[SESSION_KEY] = str(usuario.pk)
+        sesion[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+        sesion[HASH_SESSION_KEY] = usuario.get_session_auth_hash()
+        sesion.create()
+        csrf = get_random_string(32)
+        cabeceras = {
+            'Cookie': f'{settings.SESSION_COOKIE_NAME}={sesion.session_key}; {settings.CSRF_COOKIE_NAME}={csrf}',
+            'X-CSRFToken': csrf,
+            'Referer': opciones['url'],
+        }
+
+        rng = random.Random(opciones['semilla'])
+        peticiones = [('GET', ruta.strip(), None) for ruta in opciones['rutas'].split(',') if ruta.strip()]
+        if opciones['lote_casos'] > 0:
+            peticiones.append(('POST', RUTA_LOTE, self._cuerpo_lote(opciones['lote_casos'], rng)))
+        if not peticiones:
+            raise CommandError('No hay rutas que probar.')
+
+        cola = queue.SimpleQueue()
+        for i in range(opciones['peticiones']):
+            cola.put(peticiones[i % len(peticiones)])
+        muestras = []
+        hilos = [
+            threading.Thread(target=self._cliente, args=(url, cabeceras, cola, muestras), daemon=True)
+            for _ in range(opciones['concurrencia'])
+        ]
+        self.stdout.write(self.style.WARNING(
+            f"{opciones['peticiones']} peticiones, {opciones['concurrencia']} clientes contra {opciones['url']}..."
+        ))
+        inicio = time.perf_counter()
+        try:
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+        finally:
+            sesion.delete()
+        duracion = time.perf_counter() - inicio
+
+        informe = {
+            'fecha': datetime.now(timezone.utc).isoformat(),
+            'etiqueta': opciones['etiqueta'],
+            'commit': self._commit(),
+            'python': platform.python_version(),
+            'parametros': {k: opciones[k] for k in ('url', 'concurrencia', 'peticiones', 'lote_casos')},
+            'duracion_s': round(duracion, 3),
+            'peticiones_por_segundo': round(len(muestras) / duracion, 1),
+            'rutas': self._resumen(muestras),
+        }
+        for fila in informe['rutas']:
+            self.stdout.write(
+                f"{fila['metodo']:>4} {fila['ruta']:<28} n={fila['peticiones']:<6} errores={fila['errores']:<5} "
+                f"p50={fila['p50_ms']:.1f}ms p95={fila['p95_ms']:.1f}ms p99={fila['p99_ms']:.1f}ms"
+            )
+        self.stdout.write(f"Total: {informe['peticiones_por_segundo']} peticiones/s en {informe['duracion_s']} s")
+        with open(opciones['salida'], 'w', encoding='utf-8') as archivo:
+            json.dump(informe, archivo, indent=2, ensure_ascii=False)
+        self.stdout.write(self.style.SUCCESS(f"✔ Resultados guardados en {opciones['salida']}"))
+
+    def _usuario(self, nombre):
+        if nombre:
+            try:
+                return User.objects.get(username=nombre)
+            except User.DoesNotExist:
+                raise CommandError(f'No existe el usuario "{nombre}".')
+        usuario = User.objects.filter(is_staff=True, is_active=True).order_by('id').first()
+        if usuario is None:
+            raise CommandError('No hay usuarios staff: indica uno con --usuario.')
+        return usuario
+
+    def _cuerpo_lote(self, n_casos, rng):
+        ids_sintomas = list(Sintoma.objects.values_list('id', flat=True))
+        ids_signos = list(Signo.objects.values_list('id', flat=True))
+        casos = [
+            {'sintomas': rng.sample(ids_sintomas, min(3, len(ids_sintomas))),
+             'signos': rng.sample(ids_signos, min(2, len(ids_signos)))}
+            for _ in range(n_casos)
+        ]
+        return json.dumps({'casos': casos, 'limit': 10}).encode()
+
+    def _cliente(self, url, cabeceras, cola, muestras):
+        # Una conexión keep-alive por cliente; se reabre si el servidor la cierra
+        clase = http.client.HTTPSConnection if url.scheme == 'https' else http.client.HTTPConnection
+        conexion = clase(url.hostname, url.port, timeout=60)
+        while True:
+            try:
+                metodo, ruta, cuerpo = cola.get_nowait()
+            except queue.Empty:
+                break
+            extra = {'Content-Type': 'application/json'} if cuerpo else {}
+            inicio = time.perf_counter()
+            try:
+                conexion.request(metodo, ruta, body=cuerpo, headers={**cabeceras, **extra})
+                respuesta = conexion.getresponse()
+                respuesta.read()
+                estado = respuesta.status
+            except (OSError, http.client.HTTPException):
+                conexion.close()
+                estado = None
+            muestras.append((metodo, ruta, estado, (time.perf_counter() - inicio) * 1000))
+        conexion.close()
+
+    def _resumen(self, muestras):
+        por_ruta = {}
+        for metodo, ruta, estado, ms in muestras:
+            por_ruta.setdefault((metodo, ruta), []).append((estado, ms))
+        filas = []
+        for (metodo, ruta), datos in por_ruta.items():
+            latencias = [ms for _, ms in datos]
+            percentiles = statistics.quantiles(latencias, n=100) if len(latencias) > 1 else latencias * 99
+            filas.append({
+                'metodo': metodo,
+                'ruta': ruta,
+                'peticiones': len(datos),
+                # Una redirección al login también cuenta: la sesión no sirvió
+                'errores': sum(1 for estado, _ in datos if estado != 200),
+                'p50_ms': round(percentiles[49], 2),
+                'p95_ms': round(percentiles[94], 2),
+                'p99_ms': round(percentiles[98], 2),
+            })
+        return filas
+
+    def _commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from gestion.contadores import reconciliar
+
+class Command(BaseCommand):
+    help = 'Compara los contadores del panel con un conteo real y corrige las diferencias'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verificar', action='store_true',
+                            help='Solo informa de las diferencias, sin corregirlas')
+
+    def handle(self, *args, **opciones):
+        diferencias = reconciliar(corregir=not opciones['verificar'])
+        if not diferencias:
+            self.stdout.write(self.style.SUCCESS('✔ Todos los contadores coinciden con los datos.'))
+            return
+
+        for nombre, (guardado, real) in diferencias.items():
+            self.stdout.write(self.style.WARNING(f'- {nombre}: guardado {guardado}, real {real}'))
+        if opciones['verificar']:
+            self.stdout.write(self.style.WARNING('Sin cambios (--verificar).'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'✔ {len(diferencias)} contador(es) corregido(s).'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from gestion.analitica import reconstruir
+from gestion.models import ResumenDiarioDiagnostico, ResumenDiarioSintoma
+
+class Command(BaseCommand):
+    help = 'Recalcula desde el historial los resúmenes diarios de analítica (tras cargas masivas sin signals)'
+
+    def handle(self, *args, **opciones):
+        reconstruir()
+        self.stdout.write(self.style.SUCCESS(
+            f'✔ Resúmenes reconstruidos: {ResumenDiarioDiagnostico.objects.count()} fila(s) de diagnósticos, '
+            f'{ResumenDiarioSintoma.objects.count()} de síntomas.'
+        ))
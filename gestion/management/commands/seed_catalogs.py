@@ -1,5 +1,5 @@
 from django.core.management.base import BaseCommand
-from gestion.models import Sintoma, Signo, PruebaLaboratorio, PruebaPosMortem
+from gestion.carga_conocimiento import cargar, preparar_datos
 
 class Command(BaseCommand):
     help = 'Carga datos iniciales (Seed) para los catálogos médicos'
@@ -13,10 +13,6 @@ class Command(BaseCommand):
             "Visión borrosa", "Dolor abdominal", "Pérdida del olfato", "Dificultad para respirar",
             "Dolor en las articulaciones", "Insomnio", "Ansiedad", "Escalofríos"
         ]
-        
-        for nombre in sintomas:
-            Sintoma.objects.get_or_create(nombre=nombre)
-        self.stdout.write(self.style.SUCCESS(f'✔ {len(sintomas)} Síntomas cargados.'))
 
         # --- 2. SIGNOS (Lo que mide el médico - Objetivo) ---
         signos = [
@@ -25,10 +21,6 @@ class Command(BaseCommand):
             "Cianosis (Coloración azul)", "Dilatación de pupilas", "Pérdida de peso rápida"
         ]
 
-        for nombre in signos:
-            Signo.objects.get_or_create(nombre=nombre)
-        self.stdout.write(self.style.SUCCESS(f'✔ {len(signos)} Signos cargados.'))
-
         # --- 3. PRUEBAS DE LABORATORIO ---
         pruebas_lab = [
             "Hemograma Completo", "Prueba de Glucosa en Sangre", "Perfil Lipídico",
@@ -37,10 +29,6 @@ class Command(BaseCommand):
             "Prueba de PCR (Viral)", "Biopsia de Tejido"
         ]   
 
-        for nombre in pruebas_lab:
-            PruebaLaboratorio.objects.get_or_create(nombre=nombre)
-        self.stdout.write(self.style.SUCCESS(f'✔ {len(pruebas_lab)} Pruebas de Laboratorio cargadas.'))
-
         # --- 4. PRUEBAS POS-MORTEM ---
         pruebas_pm = [
             "Autopsia Clínica Completa", "Examen Toxicológico", "Histopatología de Órganos",
@@ -48,8 +36,13 @@ class Command(BaseCommand):
             "Cultivo Microbiológico Post-mortem"
         ]
 
-        for nombre in pruebas_pm:
-            PruebaPosMortem.objects.get_or_create(nombre=nombre)
+        # Una sola carga en bloque (y un solo incremento de versión de la base de conocimiento)
+        cargar(*preparar_datos({
+            'sintomas': sintomas, 'signos': signos, 'pruebas': pruebas_lab, 'postmortem': pruebas_pm,
+        }))
+        self.stdout.write(self.style.SUCCESS(f'✔ {len(sintomas)} Síntomas cargados.'))
+        self.stdout.write(self.style.SUCCESS(f'✔ {len(signos)} Signos cargados.'))
+        self.stdout.write(self.style.SUCCESS(f'✔ {len(pruebas_lab)} Pruebas de Laboratorio cargadas.'))
         self.stdout.write(self.style.SUCCESS(f'✔ {len(pruebas_pm)} Pruebas Pos-mortem cargadas.'))
 
         self.stdout.write(self.style.SUCCESS('--------------------------------------'))
@@ -1,6 +1,5 @@
 from django.core.management.base import BaseCommand
-from django.db import transaction
-from gestion.models import Enfermedad, Sintoma, Signo, PruebaLaboratorio, PruebaPosMortem
+from gestion.carga_conocimiento import cargar, preparar_datos
 
 class Command(BaseCommand):
     help = 'Carga enfermedades y sus relaciones (Síntomas, Signos, Pruebas)'
@@ -52,33 +51,12 @@ class Command(BaseCommand):
             }
         ]
 
-        with transaction.atomic():
-            for data in base_conocimiento:
-                enfermedad, created = Enfermedad.objects.get_or_create(
-                    nombre=data["nombre"],
-                    defaults={"descripcion": data["descripcion"]}
-                )
-                
-                accion = "Creada" if created else "Actualizada"
-                self.stdout.write(f"- Procesando: {enfermedad.nombre} ({accion})")
-
-                for s_nombre in data["sintomas"]:
-                    obj, _ = Sintoma.objects.get_or_create(nombre=s_nombre)
-                    enfermedad.sintomas.add(obj)
-
-                for s_nombre in data["signos"]:
-                    obj, _ = Signo.objects.get_or_create(nombre=s_nombre)
-                    enfermedad.signos.add(obj)
-
-                for p_nombre in data["pruebas"]:
-                    obj, _ = PruebaLaboratorio.objects.get_or_create(nombre=p_nombre)
-                    enfermedad.pruebas_lab.add(obj)
-
-                for pm_nombre in data["postmortem"]:
-                    obj, _ = PruebaPosMortem.objects.get_or_create(nombre=pm_nombre)
-                    enfermedad.pruebas_postmortem.add(obj)
-
-                enfermedad.save()
+        # Catálogos, enfermedades y relaciones en bloque (crea los nombres que falten);
+        # la versión de la base de conocimiento se incrementa una sola vez al terminar
+        cambios = cargar(*preparar_datos({'enfermedades': base_conocimiento}))
+        for data in base_conocimiento:
+            accion = "Creada" if data["nombre"] in cambios.enfermedades_nuevas else "Actualizada"
+            self.stdout.write(f"- Procesando: {data['nombre']} ({accion})")
 
         self.stdout.write(self.style.SUCCESS('--------------------------------------------------'))
         self.stdout.write(self.style.SUCCESS(f'Se han procesado {len(base_conocimiento)} enfermedades con sus relaciones.'))
@@ -0,0 +1,31 @@
+import sqlite3
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from gestion.base_datos import ALIAS_LECTURA
+
+
+class Command(BaseCommand):
+    help = "Copia la base de datos principal sobre la réplica de lectura (alias 'lectura') cuando es otro archivo SQLite"
+
+    def handle(self, *args, **opciones):
+        if ALIAS_LECTURA not in connections.settings:
+            raise CommandError(f"No hay alias '{ALIAS_LECTURA}' en DATABASES.")
+        principal = connections[DEFAULT_DB_ALIAS]
+        replica = connections[ALIAS_LECTURA]
+        if principal.vendor != 'sqlite' or replica.vendor != 'sqlite':
+            raise CommandError('Solo aplica a SQLite; con otros motores usa la replicación del servidor.')
+
+        origen = Path(principal.settings_dict['NAME']).resolve()
+        destino = Path(replica.settings_dict['NAME']).resolve()
+        if origen == destino:
+            self.stdout.write(self.style.SUCCESS('✔ La réplica usa el mismo archivo que la principal; no hay nada que copiar.'))
+            return
+
+        # API de copia en línea de SQLite: copia consistente sin detener la aplicación
+        replica.close()
+        with sqlite3.connect(origen) as fuente, sqlite3.connect(destino) as copia:
+            fuente.backup(copia)
+        self.stdout.write(self.style.SUCCESS(f'✔ Réplica actualizada: {origen} → {destino}'))
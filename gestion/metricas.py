@@ -0,0 +1,210 @@
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from . import cache_inferencia
+
+# ==========================================
+# MÉTRICAS POR VISTA (formato de texto de Prometheus)
+# MetricasMiddleware (middleware.py) mide cada petición y la anota bajo el
+# nombre de su URL: latencia, nº de consultas SQL, tiempo total en SQL y
+# tamaño de la respuesta. Las consultas se cuentan con un execute_wrapper que
+# se instala en cada conexión al abrirse y lee la petición en curso de un
+# ContextVar: funciona con cualquier alias de base de datos y también cuando
+# el ORM corre en otro hilo (sync_to_async copia el contexto).
+# Coste por petición: dos perf_counter, una búsqueda en dict y sumas bajo un lock.
+# En respuestas en streaming se mide hasta que la vista devuelve la respuesta.
+# Los valores son por proceso: con varios workers, cada uno expone los suyos.
+# Configuración en settings.METRICAS:
+#   ACTIVAS:               False desactiva la medición (el middleware no hace nada)
+#   PRESUPUESTO_CONSULTAS: nº de consultas a partir del cual se registra un aviso (None = nunca)
+#   TOKEN:                 si se define, /metrics acepta "Authorization: Bearer <TOKEN>"
+#                          además de usuarios staff
+# ==========================================
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+BUCKETS_BYTES = (1_000, 10_000, 50_000, 100_000, 500_000, 1_000_000, 5_000_000)
+
+SIN_RUTA = '<sin_ruta>'  # Peticiones que no resolvieron ninguna URL (404)
+# Cualquier otro método (lo elige el cliente) se agrupa en OTRO_METODO para que
+# un cliente no pueda crear series nuevas sin límite enviando métodos inventados
+METODOS_HTTP = frozenset(('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS', 'TRACE', 'CONNECT'))
+OTRO_METODO = 'OTHER'
+
+
+def configuracion():
+    config = getattr(settings, 'METRICAS', {})
+    return config.get('ACTIVAS', True), config.get('PRESUPUESTO_CONSULTAS'), config.get('TOKEN')
+
+
+class MedicionSolicitud:
+    # Lo que acumula el execute_wrapper durante una petición
+    __slots__ = ('consultas', 'segundos_sql')
+
+    def __init__(self):
+        self.consultas = 0
+        self.segundos_sql = 0.0
+
+
+solicitud_actual = ContextVar('metricas_solicitud_actual', default=None)
+
+
+def cronometrar_consulta(execute, sql, params, many, context):
+    medicion = solicitud_actual.get()
+    if medicion is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        medicion.consultas += 1
+        medicion.segundos_sql += time.perf_counter() - inicio
+
+
+@receiver(connection_created)
+def instalar_cronometro(sender, connection, **kwargs):
+    # La lista de wrappers sobrevive a las reconexiones: se añade una sola vez. Al fondo de la
+    # pila: si la conexión se abre dentro de un "with connection.execute_wrapper(x)", su pop()
+    # al salir debe quitar x y no el cronómetro
+    if cronometrar_consulta not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, cronometrar_consulta)
+
+
+class Histograma:
+    __slots__ = ('limites', 'conteos', 'suma', 'total')
+
+    def __init__(self, limites):
+        self.limites = limites
+        self.conteos = [0] * (len(limites) + 1)  # el último es +Inf
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.conteos[bisect.bisect_left(self.limites, valor)] += 1
+        self.suma += valor
+        self.total += 1
+
+    def acumulados(self):
+        acumulado = 0
+        for limite, conteo in zip(self.limites + (float('inf'),), self.conteos):
+            acumulado += conteo
+            yield limite, acumulado
+
+
+class MetricasVista:
+    __slots__ = ('solicitudes', 'latencia', 'consultas', 'segundos_sql', 'bytes', 'excedidas')
+
+    def __init__(self):
+        self.solicitudes = {}  # (metodo, estado) -> nº
+        self.latencia = Histograma(BUCKETS_SEGUNDOS)
+        self.consultas = Histograma(BUCKETS_CONSULTAS)
+        self.segundos_sql = 0.0
+        self.bytes = Histograma(BUCKETS_BYTES)
+        self.excedidas = 0
+
+
+class Registro:
+    def __init__(self):
+        self._vistas = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, vista, metodo, estado, segundos, medicion, tam_respuesta, excedida):
+        with self._lock:
+            metricas = self._vistas.get(vista)
+            if metricas is None:
+                metricas = self._vistas[vista] = MetricasVista()
+            clave = (metodo, estado)
+            metricas.solicitudes[clave] = metricas.solicitudes.get(clave, 0) + 1
+            metricas.latencia.observar(segundos)
+            metricas.consultas.observar(medicion.consultas)
+            metricas.segundos_sql += medicion.segundos_sql
+            if tam_respuesta is not None:
+                metricas.bytes.observar(tam_respuesta)
+            if excedida:
+                metricas.excedidas += 1
+
+    def limpiar(self):
+        with self._lock:
+            self._vistas.clear()
+
+    def exposicion(self):
+        """Texto en formato de exposición de Prometheus (version 0.0.4)."""
+        with self._lock:
+            vistas = sorted(self._vistas.items())
+            lineas = []
+
+            def cabecera(nombre, tipo, ayuda):
+                lineas.append(f'# HELP {nombre} {ayuda}')
+                lineas.append(f'# TYPE {nombre} {tipo}')
+
+            def histograma(nombre, obtener):
+                for vista, metricas in vistas:
+                    h = obtener(metricas)
+                    if not h.total:
+                        continue
+                    etiqueta = _etiqueta(vista)
+                    for limite, acumulado in h.acumulados():
+                        le = '+Inf' if limite == float('inf') else repr(limite)
+                        lineas.append(f'{nombre}_bucket{{vista="{etiqueta}",le="{le}"}} {acumulado}')
+                    lineas.append(f'{nombre}_sum{{vista="{etiqueta}"}} {h.suma!r}')
+                    lineas.append(f'{nombre}_count{{vista="{etiqueta}"}} {h.total}')
+
+            cabecera('gestion_http_solicitudes_total', 'counter', 'Peticiones atendidas por vista, método y estado HTTP.')
+            for vista, metricas in vistas:
+                for (metodo, estado), total in sorted(metricas.solicitudes.items()):
+                    lineas.append(
+                        f'gestion_http_solicitudes_total{{vista="{_etiqueta(vista)}",metodo="{metodo}",estado="{estado}"}} {total}'
+                    )
+            cabecera('gestion_http_duracion_segundos', 'histogram', 'Latencia de la petición completa.')
+            histograma('gestion_http_duracion_segundos', lambda m: m.latencia)
+            cabecera('gestion_sql_consultas_por_solicitud', 'histogram', 'Consultas SQL ejecutadas por petición.')
+            histograma('gestion_sql_consultas_por_solicitud', lambda m: m.consultas)
+            cabecera('gestion_sql_duracion_segundos_total', 'counter', 'Tiempo total dentro de consultas SQL.')
+            for vista, metricas in vistas:
+                lineas.append(f'gestion_sql_duracion_segundos_total{{vista="{_etiqueta(vista)}"}} {metricas.segundos_sql!r}')
+            cabecera('gestion_http_respuesta_bytes', 'histogram', 'Tamaño del cuerpo de la respuesta (sin streaming).')
+            histograma('gestion_http_respuesta_bytes', lambda m: m.bytes)
+            cabecera('gestion_presupuesto_consultas_excedido_total', 'counter',
+                     'Peticiones que superaron METRICAS["PRESUPUESTO_CONSULTAS"].')
+            for vista, metricas in vistas:
+                lineas.append(f'gestion_presupuesto_consultas_excedido_total{{vista="{_etiqueta(vista)}"}} {metricas.excedidas}')
+        return '\n'.join(lineas) + '\n'
+
+
+def exposicion_cache_inferencia():
+    """Aciertos, fallos y expulsiones de la memorización de rankings (cache_inferencia.py)."""
+    datos = cache_inferencia.estadisticas()
+    local, compartida = datos['local'], datos['compartida']
+    lineas = [
+        '# HELP gestion_inferencia_cache_aciertos_total Rankings servidos desde la caché, por nivel.',
+        '# TYPE gestion_inferencia_cache_aciertos_total counter',
+        f'gestion_inferencia_cache_aciertos_total{{nivel="local"}} {local["aciertos"]}',
+        f'gestion_inferencia_cache_aciertos_total{{nivel="compartida"}} {compartida["aciertos"]}',
+        '# HELP gestion_inferencia_cache_fallos_total Consultas a la caché sin entrada válida, por nivel.',
+        '# TYPE gestion_inferencia_cache_fallos_total counter',
+        f'gestion_inferencia_cache_fallos_total{{nivel="local"}} {local["fallos"]}',
+        f'gestion_inferencia_cache_fallos_total{{nivel="compartida"}} {compartida["fallos"]}',
+        '# HELP gestion_inferencia_cache_expulsiones_total Entradas expulsadas del LRU local por falta de capacidad.',
+        '# TYPE gestion_inferencia_cache_expulsiones_total counter',
+        f'gestion_inferencia_cache_expulsiones_total {local["expulsiones"]}',
+        '# HELP gestion_inferencia_cache_entradas Entradas en el LRU local.',
+        '# TYPE gestion_inferencia_cache_entradas gauge',
+        f'gestion_inferencia_cache_entradas {local["entradas"]}',
+        '# HELP gestion_inferencia_cache_capacidad Capacidad configurada del LRU local.',
+        '# TYPE gestion_inferencia_cache_capacidad gauge',
+        f'gestion_inferencia_cache_capacidad {local["capacidad"]}',
+    ]
+    return '\n'.join(lineas) + '\n'
+
+
+def _etiqueta(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registro = Registro()
@@ -0,0 +1,162 @@
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+from django.urls import Resolver404, get_resolver
+
+from . import metricas, perfilador
+
+logger = logging.getLogger(__name__)
+
+# Ambos middlewares funcionan en modo síncrono (WSGI) y asíncrono (ASGI): si uno
+# fuera solo síncrono, Django pasaría toda la cadena a un hilo en cada petición
+# y las vistas async def perderían la ventaja.
+
+
+# ==========================================
+# MÉTRICAS POR VISTA (ver metricas.py)
+# Conviene ponerlo al principio de MIDDLEWARE para que la latencia incluya
+# al resto de middlewares (sesión, autenticación, ...).
+# ==========================================
+
+class MetricasMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        activas, presupuesto, _ = metricas.configuracion()
+        if not activas:
+            return self.get_response(request)
+
+        medicion = metricas.MedicionSolicitud()
+        testigo = metricas.solicitud_actual.set(medicion)
+        inicio = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            metricas.solicitud_actual.reset(testigo)
+        self._registrar(request, response, time.perf_counter() - inicio, medicion, presupuesto)
+        return response
+
+    async def __acall__(self, request):
+        activas, presupuesto, _ = metricas.configuracion()
+        if not activas:
+            return await self.get_response(request)
+
+        # Cada petición ASGI corre en su propia tarea, así que el ContextVar no se mezcla
+        # entre peticiones; sync_to_async lo copia al hilo donde se ejecuta el ORM
+        medicion = metricas.MedicionSolicitud()
+        testigo = metricas.solicitud_actual.set(medicion)
+        inicio = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metricas.solicitud_actual.reset(testigo)
+        self._registrar(request, response, time.perf_counter() - inicio, medicion, presupuesto)
+        return response
+
+    def _registrar(self, request, response, segundos, medicion, presupuesto):
+        coincidencia = getattr(request, 'resolver_match', None)
+        vista = coincidencia.view_name if coincidencia else metricas.SIN_RUTA
+        excedida = presupuesto is not None and medicion.consultas > presupuesto
+        if excedida:
+            logger.warning(
+                'La vista %s ejecutó %d consultas SQL (presupuesto: %d) en %s %s',
+                vista, medicion.consultas, presupuesto, request.method, request.path,
+            )
+        tam = None if response.streaming else len(response.content)
+        metodo = request.method if request.method in metricas.METODOS_HTTP else metricas.OTRO_METODO
+        metricas.registro.registrar(vista, metodo, response.status_code, segundos, medicion, tam, excedida)
+
+
+# ==========================================
+# PERFILADOR DE PETICIONES (ver perfilador.py)
+# Va al final de MIDDLEWARE: arranca en process_view, cuando ya se conoce el
+# nombre de la vista, así que el perfil cubre la vista y no los middlewares.
+# En respuestas en streaming solo se perfila hasta que la vista devuelve la respuesta.
+# Con ASGI, Django ejecuta process_view en el hilo síncrono compartido, que es
+# donde corren las vistas síncronas. Las vistas async def corren en el hilo del
+# bucle de eventos: para ellas la captura se inicia y se detiene en __acall__
+# (la URL se resuelve ahí) y process_view no hace nada. Ese hilo es compartido
+# por todas las peticiones en curso, así que el perfil puede incluir marcos de
+# otras peticiones concurrentes; las consultas del ORM asíncrono se ejecutan en
+# el hilo síncrono y no aparecen. Con WSGI, Django ejecuta las vistas async def
+# en otro hilo con async_to_sync y el perfil solo ve la espera: para perfilar
+# esas vistas hay que servir la aplicación con ASGI.
+# ==========================================
+
+class PerfiladorMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        self._terminar(request, response)
+        return response
+
+    async def __acall__(self, request):
+        captura = self._captura_vista_async(request)
+        if captura is not None:
+            captura.iniciar()
+            try:
+                response = await self.get_response(request)
+            finally:
+                captura.detener()
+            await sync_to_async(self._guardar)(request, captura, response.status_code)
+            return response
+        response = await self.get_response(request)
+        if getattr(request, '_captura_perfil', None) is not None:
+            await sync_to_async(self._terminar)(request, response)
+        return response
+
+    def _captura_vista_async(self, request):
+        # Solo para vistas async def; las síncronas se perfilan desde process_view
+        config = perfilador.configuracion()
+        if not config['activo']:
+            return None
+        try:
+            coincidencia = get_resolver(getattr(request, 'urlconf', None)).resolve(request.path_info)
+        except Resolver404:
+            return None
+        if not iscoroutinefunction(coincidencia.func) or not perfilador.debe_perfilar(config, coincidencia.view_name):
+            return None
+        return perfilador.Captura(config, coincidencia.view_name, request.method, request.path)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if iscoroutinefunction(self) and iscoroutinefunction(view_func):
+            return None  # La perfila __acall__ en el hilo del bucle de eventos
+        config = perfilador.configuracion()
+        vista = request.resolver_match.view_name
+        if perfilador.debe_perfilar(config, vista):
+            request._captura_perfil = perfilador.Captura(config, vista, request.method, request.path)
+            request._captura_perfil.iniciar()
+        return None
+
+    def _terminar(self, request, response):
+        captura = getattr(request, '_captura_perfil', None)
+        if captura is None:
+            return
+        del request._captura_perfil
+        captura.detener()
+        self._guardar(request, captura, response.status_code)
+
+    def _guardar(self, request, captura, estado):
+        try:
+            captura.guardar(estado)
+        except OSError:
+            logger.exception('No se pudo guardar el perfil de %s %s', request.method, request.path)
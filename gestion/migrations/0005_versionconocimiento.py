@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:41
+
+from django.db import migrations, models
+
+
+def crear_fila_version(apps, schema_editor):
+    VersionConocimiento = apps.get_model('gestion', 'VersionConocimiento')
+    VersionConocimiento.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0004_pruebaposmortem_signo_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionConocimiento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(crear_fila_version, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def poblar_conteos(apps, schema_editor):
+    # Carga inicial a partir del historial existente; después se mantienen de forma incremental
+    Diagnostico = apps.get_model('gestion', 'Diagnostico')
+    ConteoEnfermedad = apps.get_model('gestion', 'ConteoEnfermedad')
+    ConteoSintomaEnfermedad = apps.get_model('gestion', 'ConteoSintomaEnfermedad')
+    SintomaPresentado = Diagnostico._meta.get_field('sintomas_presentados').remote_field.through
+
+    priors = (
+        Diagnostico.objects.filter(enfermedad_diagnosticada__isnull=False)
+        .values_list('enfermedad_diagnosticada').annotate(n=Count('id'))
+    )
+    ConteoEnfermedad.objects.bulk_create(
+        [ConteoEnfermedad(enfermedad_id=e, total=n) for e, n in priors], batch_size=1000
+    )
+
+    pares = (
+        SintomaPresentado.objects.filter(diagnostico__enfermedad_diagnosticada__isnull=False)
+        .values_list('diagnostico__enfermedad_diagnosticada', 'sintoma').annotate(n=Count('id'))
+    )
+    ConteoSintomaEnfermedad.objects.bulk_create(
+        [ConteoSintomaEnfermedad(enfermedad_id=e, sintoma_id=s, total=n) for e, s, n in pares], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0005_versionconocimiento'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConteoEnfermedad',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('enfermedad', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='conteo', to='gestion.enfermedad')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ConteoSintomaEnfermedad',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('enfermedad', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='gestion.enfermedad')),
+                ('sintoma', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='gestion.sintoma')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('enfermedad', 'sintoma'), name='conteo_sintoma_enfermedad_unico')],
+            },
+        ),
+        migrations.RunPython(poblar_conteos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0006_conteos_bayes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='diagnostico',
+            index=models.Index(fields=['fecha_diagnostico', 'id'], name='diagnostico_fecha_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paciente',
+            index=models.Index(fields=['apellido', 'nombre', 'id'], name='paciente_apellido_nombre_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:53
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def poblar_conteos(apps, schema_editor):
+    # Carga inicial; después signals.py mantiene los conteos en cada cambio de relación
+    Enfermedad = apps.get_model('gestion', 'Enfermedad')
+    valores = {}
+    for relacion in ('sintomas', 'signos', 'pruebas_lab', 'pruebas_postmortem'):
+        intermedia = Enfermedad._meta.get_field(relacion).remote_field.through
+        conteo = (
+            intermedia.objects.filter(enfermedad_id=OuterRef('pk'))
+            .order_by().values('enfermedad_id').annotate(n=Count('pk')).values('n')
+        )
+        valores[f'num_{relacion}'] = Coalesce(Subquery(conteo), Value(0))
+    Enfermedad.objects.update(**valores)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0007_indices_paginacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='enfermedad',
+            name='num_pruebas_lab',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='enfermedad',
+            name='num_pruebas_postmortem',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='enfermedad',
+            name='num_signos',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='enfermedad',
+            name='num_sintomas',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(poblar_conteos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,74 @@
+from django.db import migrations
+
+# Índice de texto completo de pacientes (solo SQLite, con FTS5).
+# Tabla de contenido externo: el texto vive en gestion_paciente y el índice
+# se mantiene con triggers, así que también cubre bulk_create, update() y
+# borrados en cascada. unicode61 con remove_diacritics 2 pliega mayúsculas y
+# acentos ("Jose" encuentra "José"); los índices de prefijo aceleran "jos*".
+# Ojo: si una migración futura reconstruye gestion_paciente (SQLite copia la
+# tabla al alterar columnas), hay que volver a crear estos triggers.
+
+CAMPOS = ('nombre', 'apellido', 'email', 'telefono')
+
+CREAR = [
+    f"""
+    CREATE VIRTUAL TABLE gestion_paciente_fts USING fts5(
+        {', '.join(CAMPOS)},
+        content='gestion_paciente', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3 4'
+    )
+    """,
+    f"""
+    CREATE TRIGGER gestion_paciente_fts_ai AFTER INSERT ON gestion_paciente BEGIN
+        INSERT INTO gestion_paciente_fts(rowid, {', '.join(CAMPOS)})
+        VALUES (new.id, {', '.join('new.' + c for c in CAMPOS)});
+    END
+    """,
+    f"""
+    CREATE TRIGGER gestion_paciente_fts_ad AFTER DELETE ON gestion_paciente BEGIN
+        INSERT INTO gestion_paciente_fts(gestion_paciente_fts, rowid, {', '.join(CAMPOS)})
+        VALUES ('delete', old.id, {', '.join('old.' + c for c in CAMPOS)});
+    END
+    """,
+    f"""
+    CREATE TRIGGER gestion_paciente_fts_au AFTER UPDATE ON gestion_paciente BEGIN
+        INSERT INTO gestion_paciente_fts(gestion_paciente_fts, rowid, {', '.join(CAMPOS)})
+        VALUES ('delete', old.id, {', '.join('old.' + c for c in CAMPOS)});
+        INSERT INTO gestion_paciente_fts(rowid, {', '.join(CAMPOS)})
+        VALUES (new.id, {', '.join('new.' + c for c in CAMPOS)});
+    END
+    """,
+    # Indexa los pacientes que ya existían
+    "INSERT INTO gestion_paciente_fts(gestion_paciente_fts) VALUES ('rebuild')",
+]
+
+BORRAR = [
+    'DROP TRIGGER IF EXISTS gestion_paciente_fts_au',
+    'DROP TRIGGER IF EXISTS gestion_paciente_fts_ad',
+    'DROP TRIGGER IF EXISTS gestion_paciente_fts_ai',
+    'DROP TABLE IF EXISTS gestion_paciente_fts',
+]
+
+
+def crear_indice(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in CREAR:
+            schema_editor.execute(sql)
+
+
+def borrar_indice(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in BORRAR:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0008_conteos_caracteristicas'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, borrar_indice),
+    ]
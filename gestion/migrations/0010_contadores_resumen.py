@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:13
+
+from django.db import migrations, models
+
+
+def poblar_contadores(apps, schema_editor):
+    # Carga inicial; después signals.py los mantiene en cada alta y baja
+    ContadorResumen = apps.get_model('gestion', 'ContadorResumen')
+    for nombre, modelo in (('pacientes', 'Paciente'), ('diagnosticos', 'Diagnostico')):
+        total = apps.get_model('gestion', modelo).objects.count()
+        ContadorResumen.objects.update_or_create(nombre=nombre, defaults={'total': total})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0009_busqueda_pacientes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContadorResumen',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=50, unique=True)),
+                ('total', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(poblar_contadores, migrations.RunPython.noop),
+    ]
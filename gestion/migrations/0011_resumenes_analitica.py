@@ -0,0 +1,66 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:16
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def poblar_resumenes(apps, schema_editor):
+    # Carga inicial desde el historial; después signals.py los mantiene en cada cambio
+    Diagnostico = apps.get_model('gestion', 'Diagnostico')
+    ResumenDiarioDiagnostico = apps.get_model('gestion', 'ResumenDiarioDiagnostico')
+    ResumenDiarioSintoma = apps.get_model('gestion', 'ResumenDiarioSintoma')
+
+    por_diagnostico = (
+        Diagnostico.objects.annotate(dia=TruncDate('fecha_diagnostico'))
+        .values_list('dia', 'enfermedad_diagnosticada_id', 'medico_id').annotate(n=Count('id')).order_by()
+    )
+    ResumenDiarioDiagnostico.objects.bulk_create([
+        ResumenDiarioDiagnostico(fecha=dia, enfermedad_id=e or 0, medico_id=m or 0, total=n)
+        for dia, e, m, n in por_diagnostico
+    ], batch_size=1000)
+
+    por_sintoma = (
+        Diagnostico.sintomas_presentados.through.objects
+        .annotate(dia=TruncDate('diagnostico__fecha_diagnostico'))
+        .values_list('dia', 'sintoma_id').annotate(n=Count('id')).order_by()
+    )
+    ResumenDiarioSintoma.objects.bulk_create([
+        ResumenDiarioSintoma(fecha=dia, sintoma_id=s, total=n) for dia, s, n in por_sintoma
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0010_contadores_resumen'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDiarioDiagnostico',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('enfermedad_id', models.PositiveBigIntegerField(default=0)),
+                ('medico_id', models.PositiveBigIntegerField(default=0)),
+                ('total', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'enfermedad_id', 'medico_id'), name='resumen_diario_diagnostico_unico')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenDiarioSintoma',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('sintoma_id', models.PositiveBigIntegerField()),
+                ('total', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('fecha', 'sintoma_id'), name='resumen_diario_sintoma_unico')],
+            },
+        ),
+        migrations.RunPython(poblar_resumenes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gestion', '0011_resumenes_analitica'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProgresoImportacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=255, unique=True)),
+                ('registros', models.BigIntegerField(default=0)),
+                ('importados', models.BigIntegerField(default=0)),
+                ('errores', models.BigIntegerField(default=0)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
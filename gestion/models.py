@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 
 # ==========================================
@@ -40,6 +41,25 @@ class Enfermedad(models.Model):
     pruebas_lab = models.ManyToManyField(PruebaLaboratorio, blank=True, related_name='enfermedades')
     pruebas_postmortem = models.ManyToManyField(PruebaPosMortem, blank=True, related_name='enfermedades')
 
+    # Conteos desnormalizados de cada relación, mantenidos por signals.py.
+    # Evitan contar filas intermedias en listados y en el motor de inferencia.
+    num_sintomas = models.PositiveIntegerField(default=0, editable=False)
+    num_signos = models.PositiveIntegerField(default=0, editable=False)
+    num_pruebas_lab = models.PositiveIntegerField(default=0, editable=False)
+    num_pruebas_postmortem = models.PositiveIntegerField(default=0, editable=False)
+
+    CAMPOS_CONTEO = ('num_sintomas', 'num_signos', 'num_pruebas_lab', 'num_pruebas_postmortem')
+
+    def save(self, *args, **kwargs):
+        # Al actualizar, los conteos no se escriben: una instancia cargada antes de
+        # cambiar sus relaciones los pisaría con valores viejos
+        if not self._state.adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                campo.name for campo in self._meta.concrete_fields
+                if not campo.primary_key and campo.name not in self.CAMPOS_CONTEO
+            ]
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.nombre
 
@@ -56,6 +76,12 @@ class Paciente(models.Model):
     email = models.EmailField()
     creado_por = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
 
+    class Meta:
+        # Soporta la paginación por cursor del directorio (ver paginacion.py)
+        indexes = [
+            models.Index(fields=['apellido', 'nombre', 'id'], name='paciente_apellido_nombre_idx'),
+        ]
+
     def __str__(self):
         return f"{self.nombre} {self.apellido}"
 
@@ -78,6 +104,12 @@ class Diagnostico(models.Model):
     notas_adicionales = models.TextField(blank=True, null=True)
     fecha_diagnostico = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # Soporta la paginación por cursor del historial (ver paginacion.py)
+        indexes = [
+            models.Index(fields=['fecha_diagnostico', 'id'], name='diagnostico_fecha_id_idx'),
+        ]
+
     def __str__(self):
         return f"Diagnóstico de {self.paciente} - {self.fecha_diagnostico.strftime('%Y-%m-%d')}"
 
@@ -92,4 +124,159 @@ class Tratamiento(models.Model):
     fecha_fin = models.DateField(null=True, blank=True)
 
     def __str__(self):
-        return f"Tratamiento para {self.diagnostico.paciente}"
\ No newline at end of file
+        return f"Tratamiento para {self.diagnostico.paciente}"
+
+# ==========================================
+# 6. VERSIÓN DE LA BASE DE CONOCIMIENTO
+# Una sola fila. Cada cambio en enfermedades o catálogos incrementa el contador;
+# los procesos comparan su copia en memoria con este valor (ver conocimiento.py).
+# ==========================================
+
+class VersionConocimiento(models.Model):
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Base de conocimiento v{self.version}"
+
+
+# ==========================================
+# 7. CONTEOS PARA EL CLASIFICADOR BAYESIANO
+# Se actualizan de forma incremental con cada Diagnóstico (ver bayes.py),
+# nunca recorriendo todo el historial.
+# ==========================================
+
+class ConteoEnfermedad(models.Model):
+    # Nº de diagnósticos registrados con esta enfermedad (probabilidad a priori)
+    enfermedad = models.OneToOneField(Enfermedad, on_delete=models.CASCADE, related_name='conteo')
+    total = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.enfermedad}: {self.total}"
+
+class ConteoSintomaEnfermedad(models.Model):
+    # Nº de diagnósticos de la enfermedad en los que se presentó el síntoma
+    enfermedad = models.ForeignKey(Enfermedad, on_delete=models.CASCADE)
+    sintoma = models.ForeignKey(Sintoma, on_delete=models.CASCADE)
+    total = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['enfermedad', 'sintoma'], name='conteo_sintoma_enfermedad_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.enfermedad} / {self.sintoma}: {self.total}"
+
+
+# ==========================================
+# 8. CONTADORES DEL PANEL
+# Una fila por contador ('pacientes', 'diagnosticos'), actualizada por
+# signals.py en cada alta o baja; el dashboard lee estos totales en lugar de
+# hacer COUNT(*) sobre tablas grandes (ver contadores.py).
+# ==========================================
+
+class ContadorResumen(models.Model):
+    nombre = models.CharField(max_length=50, unique=True)
+    total = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.nombre}: {self.total}"
+
+
+# ==========================================
+# 9. ANALÍTICA: RESÚMENES DIARIOS (ROLLUPS)
+# Totales por día que signals.py suma y resta en cada diagnóstico; las gráficas
+# de tendencias solo leen estas tablas (ver analitica.py).
+# Enfermedad y médico se guardan como id entero (0 = sin asignar) en lugar de
+# ForeignKey: así la fila única no depende de NULL y el histórico sobrevive al borrado.
+# ==========================================
+
+class ResumenDiarioDiagnostico(models.Model):
+    fecha = models.DateField()
+    enfermedad_id = models.PositiveBigIntegerField(default=0)
+    medico_id = models.PositiveBigIntegerField(default=0)
+    total = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'enfermedad_id', 'medico_id'], name='resumen_diario_diagnostico_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} enfermedad={self.enfermedad_id} medico={self.medico_id}: {self.total}"
+
+class ResumenDiarioSintoma(models.Model):
+    fecha = models.DateField()
+    sintoma_id = models.PositiveBigIntegerField()
+    total = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'sintoma_id'], name='resumen_diario_sintoma_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} sintoma={self.sintoma_id}: {self.total}"
+
+
+# ==========================================
+# 10. PROGRESO DE IMPORTACIONES MASIVAS
+# Una fila por archivo en curso (ver importacion.py). Se actualiza en la misma
+# transacción que cada lote, así que al reanudar nunca se repite ni se pierde uno.
+# ==========================================
+
+class ProgresoImportacion(models.Model):
+    clave = models.CharField(max_length=255, unique=True)  # "<tipo>:<ruta absoluta del archivo>"
+    registros = models.BigIntegerField(default=0)  # Registros del archivo ya procesados (válidos o no)
+    importados = models.BigIntegerField(default=0)
+    errores = models.BigIntegerField(default=0)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.clave}: {self.registros}"
+
+
+# ==========================================
+# 11. TRABAJOS EN SEGUNDO PLANO
+# Cola en la propia base de datos (ver trabajos.py): las vistas y comandos
+# encolan y `manage.py procesar_trabajos` los ejecuta. Sin broker externo.
+# ==========================================
+
+class Trabajo(models.Model):
+    PENDIENTE = 'pendiente'
+    EN_CURSO = 'en_curso'
+    COMPLETADO = 'completado'
+    FALLIDO = 'fallido'
+    ESTADOS = [
+        (PENDIENTE, 'Pendiente'),
+        (EN_CURSO, 'En curso'),
+        (COMPLETADO, 'Completado'),
+        (FALLIDO, 'Fallido'),
+    ]
+
+    tipo = models.CharField(max_length=50)  # Nombre de la tarea registrada en trabajos.py
+    parametros = models.JSONField(default=dict, blank=True)
+    estado = models.CharField(max_length=10, choices=ESTADOS, default=PENDIENTE)
+    avance = models.BigIntegerField(default=0)
+    total = models.BigIntegerField(null=True, blank=True)  # None = total desconocido
+    mensaje = models.CharField(max_length=255, blank=True)
+    resultado = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)  # Traza del último intento fallido
+    intentos = models.PositiveSmallIntegerField(default=0)
+    max_intentos = models.PositiveSmallIntegerField(default=3)
+    disponible_desde = models.DateTimeField(default=timezone.now)  # No se reclama antes (espera entre reintentos)
+    trabajador = models.CharField(max_length=100, blank=True)  # "host:pid" del proceso que lo ejecuta
+    latido = models.DateTimeField(null=True, blank=True)  # Última señal de vida mientras está en curso
+    creado_por = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='trabajos')
+    creado = models.DateTimeField(auto_now_add=True)
+    iniciado = models.DateTimeField(null=True, blank=True)
+    terminado = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # El trabajador busca "pendiente y disponible" en orden de llegada
+            models.Index(fields=['estado', 'disponible_desde', 'id'], name='trabajo_cola_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo} #{self.id} ({self.estado})"
@@ -0,0 +1,131 @@
+import base64
+import binascii
+import datetime
+import json
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+# ==========================================
+# PAGINACIÓN POR CURSOR (KEYSET)
+# En lugar de OFFSET, cada página continúa desde los valores de orden de la
+# última fila vista: WHERE (a, b, id) > (...) ORDER BY a, b, id LIMIT n.
+# Con un índice compuesto sobre esas columnas, la página 10.000 cuesta lo
+# mismo que la primera. El token es opaco (base64 de JSON) y lleva la
+# dirección: 's' = página siguiente, 'a' = página anterior.
+# ==========================================
+
+class PaginaCursor(NamedTuple):
+    objetos: list
+    siguiente: str   # token de la página siguiente ('' si no hay)
+    anterior: str    # token de la página anterior ('' si no hay)
+    tam: int
+
+
+def _serializar(valor):
+    # isoformat completo: DjangoJSONEncoder recorta a milisegundos y el cursor perdería filas
+    if isinstance(valor, (datetime.date, datetime.time)):
+        return valor.isoformat()
+    raise TypeError(f'Valor de cursor no serializable: {valor!r}')
+
+
+def codificar_cursor(valores, direccion):
+    datos = json.dumps({'v': valores, 'd': direccion}, default=_serializar, separators=(',', ':'))
+    return base64.urlsafe_b64encode(datos.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(token):
+    # Devuelve (valores, direccion) o None si el token no es válido
+    try:
+        relleno = '=' * (-len(token) % 4)
+        datos = json.loads(base64.urlsafe_b64decode(token + relleno))
+        valores, direccion = datos['v'], datos['d']
+    except (ValueError, TypeError, KeyError, binascii.Error):
+        return None
+    if direccion not in ('s', 'a') or not isinstance(valores, list):
+        return None
+    return valores, direccion
+
+
+def tam_pagina(valor):
+    # ?tam=N opcional, acotado por PAGINACION_TAM_MAX
+    por_defecto = getattr(settings, 'PAGINACION_TAM', 25)
+    maximo = getattr(settings, 'PAGINACION_TAM_MAX', 100)
+    try:
+        tam = int(valor)
+    except (TypeError, ValueError):
+        return por_defecto
+    return min(max(tam, 1), maximo)
+
+
+def _invertir(orden):
+    return [campo[1:] if campo.startswith('-') else f'-{campo}' for campo in orden]
+
+
+def _despues_de(orden, valores):
+    """
+    Filtro "fila posterior al cursor" según el orden:
+    a > va OR (a = va AND (b > vb OR (b = vb AND c > vc))).
+    Se antepone a >= va para que la base de datos recorra el índice desde el cursor.
+    """
+    filtro = None
+    for campo, valor in reversed(list(zip(orden, valores))):
+        nombre = campo.lstrip('-')
+        operador = 'lt' if campo.startswith('-') else 'gt'
+        estricto = Q(**{f'{nombre}__{operador}': valor})
+        filtro = estricto if filtro is None else estricto | (Q(**{nombre: valor}) & filtro)
+    primero = orden[0]
+    cota = Q(**{f"{primero.lstrip('-')}__{'lte' if primero.startswith('-') else 'gte'}": valores[0]})
+    return cota & filtro
+
+
+def _plan(queryset, orden, cursor):
+    # (consulta ordenada, dirección, hay_cursor); un token inválido equivale a la primera página
+    decodificado = decodificar_cursor(cursor) if cursor else None
+    if not decodificado or len(decodificado[0]) != len(orden):
+        return queryset.order_by(*orden), 's', False
+    valores_cursor, direccion = decodificado
+    orden_consulta = _invertir(orden) if direccion == 'a' else orden
+    try:
+        consulta = queryset.filter(_despues_de(orden_consulta, valores_cursor))
+    except (ValidationError, ValueError, TypeError):
+        # Token manipulado o de otra vista: empezamos desde la primera página
+        return queryset.order_by(*orden), 's', False
+    return consulta.order_by(*orden_consulta), direccion, True
+
+
+def _pagina(filas, orden, direccion, hay_cursor, tam):
+    # None si la página anterior llegó al principio: hay que mostrar la primera página completa
+    if direccion == 'a':
+        if len(filas) <= tam:
+            return None
+        objetos = filas[:tam][::-1]
+        hay_anterior, hay_siguiente = True, True
+    else:
+        objetos = filas[:tam]
+        hay_anterior, hay_siguiente = hay_cursor, len(filas) > tam
+
+    campos = [campo.lstrip('-') for campo in orden]
+
+    def valores(objeto):
+        return [getattr(objeto, campo) for campo in campos]
+
+    return PaginaCursor(
+        objetos,
+        codificar_cursor(valores(objetos[-1]), 's') if hay_siguiente and objetos else '',
+        codificar_cursor(valores(objetos[0]), 'a') if hay_anterior and objetos else '',
+        tam,
+    )
+
+
+async def apaginar_por_cursor(queryset, orden, cursor='', tam=25):
+    """
+    orden: campos de ordenación al estilo order_by; el último debe ser único (normalmente 'id').
+    Cada página hace una sola consulta con LIMIT tam + 1 (la fila extra indica si hay más).
+    Las vistas de listado son asíncronas; los prefetch_related también se resuelven.
+    """
+    consulta, direccion, hay_cursor = _plan(queryset, orden, cursor)
+    pagina = _pagina([objeto async for objeto in consulta[:tam + 1]], orden, direccion, hay_cursor, tam)
+    return pagina or await apaginar_por_cursor(queryset, orden, '', tam)
@@ -0,0 +1,257 @@
+import cProfile
+import json
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+# ==========================================
+# PERFILADOR DE PETICIONES (opcional, desactivado por defecto)
+# PerfiladorMiddleware (middleware.py) perfila las peticiones de las vistas
+# indicadas en PERFILADOR['VISTAS'] y una fracción aleatoria del resto
+# (PERFILADOR['FRACCION']). Dos modos:
+#   - 'muestreo': un hilo aparte toma la pila del hilo de la petición con
+#     sys._current_frames() cada INTERVALO segundos. Coste casi nulo para la
+#     petición; el resultado son pilas plegadas ("collapsed stacks", una línea
+#     "raiz;...;hoja N" por pila) que flamegraph.pl o speedscope dibujan tal cual.
+#   - 'cprofile': cProfile sobre el hilo de la petición. Tiempos exactos por
+#     función pero con sobrecarga notable; se guarda el .prof para pstats/snakeviz.
+# Cada captura que dura al menos UMBRAL_SEGUNDOS se escribe en DIRECTORIO
+# (<id>.collapsed o <id>.prof) y se anota en capturas.jsonl con sus marcos más
+# costosos. La página /perfiles/ (solo staff) lista las más lentas.
+# ==========================================
+
+INDICE = 'capturas.jsonl'
+MARCOS_TOP = 10
+
+_RE_ID = re.compile(r'^[0-9a-f]{32}$')
+_lock_indice = threading.Lock()
+
+
+def configuracion():
+    config = getattr(settings, 'PERFILADOR', {})
+    return {
+        'activo': config.get('ACTIVO', False),
+        'vistas': frozenset(config.get('VISTAS', ())),
+        'fraccion': config.get('FRACCION', 0.0),
+        'modo': config.get('MODO', 'muestreo'),
+        'intervalo': config.get('INTERVALO', 0.005),
+        'umbral': config.get('UMBRAL_SEGUNDOS', 0.0),
+        'directorio': Path(config.get('DIRECTORIO', settings.BASE_DIR / 'perfiles')),
+    }
+
+
+def debe_perfilar(config, vista):
+    if not config['activo']:
+        return False
+    return vista in config['vistas'] or (config['fraccion'] > 0 and random.random() < config['fraccion'])
+
+
+# ==========================================
+# NOMBRES DE MARCOS
+# ==========================================
+
+_RAICES = sorted({str(settings.BASE_DIR), *(p for p in sys.path if p and os.path.isdir(p))}, key=len, reverse=True)
+
+
+def _ruta_corta(ruta):
+    for raiz in _RAICES:
+        if ruta.startswith(raiz + os.sep):
+            return ruta[len(raiz) + 1:]
+    return ruta
+
+
+def _nombre_marco(codigo):
+    # Sin número de línea: así todas las muestras de una función se pliegan juntas
+    return f'{_ruta_corta(codigo.co_filename)}:{codigo.co_qualname}'
+
+
+def es_del_proyecto(marco):
+    # Los middlewares de medición envuelven todas las pilas: no aportan nada en el top
+    return marco.startswith(('gestion/', 'config/')) and not marco.startswith('gestion/middleware.py:')
+
+
+def _pila(frame):
+    nombres = []
+    while frame is not None:
+        nombres.append(_nombre_marco(frame.f_code))
+        frame = frame.f_back
+    nombres.reverse()
+    return ';'.join(nombres)
+
+
+# ==========================================
+# CAPTURAS
+# ==========================================
+
+class _Muestreador(threading.Thread):
+    def __init__(self, hilo_id, intervalo):
+        super().__init__(name='perfilador-muestreo', daemon=True)
+        self.hilo_id = hilo_id
+        self.intervalo = intervalo
+        self.pilas = Counter()
+        self._parar = threading.Event()
+
+    def run(self):
+        while not self._parar.wait(self.intervalo):
+            frame = sys._current_frames().get(self.hilo_id)
+            if frame is not None:
+                self.pilas[_pila(frame)] += 1
+            del frame
+
+    def detener(self):
+        self._parar.set()
+        self.join()
+
+
+class Captura:
+    """Perfil de una petición: iniciar() y detener() en el hilo de la vista, guardar() al acabar."""
+
+    def __init__(self, config, vista, metodo, ruta):
+        self.config = config
+        self.vista = vista
+        self.metodo = metodo
+        self.ruta = ruta
+        self._muestreador = None
+        self._perfil = None
+        self._inicio = None
+        self._segundos = None
+
+    def iniciar(self):
+        if self.config['modo'] == 'cprofile':
+            self._perfil = cProfile.Profile()
+            self._perfil.enable()
+        else:
+            self._muestreador = _Muestreador(threading.get_ident(), self.config['intervalo'])
+            self._muestreador.start()
+        self._inicio = time.perf_counter()
+
+    def detener(self):
+        # En el mismo hilo que iniciar(): cProfile solo perfila el hilo que lo activó
+        self._segundos = time.perf_counter() - self._inicio
+        if self._perfil is not None:
+            self._perfil.disable()
+        else:
+            self._muestreador.detener()
+
+    def guardar(self, estado):
+        # Escribe el perfil (disco): puede ir en otro hilo que detener()
+        if self._segundos < self.config['umbral']:
+            return None
+        return self._guardar(self._segundos, estado)
+
+    def _guardar(self, segundos, estado):
+        directorio = self.config['directorio']
+        directorio.mkdir(parents=True, exist_ok=True)
+        id_captura = uuid.uuid4().hex
+        if self._perfil is not None:
+            archivo = f'{id_captura}.prof'
+            self._perfil.dump_stats(directorio / archivo)
+            muestras, top, top_proyecto = _resumen_cprofile(self._perfil)
+        else:
+            archivo = f'{id_captura}.collapsed'
+            pilas = self._muestreador.pilas
+            (directorio / archivo).write_text(
+                ''.join(f'{pila} {n}\n' for pila, n in pilas.most_common()), encoding='utf-8'
+            )
+            muestras, top, top_proyecto = _resumen_muestras(pilas)
+        entrada = {
+            'id': id_captura,
+            'fecha': timezone.now().isoformat(timespec='seconds'),
+            'vista': self.vista,
+            'metodo': self.metodo,
+            'ruta': self.ruta,
+            'estado': estado,
+            'segundos': round(segundos, 6),
+            'modo': self.config['modo'],
+            'muestras': muestras,
+            'archivo': archivo,
+            'top': top,
+            'top_proyecto': top_proyecto,
+        }
+        with _lock_indice, open(directorio / INDICE, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entrada, ensure_ascii=False) + '\n')
+        return entrada
+
+
+def _resumen_muestras(pilas):
+    # top: marcos hoja (tiempo propio); top_proyecto: marcos de gestion/ y config/ (tiempo acumulado)
+    propias, acumuladas = Counter(), Counter()
+    for pila, n in pilas.items():
+        marcos = pila.split(';')
+        propias[marcos[-1]] += n
+        for marco in set(marcos):
+            if es_del_proyecto(marco):
+                acumuladas[marco] += n
+    return sum(pilas.values()), propias.most_common(MARCOS_TOP), acumuladas.most_common(MARCOS_TOP)
+
+
+def _resumen_cprofile(perfil):
+    # Mismo formato que _resumen_muestras, en segundos en lugar de muestras
+    stats = pstats.Stats(perfil).stats
+    propias, acumuladas = Counter(), Counter()
+    llamadas = 0
+    for (archivo, _, funcion), (_, ncalls, tottime, cumtime, _) in stats.items():
+        marco = f'{_ruta_corta(archivo)}:{funcion}'
+        llamadas += ncalls
+        propias[marco] += tottime
+        if es_del_proyecto(marco):
+            acumuladas[marco] = max(acumuladas[marco], cumtime)
+    redondear = lambda pares: [(m, round(s, 6)) for m, s in pares]  # noqa: E731
+    return llamadas, redondear(propias.most_common(MARCOS_TOP)), redondear(acumuladas.most_common(MARCOS_TOP))
+
+
+# ==========================================
+# LECTURA (página de staff)
+# ==========================================
+
+def capturas(directorio=None):
+    directorio = directorio or configuracion()['directorio']
+    try:
+        with open(directorio / INDICE, encoding='utf-8') as f:
+            return [json.loads(linea) for linea in f if linea.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def mas_lentas(limite=50, vista=None):
+    todas = [c for c in capturas() if vista is None or c['vista'] == vista]
+    return sorted(todas, key=lambda c: c['segundos'], reverse=True)[:limite]
+
+
+def ruta_archivo(id_captura):
+    """Ruta del perfil de una captura, o None si el id no es válido o no existe."""
+    if not _RE_ID.match(id_captura):
+        return None
+    directorio = configuracion()['directorio']
+    for extension in ('.collapsed', '.prof'):
+        ruta = directorio / f'{id_captura}{extension}'
+        if ruta.exists():
+            return ruta
+    return None
+
+
+def pilas_agregadas(vista):
+    """Suma las pilas plegadas de todas las capturas por muestreo de una vista."""
+    directorio = configuracion()['directorio']
+    total = Counter()
+    for captura in capturas(directorio):
+        if captura['vista'] != vista or captura['modo'] != 'muestreo':
+            continue
+        try:
+            with open(directorio / captura['archivo'], encoding='utf-8') as f:
+                for linea in f:
+                    pila, _, n = linea.rstrip('\n').rpartition(' ')
+                    total[pila] += int(n)
+        except FileNotFoundError:
+            continue
+    return ''.join(f'{pila} {n}\n' for pila, n in total.most_common())
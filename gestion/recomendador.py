@@ -0,0 +1,88 @@
+import heapq
+from typing import NamedTuple
+
+# ==========================================
+# RECOMENDADOR DE PRUEBAS DISCRIMINANTES
+# Dadas las enfermedades candidatas mejor puntuadas, elige el conjunto más
+# pequeño de pruebas que las distingue entre sí. Cada prueba se representa
+# como una máscara de bits sobre las candidatas (bit i = la candidata i tiene
+# asociada la prueba). Una prueba "separa" dos candidatas si solo una la tiene.
+# Algoritmo voraz: en cada paso se elige la prueba que separa más pares aún
+# no distinguidos. La ganancia solo puede bajar a medida que la partición se
+# refina, así que se evalúa de forma perezosa con un montículo.
+# ==========================================
+
+class PruebaDiscriminante(NamedTuple):
+    tipo: str             # 'laboratorio' o 'postmortem'
+    prueba_id: int
+    nombre: str
+    enfermedades: tuple   # candidatas que tienen asociada la prueba
+    pares_separados: int  # pares de candidatas que distingue al elegirse
+
+
+def _ganancia(mascara, clases):
+    total = 0
+    for clase in clases:
+        dentro = (clase & mascara).bit_count()
+        if dentro:
+            total += dentro * (clase.bit_count() - dentro)
+    return total
+
+
+def recomendar_pruebas(base, ids_enfermedades, incluir_postmortem=False, max_pruebas=None):
+    ids = [e for e in dict.fromkeys(ids_enfermedades) if e in base.fichas]
+    k = len(ids)
+    if k < 2:
+        return []
+
+    # 1. Máscara de bits de cada prueba sobre las candidatas
+    mascaras = {}
+    for i, enfermedad_id in enumerate(ids):
+        ficha = base.fichas[enfermedad_id]
+        bit = 1 << i
+        for prueba_id in ficha.pruebas_lab:
+            clave = ('laboratorio', prueba_id)
+            mascaras[clave] = mascaras.get(clave, 0) | bit
+        if incluir_postmortem:
+            for prueba_id in ficha.pruebas_postmortem:
+                clave = ('postmortem', prueba_id)
+                mascaras[clave] = mascaras.get(clave, 0) | bit
+
+    # 2. Ganancia inicial: con una sola clase, n * (k - n) pares separados
+    monticulo = []
+    for clave, mascara in mascaras.items():
+        n = mascara.bit_count()
+        if 0 < n < k:
+            monticulo.append((-(n * (k - n)), clave))
+    heapq.heapify(monticulo)
+
+    # 3. Selección voraz perezosa; solo guardamos las clases con 2 o más candidatas
+    clases = [(1 << k) - 1]
+    elegidas = []
+    while monticulo and clases and (max_pruebas is None or len(elegidas) < max_pruebas):
+        _, clave = heapq.heappop(monticulo)
+        mascara = mascaras[clave]
+        ganancia = _ganancia(mascara, clases)
+        if not ganancia:
+            continue  # ya no distingue nada y nunca volverá a hacerlo
+        if monticulo and ganancia < -monticulo[0][0]:
+            heapq.heappush(monticulo, (-ganancia, clave))
+            continue
+
+        nuevas = []
+        for clase in clases:
+            for parte in (clase & mascara, clase & ~mascara):
+                if parte.bit_count() > 1:
+                    nuevas.append(parte)
+        clases = nuevas
+
+        tipo, prueba_id = clave
+        nombres = base.nombres_pruebas_lab if tipo == 'laboratorio' else base.nombres_pruebas_postmortem
+        elegidas.append(PruebaDiscriminante(
+            tipo,
+            prueba_id,
+            nombres[prueba_id],
+            tuple(base.fichas[ids[i]].nombre for i in range(k) if mascara >> i & 1),
+            ganancia,
+        ))
+    return elegidas
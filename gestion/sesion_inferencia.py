@@ -0,0 +1,92 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+
+from .inferencia import seleccionar_top
+
+# ==========================================
+# SESIÓN DE INFERENCIA INCREMENTAL
+# La sesión del médico guarda solo los síntomas/signos marcados para el
+# paciente actual, la versión de la base de conocimiento y una generación.
+# Las filas del ranking por enfermedad candidata (coincidencias y porcentaje)
+# viven en la caché del servidor (INFERENCIA_CACHE['ALIAS'] o 'default'),
+# bajo la clave de la sesión y la versión. Marcar o desmarcar una
+# característica solo recalcula las enfermedades de su lista de publicación;
+# la sesión no crece con el número de candidatas.
+# Si la caché no tiene las filas de esa generación (expiraron, otro proceso
+# con caché local, petición concurrente), se recalculan desde la selección.
+# ==========================================
+
+CLAVE_SESION = 'inferencia'
+TIPOS = ('sintoma', 'signo')
+
+
+def _cache():
+    return caches[getattr(settings, 'INFERENCIA_CACHE', {}).get('ALIAS') or DEFAULT_CACHE_ALIAS]
+
+
+def _clave_cache(session, version):
+    return f'inferencia:sesion:{session.session_key}:v{version}' if session.session_key else None
+
+
+class SesionInferencia:
+    def __init__(self, base, sintomas=(), signos=()):
+        self.base = base
+        self.seleccion = {'sintoma': set(sintomas), 'signo': set(signos)}
+        self.filas = {}  # {enfermedad_id: (enfermedad_id, porcentaje, coincidencias, total_items)}
+        for tipo in TIPOS:
+            for caracteristica_id in self.seleccion[tipo]:
+                self._sumar(tipo, caracteristica_id, 1)
+
+    @classmethod
+    def desde_sesion(cls, session, base):
+        datos = session.get(CLAVE_SESION)
+        if not datos:
+            return cls(base)
+        if datos['version'] == base.version:
+            clave = _clave_cache(session, base.version)
+            guardado = _cache().get(clave) if clave else None
+            if guardado is not None and guardado[0] == datos.get('generacion'):
+                sesion = cls(base)
+                sesion.seleccion = {'sintoma': set(datos['sintomas']), 'signo': set(datos['signos'])}
+                sesion.filas = guardado[1]
+                return sesion
+        # Otra versión de la base de conocimiento o filas no disponibles: desde la selección guardada
+        return cls(base, datos['sintomas'], datos['signos'])
+
+    def guardar(self, session):
+        generacion = uuid.uuid4().hex
+        session[CLAVE_SESION] = {
+            'version': self.base.version,
+            'generacion': generacion,
+            'sintomas': sorted(self.seleccion['sintoma']),
+            'signos': sorted(self.seleccion['signo']),
+        }
+        clave = _clave_cache(session, self.base.version)
+        if clave:
+            _cache().set(clave, (generacion, self.filas), settings.SESSION_COOKIE_AGE)
+
+    def _sumar(self, tipo, caracteristica_id, delta):
+        for enfermedad_id in self.base.motor.publicaciones(tipo, caracteristica_id):
+            fila = self.filas.get(enfermedad_id)
+            coincidencias = (fila[2] if fila else 0) + delta
+            if coincidencias:
+                total = self.base.fichas[enfermedad_id].total_items
+                porcentaje = round((coincidencias / total) * 100, 1)
+                self.filas[enfermedad_id] = (enfermedad_id, porcentaje, coincidencias, total)
+            else:
+                self.filas.pop(enfermedad_id, None)
+
+    def alternar(self, tipo, caracteristica_id, activo):
+        seleccion = self.seleccion[tipo]
+        if activo and caracteristica_id not in seleccion:
+            seleccion.add(caracteristica_id)
+            self._sumar(tipo, caracteristica_id, 1)
+        elif not activo and caracteristica_id in seleccion:
+            seleccion.discard(caracteristica_id)
+            self._sumar(tipo, caracteristica_id, -1)
+
+    def ranking(self, limite=None):
+        # Las filas ya están calculadas: solo queda el top-k (montículo si hay límite)
+        return seleccionar_top(self.filas.values(), limite)
@@ -0,0 +1,294 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import analitica, bayes, contadores, historial
+from .conocimiento import invalidar_base_conocimiento, recontar_caracteristicas
+from .models import Enfermedad, Sintoma, Signo, PruebaLaboratorio, PruebaPosMortem, Paciente, Diagnostico, Tratamiento
+
+# ==========================================
+# INVALIDACIÓN DE LA BASE DE CONOCIMIENTO
+# Cualquier cambio en enfermedades, catálogos o sus relaciones incrementa la
+# versión; cada proceso reconstruye su snapshot en la siguiente consulta.
+# Los cambios de relación también recalculan los conteos num_* de las
+# enfermedades afectadas.
+# ==========================================
+
+RELACION_POR_INTERMEDIA = {
+    Enfermedad.sintomas.through: 'sintomas',
+    Enfermedad.signos.through: 'signos',
+    Enfermedad.pruebas_lab.through: 'pruebas_lab',
+    Enfermedad.pruebas_postmortem.through: 'pruebas_postmortem',
+}
+
+RELACION_POR_CATALOGO = {
+    Sintoma: 'sintomas',
+    Signo: 'signos',
+    PruebaLaboratorio: 'pruebas_lab',
+    PruebaPosMortem: 'pruebas_postmortem',
+}
+
+
+@receiver(m2m_changed, sender=Enfermedad.sintomas.through)
+@receiver(m2m_changed, sender=Enfermedad.signos.through)
+@receiver(m2m_changed, sender=Enfermedad.pruebas_lab.through)
+@receiver(m2m_changed, sender=Enfermedad.pruebas_postmortem.through)
+def relaciones_enfermedad_cambiadas(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        # Desde el catálogo, clear() no informa qué enfermedades pierden la relación
+        instance._enfermedades_afectadas = list(instance.enfermedades.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        if not reverse:
+            afectadas = [instance.pk]
+        elif action == 'post_clear':
+            afectadas = getattr(instance, '_enfermedades_afectadas', [])
+        else:
+            afectadas = pk_set or []
+        recontar_caracteristicas(afectadas, [RELACION_POR_INTERMEDIA[sender]])
+        invalidar_base_conocimiento()
+
+
+@receiver(pre_delete, sender=Sintoma)
+@receiver(pre_delete, sender=Signo)
+@receiver(pre_delete, sender=PruebaLaboratorio)
+@receiver(pre_delete, sender=PruebaPosMortem)
+def recordar_enfermedades_del_catalogo(sender, instance, **kwargs):
+    instance._enfermedades_afectadas = list(instance.enfermedades.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Sintoma)
+@receiver(post_delete, sender=Signo)
+@receiver(post_delete, sender=PruebaLaboratorio)
+@receiver(post_delete, sender=PruebaPosMortem)
+def recontar_tras_borrar_catalogo(sender, instance, **kwargs):
+    recontar_caracteristicas(getattr(instance, '_enfermedades_afectadas', []), [RELACION_POR_CATALOGO[sender]])
+
+
+# Borrar una enfermedad o un catálogo elimina sus filas intermedias sin emitir m2m_changed
+@receiver(post_save, sender=Enfermedad)
+@receiver(post_save, sender=Sintoma)
+@receiver(post_save, sender=Signo)
+@receiver(post_save, sender=PruebaLaboratorio)
+@receiver(post_save, sender=PruebaPosMortem)
+@receiver(post_delete, sender=Enfermedad)
+@receiver(post_delete, sender=Sintoma)
+@receiver(post_delete, sender=Signo)
+@receiver(post_delete, sender=PruebaLaboratorio)
+@receiver(post_delete, sender=PruebaPosMortem)
+def catalogo_modificado(sender, **kwargs):
+    invalidar_base_conocimiento()
+
+
+# ==========================================
+# CONTEOS DEL CLASIFICADOR BAYESIANO
+# Cada alta, edición o baja de un Diagnóstico suma o resta su aporte a las
+# tablas de conteo; nunca se recalculan recorriendo todo el historial.
+# Las bajas y los síntomas también descuentan aquí los resúmenes de analítica.
+# ==========================================
+
+@receiver(pre_save, sender=Diagnostico)
+def recordar_estado_anterior(sender, instance, **kwargs):
+    # Una sola lectura para los conteos bayesianos, la analítica y la caché del historial
+    instance._enfermedad_anterior = None
+    instance._clave_analitica_anterior = None
+    instance._paciente_anterior = None
+    if instance.pk:
+        fila = Diagnostico.objects.filter(pk=instance.pk).values_list(
+            'enfermedad_diagnosticada_id', 'medico_id', 'fecha_diagnostico', 'paciente_id'
+        ).first()
+        if fila:
+            enfermedad_id, medico_id, fecha, instance._paciente_anterior = fila
+            instance._enfermedad_anterior = enfermedad_id
+            instance._clave_analitica_anterior = (analitica.dia_de(fecha), enfermedad_id, medico_id)
+
+
+@receiver(post_save, sender=Diagnostico)
+def contar_diagnostico_guardado(sender, instance, created, **kwargs):
+    nueva = instance.enfermedad_diagnosticada_id
+    if created:
+        # Los síntomas se cuentan al añadirse (m2m_changed)
+        bayes.ajustar_prior(nueva, 1)
+        return
+    anterior = getattr(instance, '_enfermedad_anterior', None)
+    if anterior != nueva:
+        # Cambió la enfermedad: movemos el aporte completo del diagnóstico
+        ids_sintomas = bayes.sintomas_de(instance.pk)
+        bayes.ajustar_prior(anterior, -1)
+        bayes.ajustar_sintomas(anterior, ids_sintomas, -1)
+        bayes.ajustar_prior(nueva, 1)
+        bayes.ajustar_sintomas(nueva, ids_sintomas, 1)
+
+
+@receiver(pre_delete, sender=Diagnostico)
+def descontar_diagnostico(sender, instance, **kwargs):
+    fila = Diagnostico.objects.filter(pk=instance.pk).values_list(
+        'enfermedad_diagnosticada_id', 'medico_id', 'fecha_diagnostico'
+    ).first()
+    if fila is None:
+        return
+    enfermedad_id, medico_id, fecha = fila
+    ids_sintomas = bayes.sintomas_de(instance.pk)
+    bayes.ajustar_prior(enfermedad_id, -1)
+    bayes.ajustar_sintomas(enfermedad_id, ids_sintomas, -1)
+
+    dia = analitica.dia_de(fecha)
+    analitica.ajustar_diagnostico(dia, enfermedad_id, medico_id, -1)
+    analitica.ajustar_sintomas([(dia, s) for s in ids_sintomas], -1)
+
+
+@receiver(m2m_changed, sender=Diagnostico.sintomas_presentados.through)
+def contar_sintomas_presentados(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('pre_remove', 'pre_clear'):
+        # remove() recibe ids aunque no estén relacionados: guardamos las filas
+        # (enfermedad, fecha, síntoma) que realmente existen para descontarlas después
+        filtro = {'sintoma_id': instance.pk} if reverse else {'diagnostico_id': instance.pk}
+        if action == 'pre_remove':
+            filtro['diagnostico_id__in' if reverse else 'sintoma_id__in'] = pk_set
+        instance._filas_a_descontar = list(
+            Diagnostico.sintomas_presentados.through.objects.filter(**filtro)
+            .values_list('diagnostico__enfermedad_diagnosticada_id', 'diagnostico__fecha_diagnostico', 'sintoma_id')
+        )
+    elif action in ('post_remove', 'post_clear'):
+        filas = getattr(instance, '_filas_a_descontar', [])
+        bayes.ajustar_pares([(e, s) for e, _, s in filas if e is not None], -1)
+        analitica.ajustar_sintomas([(analitica.dia_de(f), s) for _, f, s in filas], -1)
+        instance._filas_a_descontar = []
+    elif action == 'post_add' and pk_set:
+        # pk_set solo trae las relaciones nuevas
+        if reverse:
+            # instance es un Síntoma y pk_set son diagnósticos
+            diagnosticos = list(
+                Diagnostico.objects.filter(pk__in=pk_set)
+                .values_list('enfermedad_diagnosticada_id', 'fecha_diagnostico')
+            )
+            bayes.ajustar_pares([(e, instance.pk) for e, _ in diagnosticos if e is not None], 1)
+            analitica.ajustar_sintomas([(analitica.dia_de(f), instance.pk) for _, f in diagnosticos], 1)
+        else:
+            bayes.ajustar_sintomas(instance.enfermedad_diagnosticada_id, pk_set, 1)
+            dia = analitica.dia_de(instance.fecha_diagnostico)
+            analitica.ajustar_sintomas([(dia, s) for s in pk_set], 1)
+
+
+# ==========================================
+# RESÚMENES DE ANALÍTICA
+# Cada diagnóstico suma 1 a su fila (día, enfermedad, médico) y cada síntoma
+# presentado a su fila (día, síntoma); ver analitica.py. Las bajas y los
+# síntomas se descuentan arriba, junto con los conteos bayesianos.
+# ==========================================
+
+@receiver(post_save, sender=Diagnostico)
+def resumir_diagnostico_guardado(sender, instance, created, **kwargs):
+    nueva = (analitica.dia_de(instance.fecha_diagnostico), instance.enfermedad_diagnosticada_id, instance.medico_id)
+    if created:
+        analitica.ajustar_diagnostico(*nueva, 1)
+        return
+    anterior = getattr(instance, '_clave_analitica_anterior', None)
+    if anterior and anterior != nueva:
+        analitica.ajustar_diagnostico(*anterior, -1)
+        analitica.ajustar_diagnostico(*nueva, 1)
+        if anterior[0] != nueva[0]:
+            # Cambió el día: sus síntomas también pasan al nuevo día
+            ids_sintomas = bayes.sintomas_de(instance.pk)
+            analitica.ajustar_sintomas([(anterior[0], s) for s in ids_sintomas], -1)
+            analitica.ajustar_sintomas([(nueva[0], s) for s in ids_sintomas], 1)
+
+
+@receiver(pre_delete, sender=Enfermedad)
+def resumenes_enfermedad_borrada(sender, instance, **kwargs):
+    # Sus diagnósticos quedan sin enfermedad (SET_NULL, sin señales): ver analitica.pasar_a_sin_asignar
+    analitica.pasar_a_sin_asignar('enfermedad_id', instance.pk)
+
+
+@receiver(pre_delete, sender=User)
+def resumenes_medico_borrado(sender, instance, **kwargs):
+    analitica.pasar_a_sin_asignar('medico_id', instance.pk)
+
+
+@receiver(pre_delete, sender=Sintoma)
+def resumenes_sintoma_borrado(sender, instance, **kwargs):
+    # Sus síntomas presentados se borran en cascada, sin m2m_changed: ver analitica.descartar_sintoma
+    analitica.descartar_sintoma(instance.pk)
+
+
+# ==========================================
+# CACHÉ DEL HISTORIAL DE PACIENTES
+# Cualquier cambio en un diagnóstico, sus síntomas, pruebas o tratamientos
+# borra el fragmento renderizado de ese paciente (ver historial.py). Los
+# cambios de nombres que muestra la página invalidan todos los fragmentos.
+# ==========================================
+
+COLUMNA_CATALOGO_DIAGNOSTICO = {
+    Diagnostico.sintomas_presentados.through: 'sintoma_id',
+    Diagnostico.pruebas_realizadas.through: 'pruebalaboratorio_id',
+}
+
+
+@receiver(post_save, sender=Diagnostico)
+@receiver(post_delete, sender=Diagnostico)
+def historial_diagnostico_modificado(sender, instance, **kwargs):
+    historial.invalidar_pacientes([instance.paciente_id, getattr(instance, '_paciente_anterior', None)])
+
+
+@receiver(m2m_changed, sender=Diagnostico.sintomas_presentados.through)
+@receiver(m2m_changed, sender=Diagnostico.pruebas_realizadas.through)
+def historial_relaciones_modificadas(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            historial.invalidar_pacientes([instance.paciente_id])
+    elif action == 'pre_clear':
+        # Desde el catálogo, clear() no informa qué diagnósticos pierden la relación
+        instance._pacientes_afectados = list(
+            sender.objects.filter(**{COLUMNA_CATALOGO_DIAGNOSTICO[sender]: instance.pk})
+            .values_list('diagnostico__paciente_id', flat=True).distinct()
+        )
+    elif action == 'post_clear':
+        historial.invalidar_pacientes(getattr(instance, '_pacientes_afectados', []))
+    elif action in ('post_add', 'post_remove') and pk_set:
+        historial.invalidar_pacientes(
+            Diagnostico.objects.filter(pk__in=pk_set).values_list('paciente_id', flat=True).distinct()
+        )
+
+
+@receiver(post_save, sender=Tratamiento)
+@receiver(post_delete, sender=Tratamiento)
+def historial_tratamiento_modificado(sender, instance, **kwargs):
+    historial.invalidar_pacientes(
+        Diagnostico.objects.filter(pk=instance.diagnostico_id).values_list('paciente_id', flat=True)
+    )
+
+
+@receiver(post_save, sender=Enfermedad)
+@receiver(post_save, sender=Sintoma)
+@receiver(post_save, sender=PruebaLaboratorio)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=Enfermedad)
+@receiver(post_delete, sender=Sintoma)
+@receiver(post_delete, sender=PruebaLaboratorio)
+@receiver(post_delete, sender=User)
+def historial_nombres_modificados(sender, update_fields=None, **kwargs):
+    # Iniciar sesión guarda last_login: no cambia nada de lo que muestra el historial
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    historial.invalidar_todo()
+
+
+# ==========================================
+# CONTADORES DEL PANEL
+# Altas y bajas de pacientes y diagnósticos (ver contadores.py). Borrar un
+# paciente emite post_delete por cada uno de sus diagnósticos en cascada.
+# ==========================================
+
+CONTADOR_POR_MODELO = {Paciente: 'pacientes', Diagnostico: 'diagnosticos'}
+
+
+@receiver(post_save, sender=Paciente)
+@receiver(post_save, sender=Diagnostico)
+def contar_alta(sender, created, **kwargs):
+    if created:
+        contadores.ajustar(CONTADOR_POR_MODELO[sender], 1)
+
+
+@receiver(post_delete, sender=Paciente)
+@receiver(post_delete, sender=Diagnostico)
+def contar_baja(sender, **kwargs):
+    contadores.ajustar(CONTADOR_POR_MODELO[sender], -1)
@@ -0,0 +1,117 @@
+import bisect
+import itertools
+import math
+import random
+
+from django.db import transaction
+
+from .conocimiento import invalidar_base_conocimiento
+from .models import Enfermedad, Sintoma, Signo
+
+# ==========================================
+# BASE DE CONOCIMIENTO SINTÉTICA
+# Genera enfermedades, síntomas y signos de prueba con inserciones masivas,
+# para medir cómo escala el motor de inferencia (ver benchmark_inferencia).
+# ==========================================
+
+DISTRIBUCIONES = ('fija', 'uniforme', 'poisson')
+TAMANO_LOTE = 5000
+
+
+def _cantidad(rng, distribucion, media):
+    # Nº de características de una enfermedad según la distribución elegida (mínimo 1)
+    if distribucion == 'fija':
+        return max(1, media)
+    if distribucion == 'uniforme':
+        return rng.randint(1, max(1, 2 * media - 1))
+    # Poisson por el método de Knuth (suficiente para medias pequeñas)
+    limite, k, p = math.exp(-media), 0, 1.0
+    while True:
+        p *= rng.random()
+        if p <= limite:
+            return max(1, k)
+        k += 1
+
+
+class _Muestreador:
+    """Elige características distintas con popularidad Zipf (exponente 0 = uniforme)."""
+
+    def __init__(self, ids, exponente, rng):
+        self.ids = ids
+        self.rng = rng
+        pesos = [1 / (rango ** exponente) for rango in range(1, len(ids) + 1)]
+        self.acumulado = list(itertools.accumulate(pesos))
+
+    def muestra(self, k):
+        k = min(k, len(self.ids))
+        elegidos = set()
+        total = self.acumulado[-1]
+        while len(elegidos) < k:
+            elegidos.add(self.ids[bisect.bisect_left(self.acumulado, self.rng.random() * total)])
+        return elegidos
+
+
+def _crear(modelo, nombres, **campos):
+    # En SQLite 3.35+ bulk_create devuelve los objetos con su id asignado
+    objetos = modelo.objects.bulk_create(
+        [modelo(nombre=nombre, **campos) for nombre in nombres], batch_size=TAMANO_LOTE
+    )
+    return [objeto.pk for objeto in objetos]
+
+
+def generar_base_sintetica(n_enfermedades, n_sintomas, n_signos, distribucion='poisson',
+                           media=8, zipf=1.0, semilla=None, prefijo='Sintético'):
+    """
+    Crea n_enfermedades con, en promedio, `media` características cada una
+    (repartidas entre síntomas y signos en proporción a su número).
+    Devuelve (ids_sintomas, ids_signos) creados.
+    """
+    if distribucion not in DISTRIBUCIONES:
+        raise ValueError(f'Distribución desconocida: {distribucion}')
+
+    rng = random.Random(semilla)
+    with transaction.atomic():
+        ids_sintomas = _crear(Sintoma, (f'{prefijo} síntoma {i}' for i in range(1, n_sintomas + 1)))
+        ids_signos = _crear(Signo, (f'{prefijo} signo {i}' for i in range(1, n_signos + 1)))
+        muestreo_sintomas = _Muestreador(ids_sintomas, zipf, rng) if ids_sintomas else None
+        muestreo_signos = _Muestreador(ids_signos, zipf, rng) if ids_signos else None
+        fraccion_sintomas = n_sintomas / max(1, n_sintomas + n_signos)
+
+        # Primero elegimos las características para crear cada enfermedad con sus conteos num_*
+        caracteristicas = []
+        for _ in range(n_enfermedades):
+            total = _cantidad(rng, distribucion, media)
+            k_sintomas = sum(rng.random() < fraccion_sintomas for _ in range(total))
+            caracteristicas.append((
+                muestreo_sintomas.muestra(k_sintomas) if muestreo_sintomas else set(),
+                muestreo_signos.muestra(total - k_sintomas) if muestreo_signos else set(),
+            ))
+
+        enfermedades = Enfermedad.objects.bulk_create([
+            Enfermedad(
+                nombre=f'{prefijo} enfermedad {i}',
+                descripcion='Generada para pruebas de rendimiento.',
+                num_sintomas=len(sintomas),
+                num_signos=len(signos),
+            )
+            for i, (sintomas, signos) in enumerate(caracteristicas, start=1)
+        ], batch_size=TAMANO_LOTE)
+
+        SintomaRel = Enfermedad.sintomas.through
+        SignoRel = Enfermedad.signos.through
+        filas_sintomas, filas_signos = [], []
+        for enfermedad, (sintomas, signos) in zip(enfermedades, caracteristicas):
+            filas_sintomas += [SintomaRel(enfermedad_id=enfermedad.pk, sintoma_id=s) for s in sintomas]
+            filas_signos += [SignoRel(enfermedad_id=enfermedad.pk, signo_id=s) for s in signos]
+            if len(filas_sintomas) + len(filas_signos) >= TAMANO_LOTE:
+                SintomaRel.objects.bulk_create(filas_sintomas, batch_size=TAMANO_LOTE)
+                SignoRel.objects.bulk_create(filas_signos, batch_size=TAMANO_LOTE)
+                filas_sintomas, filas_signos = [], []
+        SintomaRel.objects.bulk_create(filas_sintomas, batch_size=TAMANO_LOTE)
+        SignoRel.objects.bulk_create(filas_signos, batch_size=TAMANO_LOTE)
+
+        # bulk_create no emite señales: los conteos num_* ya van en cada fila y la
+        # base de conocimiento se invalida a mano
+        invalidar_base_conocimiento()
+
+    return ids_sintomas, ids_signos
@@ -1,3 +1,356 @@
-from django.test import TestCase
+import datetime
+import json
+import os
+import tempfile
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from . import analitica, bayes, contadores, importacion, trabajos
+from .models import (
+    ConteoEnfermedad, ConteoSintomaEnfermedad, Diagnostico, Enfermedad, Paciente, ResumenDiarioDiagnostico,
+    ResumenDiarioSintoma, Sintoma, Trabajo,
+)
+from .paginacion import apaginar_por_cursor
+
+# ==========================================
+# CONTEOS DERIVADOS
+# Las tablas de conteo bayesiano, los resúmenes de analítica y los contadores
+# del panel se mantienen de forma incremental (signals.py, importacion.py).
+# Lo que dejan debe ser exactamente lo que calcularía una reconstrucción.
+# ==========================================
+
+def crear_paciente(nombre='Ana', apellido='Ruiz'):
+    return Paciente.objects.create(
+        nombre=nombre, apellido=apellido, fecha_nacimiento=datetime.date(1990, 1, 1),
+        direccion='Calle 1', telefono='555', email='ana@example.com',
+    )
+
+
+def estado_derivado():
+    # Las filas a cero no cuentan: la vía incremental puede dejarlas, la reconstrucción no las crea
+    return {
+        'priors': sorted(ConteoEnfermedad.objects.exclude(total=0).values_list('enfermedad_id', 'total')),
+        'sintomas': sorted(
+            ConteoSintomaEnfermedad.objects.exclude(total=0).values_list('enfermedad_id', 'sintoma_id', 'total')
+        ),
+        'diagnosticos_dia': sorted(
+            ResumenDiarioDiagnostico.objects.exclude(total=0).values_list('fecha', 'enfermedad_id', 'medico_id', 'total')
+        ),
+        'sintomas_dia': sorted(ResumenDiarioSintoma.objects.exclude(total=0).values_list('fecha', 'sintoma_id', 'total')),
+    }
+
+
+class ComprobacionReconstruccion:
+    def assertIgualAReconstruir(self):
+        incremental = estado_derivado()
+        bayes.reconstruir()
+        analitica.reconstruir()
+        self.assertEqual(incremental, estado_derivado())
+        self.assertEqual(contadores.reconciliar(corregir=False), {})
+        self.assertFalse(ResumenDiarioDiagnostico.objects.filter(total__lt=0).exists())
+        self.assertFalse(ResumenDiarioSintoma.objects.filter(total__lt=0).exists())
+
+
+class ConteosIncrementalesTests(ComprobacionReconstruccion, TestCase):
+    def setUp(self):
+        self.medico1 = User.objects.create_user('medico1')
+        self.medico2 = User.objects.create_user('medico2')
+        self.gripe = Enfermedad.objects.create(nombre='Gripe', descripcion='')
+        self.covid = Enfermedad.objects.create(nombre='COVID-19', descripcion='')
+        self.tos, self.fiebre, self.fatiga = (Sintoma.objects.create(nombre=n) for n in ('Tos', 'Fiebre', 'Fatiga'))
+        self.paciente = crear_paciente()
+
+    def diagnostico(self, enfermedad, medico, *sintomas):
+        diagnostico = Diagnostico.objects.create(paciente=self.paciente, medico=medico, enfermedad_diagnosticada=enfermedad)
+        diagnostico.sintomas_presentados.add(*sintomas)
+        return diagnostico
+
+    def test_alta_edicion_y_baja(self):
+        primero = self.diagnostico(self.gripe, self.medico1, self.tos, self.fiebre)
+        segundo = self.diagnostico(self.covid, self.medico2, self.fiebre)
+        self.diagnostico(None, None, self.fatiga)
+        self.assertIgualAReconstruir()
+
+        primero.enfermedad_diagnosticada = self.covid
+        primero.save()
+        self.assertIgualAReconstruir()
+
+        segundo.fecha_diagnostico = timezone.now() - datetime.timedelta(days=3)
+        segundo.medico = self.medico1
+        segundo.save()
+        self.assertIgualAReconstruir()
+
+        primero.delete()
+        self.assertIgualAReconstruir()
+
+    def test_cambios_de_sintomas_desde_ambos_lados(self):
+        primero = self.diagnostico(self.gripe, self.medico1, self.tos)
+        segundo = self.diagnostico(self.covid, self.medico1)
+
+        primero.sintomas_presentados.add(self.fiebre)
+        primero.sintomas_presentados.remove(self.tos, self.fatiga)  # Fatiga no estaba: no descuenta
+        self.assertIgualAReconstruir()
+
+        self.fatiga.diagnostico_set.add(primero, segundo)
+        self.tos.diagnostico_set.add(segundo)
+        self.assertIgualAReconstruir()
+
+        self.fatiga.diagnostico_set.remove(primero)
+        segundo.sintomas_presentados.clear()
+        self.assertIgualAReconstruir()
+
+        self.fiebre.diagnostico_set.clear()
+        self.assertIgualAReconstruir()
+
+    def test_borrar_enfermedad_medico_y_sintoma(self):
+        self.diagnostico(self.gripe, self.medico1, self.tos, self.fiebre)
+        self.diagnostico(self.gripe, self.medico2, self.tos)
+        huerfano = self.diagnostico(self.covid, self.medico2, self.fatiga)
+
+        self.gripe.delete()
+        self.assertIgualAReconstruir()
+        self.medico2.delete()
+        self.assertIgualAReconstruir()
+        self.tos.delete()
+        self.assertIgualAReconstruir()
+
+        # Ediciones y bajas posteriores de los diagnósticos que quedaron sin médico
+        huerfano.refresh_from_db()
+        huerfano.enfermedad_diagnosticada = None
+        huerfano.save()
+        Diagnostico.objects.filter(medico=None).first().delete()
+        self.assertIgualAReconstruir()
+
+
+# ==========================================
+# IMPORTACIÓN MASIVA
+# ==========================================
+
+class Corte(Exception):
+    pass
+
+
+def cortar(procesados, importados, segundos):
+    # al_avanzar que simula un proceso interrumpido justo después de confirmar el primer lote
+    raise Corte
+
+
+class ImportacionTests(ComprobacionReconstruccion, TestCase):
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.directorio = directorio.name
+        User.objects.create_user('dra.ruiz')
+        self.gripe = Enfermedad.objects.create(nombre='Gripe', descripcion='')
+        for nombre in ('Tos seca', 'Fiebre', 'Náuseas'):
+            Sintoma.objects.create(nombre=nombre)
+        self.pacientes = [crear_paciente(f'Paciente{i}', 'Prueba') for i in range(3)]
+        # Un diagnóstico previo registrado por la vía normal (señales)
+        previo = Diagnostico.objects.create(paciente=self.pacientes[0], enfermedad_diagnosticada=self.gripe)
+        previo.sintomas_presentados.add(Sintoma.objects.get(nombre='Fiebre'))
+
+    def archivo(self, nombre, registros):
+        ruta = os.path.join(self.directorio, nombre)
+        with open(ruta, 'w', encoding='utf-8') as archivo:
+            archivo.writelines(json.dumps(registro) + '\n' for registro in registros)
+        return ruta
+
+    def registros_diagnosticos(self):
+        registros = []
+        for i in range(7):
+            registros.append({
+                'paciente_id': self.pacientes[i % 3].id,
+                'medico': 'dra.ruiz' if i % 2 else '',
+                'enfermedad': 'GRIPE' if i % 3 else '',
+                'fecha': f'2024-03-0{i + 1}T10:30:00',
+                'sintomas': ['tos seca', 'nauseas'] if i % 2 else 'Fiebre',
+            })
+        registros.insert(4, {'paciente_id': 999999, 'fecha': '2024-03-09T10:00:00'})  # paciente inexistente
+        return registros
+
+    def test_reanuda_tras_un_corte_y_no_repite(self):
+        ruta = self.archivo('diagnosticos.jsonl', self.registros_diagnosticos())
+        with self.assertRaises(Corte):
+            importacion.importar(ruta, 'diagnosticos', tam_lote=3, al_avanzar=cortar)
+        self.assertEqual(Diagnostico.objects.count(), 1 + 3)
+
+        errores = []
+        resultado = importacion.importar(ruta, 'diagnosticos', tam_lote=3, al_error=errores.append)
+        self.assertEqual((resultado.omitidos, resultado.registros, resultado.importados), (3, 5, 4))
+        self.assertEqual([error.numero for error in errores], [5])
+        self.assertEqual(Diagnostico.objects.count(), 1 + 7)
+
+        otra_vez = importacion.importar(ruta, 'diagnosticos', tam_lote=3)
+        self.assertEqual((otra_vez.registros, otra_vez.importados), (0, 0))
+        self.assertEqual(Diagnostico.objects.count(), 1 + 7)
+
+    def test_conserva_fechas_y_nombres_del_archivo(self):
+        ruta = self.archivo('diagnosticos.jsonl', self.registros_diagnosticos())
+        importacion.importar(ruta, 'diagnosticos', tam_lote=3)
+
+        importados = Diagnostico.objects.filter(fecha_diagnostico__year=2024).order_by('fecha_diagnostico')
+        self.assertEqual([d.fecha_diagnostico.day for d in importados], [1, 2, 3, 4, 5, 6, 7])
+        self.assertEqual(
+            sorted(importados[1].sintomas_presentados.values_list('nombre', flat=True)), ['Náuseas', 'Tos seca']
+        )
+        self.assertTrue(Diagnostico._meta.get_field('fecha_diagnostico').auto_now_add)
+
+    def test_conteos_derivados_iguales_a_reconstruir(self):
+        ruta = self.archivo('diagnosticos.jsonl', self.registros_diagnosticos())
+        with self.assertRaises(Corte):
+            importacion.importar(ruta, 'diagnosticos', tam_lote=3, al_avanzar=cortar)
+        importacion.importar(ruta, 'diagnosticos', tam_lote=3)
+        self.assertIgualAReconstruir()
+
+    def test_pacientes_y_contador_del_panel(self):
+        ruta = self.archivo('pacientes.jsonl', [
+            {'nombre': 'Luis', 'apellido': 'Paz', 'fecha_nacimiento': '1980-05-01', 'direccion': 'x',
+             'telefono': '1', 'email': 'luis@example.com'},
+            {'nombre': 'Eva', 'apellido': 'Sol', 'fecha_nacimiento': 'ayer', 'direccion': 'x',
+             'telefono': '1', 'email': 'eva@example.com'},
+        ])
+        resultado = importacion.importar(ruta, 'pacientes')
+        self.assertEqual((resultado.importados, resultado.errores), (1, 1))
+        self.assertEqual(contadores.leer()['pacientes'], Paciente.objects.count())
+        self.assertEqual(contadores.reconciliar(corregir=False), {})
+
+
+# ==========================================
+# PAGINACIÓN POR CURSOR
+# ==========================================
+
+class PaginacionCursorTests(TestCase):
+    orden = ('apellido', 'nombre', 'id')
+
+    @classmethod
+    def setUpTestData(cls):
+        # Apellidos y nombres repetidos: el id desempata
+        for i in range(23):
+            crear_paciente(f'Nombre{i % 4}', f'Apellido{i % 5}')
+        cls.esperados = list(Paciente.objects.order_by(*cls.orden).values_list('id', flat=True))
+
+    async def paginas_hacia_delante(self, tam):
+        paginas, cursor = [], ''
+        while True:
+            pagina = await apaginar_por_cursor(Paciente.objects.all(), self.orden, cursor, tam)
+            paginas.append(pagina)
+            if not pagina.siguiente:
+                return paginas
+            cursor = pagina.siguiente
+
+    async def test_recorre_todo_hacia_delante_sin_repetir(self):
+        paginas = await self.paginas_hacia_delante(5)
+        self.assertEqual([p.id for pagina in paginas for p in pagina.objetos], self.esperados)
+        tamanos = [len(self.esperados[i:i + 5]) for i in range(0, len(self.esperados), 5)]
+        self.assertEqual([len(pagina.objetos) for pagina in paginas], tamanos)
+        self.assertEqual(paginas[0].anterior, '')
+
+    async def test_vuelve_atras_con_las_mismas_paginas(self):
+        paginas = await self.paginas_hacia_delante(5)
+        cursor = paginas[-1].anterior
+        for esperada in reversed(paginas[:-1]):
+            pagina = await apaginar_por_cursor(Paciente.objects.all(), self.orden, cursor, 5)
+            self.assertEqual([p.id for p in pagina.objetos], [p.id for p in esperada.objetos])
+            cursor = pagina.anterior
+        self.assertEqual(cursor, '')
+
+    async def test_token_invalido_es_la_primera_pagina(self):
+        pagina = await apaginar_por_cursor(Paciente.objects.all(), self.orden, 'no-es-un-cursor', 5)
+        self.assertEqual([p.id for p in pagina.objetos], self.esperados[:5])
+
+
+# ==========================================
+# TRABAJOS EN SEGUNDO PLANO
+# TransactionTestCase: ejecutar_trabajo llama a close_old_connections(), que
+# cerraría la conexión dentro de la transacción de un TestCase.
+# ==========================================
+
+ejecuciones = []
+
+
+@trabajos.tarea('prueba_falla')
+def _tarea_que_falla(trabajo, avance):
+    ejecuciones.append(trabajo.intentos)
+    raise RuntimeError('fallo transitorio')
+
+
+@trabajos.tarea('prueba_permanente')
+def _tarea_permanente(trabajo, avance):
+    raise trabajos.ErrorPermanente('parámetros inválidos')
+
+
+@trabajos.tarea('prueba_ok')
+def _tarea_ok(trabajo, avance):
+    avance(1, 1, 'hecho', forzar=True)
+    return {'ok': True}
+
+
+class TrabajosTests(TransactionTestCase):
+    trabajador = 'pruebas:1'
+
+    def setUp(self):
+        ejecuciones.clear()
+
+    def reclamar_y_ejecutar(self):
+        trabajo = trabajos.reclamar(self.trabajador)
+        self.assertIsNotNone(trabajo)
+        return trabajos.ejecutar_trabajo(trabajo.id, self.trabajador)
+
+    def hacer_disponible(self, trabajo):
+        Trabajo.objects.filter(id=trabajo.id).update(disponible_desde=timezone.now())
+
+    def test_completa_y_guarda_resultado(self):
+        trabajo = trabajos.encolar('prueba_ok')
+        self.assertEqual(self.reclamar_y_ejecutar(), Trabajo.COMPLETADO)
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.resultado, trabajo.avance, trabajo.mensaje), ({'ok': True}, 1, 'hecho'))
+        self.assertIsNone(trabajos.reclamar(self.trabajador))
+
+    def test_reintenta_con_espera_hasta_agotar_intentos(self):
+        trabajo = trabajos.encolar('prueba_falla', max_intentos=3)
+        config = trabajos.configuracion()
+        for intento in (1, 2):
+            antes = timezone.now()
+            self.assertEqual(self.reclamar_y_ejecutar(), Trabajo.PENDIENTE)
+            trabajo.refresh_from_db()
+            espera = (trabajo.disponible_desde - antes).total_seconds()
+            maxima = min(config['espera_max'], config['espera_base'] * 2 ** (intento - 1))
+            self.assertTrue(maxima / 2 - 1 <= espera <= maxima + 1, espera)
+            self.assertIn('fallo transitorio', trabajo.error)
+            # Aún no está disponible: nadie lo reclama antes de la espera
+            self.assertIsNone(trabajos.reclamar(self.trabajador))
+            self.hacer_disponible(trabajo)
+
+        self.assertEqual(self.reclamar_y_ejecutar(), Trabajo.FALLIDO)
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.estado, trabajo.intentos), (Trabajo.FALLIDO, 3))
+        self.assertEqual(ejecuciones, [1, 2, 3])
+
+    def test_error_permanente_no_se_reintenta(self):
+        trabajo = trabajos.encolar('prueba_permanente', max_intentos=5)
+        self.assertEqual(self.reclamar_y_ejecutar(), Trabajo.FALLIDO)
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.intentos, trabajo.error), (1, 'parámetros inválidos'))
+
+    def test_abandonado_vuelve_a_la_cola_o_falla_sin_intentos(self):
+        con_intentos = trabajos.encolar('prueba_ok', max_intentos=2)
+        sin_intentos = trabajos.encolar('prueba_ok', max_intentos=1)
+        trabajos.reclamar('muerto:1')
+        trabajos.reclamar('muerto:1')
+        config = trabajos.configuracion()
+        # Un latido reciente no se toca
+        self.assertEqual(trabajos.recuperar_abandonados(config), (0, 0))
+
+        hace_rato = timezone.now() - datetime.timedelta(seconds=config['abandono'] + 1)
+        Trabajo.objects.update(latido=hace_rato)
+        self.assertEqual(trabajos.recuperar_abandonados(config), (1, 1))
+        con_intentos.refresh_from_db()
+        sin_intentos.refresh_from_db()
+        self.assertEqual((con_intentos.estado, con_intentos.trabajador), (Trabajo.PENDIENTE, ''))
+        self.assertEqual(sin_intentos.estado, Trabajo.FALLIDO)
+
+        # El trabajador original ya no puede registrar el fallo de un trabajo que perdió
+        self.assertIsNone(trabajos.registrar_fallo(con_intentos.id, 'muerto:1', 'tarde'))
+        self.assertEqual(self.reclamar_y_ejecutar(), Trabajo.COMPLETADO)
@@ -0,0 +1,287 @@
+import datetime
+import os
+import random
+import time
+import traceback
+from pathlib import Path
+from typing import Callable, NamedTuple, Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from . import analitica, exportacion
+from .carga_conocimiento import cargar, leer_archivo
+from .importacion import importar
+from .models import Trabajo
+
+# ==========================================
+# TRABAJOS EN SEGUNDO PLANO
+# Cola sobre la tabla Trabajo, sin broker externo. Las vistas (o el comando
+# encolar_trabajo) llaman a encolar(); `manage.py procesar_trabajos` reclama
+# los pendientes y los ejecuta en un grupo de hilos o de procesos.
+# - Reclamar es un UPDATE condicionado a estado='pendiente': si dos
+#   trabajadores eligen el mismo, solo uno cambia la fila y el otro prueba
+#   con el siguiente. Funciona igual en SQLite y en PostgreSQL.
+# - La tarea informa del avance con avance(hecho, total, mensaje); se guarda
+#   como mucho cada AVANCE_SEGUNDOS y sirve también de latido.
+# - Si la tarea lanza una excepción, vuelve a 'pendiente' con espera
+#   exponencial (ESPERA_BASE * 2^(intento-1), hasta ESPERA_MAX, con algo de
+#   azar) mientras queden intentos; después queda 'fallido' con la traza.
+#   ErrorPermanente (parámetros inválidos, archivo inexistente) no se reintenta.
+# - Un trabajo 'en_curso' sin latido en ABANDONO segundos (el trabajador
+#   murió) se devuelve a la cola, o se da por fallido si no quedan intentos.
+# ==========================================
+
+
+class ErrorPermanente(Exception):
+    """Fallo que no se arregla reintentando: el trabajo pasa directamente a 'fallido'."""
+
+
+def configuracion():
+    config = getattr(settings, 'TRABAJOS', {})
+    return {
+        'concurrencia': config.get('CONCURRENCIA', 2),
+        'modo': config.get('MODO', 'hilos'),
+        'intervalo': config.get('INTERVALO', 1.0),
+        'max_intentos': config.get('MAX_INTENTOS', 3),
+        'espera_base': config.get('ESPERA_BASE', 10),
+        'espera_max': config.get('ESPERA_MAX', 600),
+        'abandono': config.get('ABANDONO', 300),
+        'avance_segundos': config.get('AVANCE_SEGUNDOS', 1.0),
+        'directorio': Path(config.get('DIRECTORIO', settings.BASE_DIR / 'trabajos')),
+    }
+
+
+# ==========================================
+# REGISTRO DE TAREAS
+# ==========================================
+
+class Tarea(NamedTuple):
+    funcion: Callable
+    max_intentos: Optional[int]
+
+
+TAREAS = {}
+
+
+def tarea(nombre, max_intentos=None):
+    """Registra funcion(trabajo, avance) -> resultado (serializable a JSON) con el nombre `nombre`."""
+    def registrar(funcion):
+        TAREAS[nombre] = Tarea(funcion, max_intentos)
+        return funcion
+    return registrar
+
+
+# ==========================================
+# COLA
+# ==========================================
+
+def encolar(tipo, parametros=None, usuario=None, max_intentos=None):
+    if tipo not in TAREAS:
+        raise ValueError(f'Tarea desconocida: {tipo}.')
+    if max_intentos is None:
+        max_intentos = TAREAS[tipo].max_intentos or configuracion()['max_intentos']
+    return Trabajo.objects.create(
+        tipo=tipo, parametros=parametros or {}, max_intentos=max_intentos,
+        creado_por=usuario if usuario is not None and usuario.is_authenticated else None,
+    )
+
+
+def reclamar(trabajador):
+    """Pasa a 'en_curso' el pendiente disponible más antiguo y lo devuelve (None si no hay)."""
+    while True:
+        ahora = timezone.now()
+        candidato = (
+            Trabajo.objects.filter(estado=Trabajo.PENDIENTE, disponible_desde__lte=ahora)
+            .order_by('disponible_desde', 'id').values_list('id', flat=True).first()
+        )
+        if candidato is None:
+            return None
+        reclamado = Trabajo.objects.filter(id=candidato, estado=Trabajo.PENDIENTE).update(
+            estado=Trabajo.EN_CURSO, intentos=F('intentos') + 1, trabajador=trabajador,
+            iniciado=ahora, latido=ahora, terminado=None, avance=0, total=None, mensaje='',
+        )
+        if reclamado:
+            return Trabajo.objects.get(id=candidato)
+        # Otro trabajador se lo llevó entre la consulta y el UPDATE: siguiente candidato
+
+
+def latir(trabajador, ids):
+    if ids:
+        Trabajo.objects.filter(id__in=ids, estado=Trabajo.EN_CURSO, trabajador=trabajador).update(
+            latido=timezone.now()
+        )
+
+
+def espera(intento, config):
+    segundos = min(config['espera_max'], config['espera_base'] * 2 ** (intento - 1))
+    # Entre la mitad y el total: los reintentos de muchos trabajos no coinciden en el mismo instante
+    return datetime.timedelta(seconds=segundos * random.uniform(0.5, 1.0))
+
+
+def registrar_fallo(id_trabajo, trabajador, error, permanente=False):
+    """Devuelve el trabajo a la cola con espera, o lo marca 'fallido' si no quedan intentos."""
+    config = configuracion()
+    propio = Trabajo.objects.filter(id=id_trabajo, estado=Trabajo.EN_CURSO, trabajador=trabajador)
+    trabajo = propio.first()
+    if trabajo is None:
+        return None  # Se dio por abandonado y ya es de otro trabajador
+    ahora = timezone.now()
+    if permanente or trabajo.intentos >= trabajo.max_intentos:
+        propio.update(estado=Trabajo.FALLIDO, error=error, terminado=ahora, latido=None)
+        return Trabajo.FALLIDO
+    propio.update(estado=Trabajo.PENDIENTE, error=error, disponible_desde=ahora + espera(trabajo.intentos, config),
+                  trabajador='', latido=None)
+    return Trabajo.PENDIENTE
+
+
+def recuperar_abandonados(config=None):
+    config = config or configuracion()
+    limite = timezone.now() - datetime.timedelta(seconds=config['abandono'])
+    abandonados = Trabajo.objects.filter(estado=Trabajo.EN_CURSO, latido__lt=limite)
+    mensaje = 'El trabajador dejó de dar señales de vida.'
+    fallidos = abandonados.filter(intentos__gte=F('max_intentos')).update(
+        estado=Trabajo.FALLIDO, error=mensaje, terminado=timezone.now(), latido=None
+    )
+    devueltos = abandonados.update(
+        estado=Trabajo.PENDIENTE, error=mensaje, disponible_desde=timezone.now(), trabajador='', latido=None
+    )
+    return devueltos, fallidos
+
+
+# ==========================================
+# EJECUCIÓN
+# ==========================================
+
+class Avance:
+    """avance(hecho, total=None, mensaje=None): guarda el progreso, como mucho cada `cada` segundos."""
+
+    def __init__(self, id_trabajo, trabajador, cada):
+        self.filas = Trabajo.objects.filter(id=id_trabajo, estado=Trabajo.EN_CURSO, trabajador=trabajador)
+        self.cada = cada
+        self._ultimo = 0.0
+
+    def __call__(self, hecho, total=None, mensaje=None, forzar=False):
+        ahora = time.monotonic()
+        if not forzar and ahora - self._ultimo < self.cada:
+            return
+        self._ultimo = ahora
+        cambios = {'avance': hecho, 'latido': timezone.now()}
+        if total is not None:
+            cambios['total'] = total
+        if mensaje is not None:
+            cambios['mensaje'] = mensaje[:255]
+        self.filas.update(**cambios)
+
+
+def ejecutar_trabajo(id_trabajo, trabajador):
+    """
+    Ejecuta un trabajo ya reclamado por `trabajador` y devuelve su estado final.
+    Función de módulo para que el grupo de procesos pueda enviarla por pickle.
+    """
+    close_old_connections()
+    try:
+        trabajo = Trabajo.objects.get(id=id_trabajo)
+        registrada = TAREAS.get(trabajo.tipo)
+        if registrada is None:
+            return registrar_fallo(id_trabajo, trabajador, f'Tarea desconocida: {trabajo.tipo}.', permanente=True)
+        avance = Avance(id_trabajo, trabajador, configuracion()['avance_segundos'])
+        try:
+            resultado = registrada.funcion(trabajo, avance)
+        except ErrorPermanente as error:
+            return registrar_fallo(id_trabajo, trabajador, str(error), permanente=True)
+        except Exception:
+            return registrar_fallo(id_trabajo, trabajador, traceback.format_exc())
+
+        Trabajo.objects.filter(id=id_trabajo, estado=Trabajo.EN_CURSO, trabajador=trabajador).update(
+            estado=Trabajo.COMPLETADO, resultado=resultado, error='', terminado=timezone.now(), latido=None
+        )
+        return Trabajo.COMPLETADO
+    finally:
+        close_old_connections()
+
+
+# ==========================================
+# TAREAS
+# ==========================================
+
+def archivo_exportacion(trabajo):
+    formato = trabajo.parametros.get('formato', 'csv')
+    return configuracion()['directorio'] / f'diagnosticos_{trabajo.id}.{formato}'
+
+
+@tarea('exportar_diagnosticos')
+def exportar_diagnosticos(trabajo, avance):
+    # parametros: formato, desde/hasta (AAAA-MM-DD), enfermedades (lista de ids)
+    parametros = trabajo.parametros
+    formato = parametros.get('formato', 'csv')
+    if formato not in exportacion.FORMATOS:
+        raise ErrorPermanente(f'Formato desconocido: {formato}.')
+    try:
+        desde = datetime.date.fromisoformat(parametros['desde']) if parametros.get('desde') else None
+        hasta = datetime.date.fromisoformat(parametros['hasta']) if parametros.get('hasta') else None
+    except (TypeError, ValueError):
+        raise ErrorPermanente('Fechas inválidas (AAAA-MM-DD).')
+
+    diagnosticos = exportacion.diagnosticos_a_exportar(desde, hasta, parametros.get('enfermedades'))
+    total = diagnosticos.count()
+    avance(0, total, 'Exportando diagnósticos', forzar=True)
+    destino = archivo_exportacion(trabajo)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    # Se escribe aparte y se renombra al terminar: un reintento no deja un archivo a medias
+    temporal = destino.with_name(destino.name + '.parcial')
+    filas = -1 if formato == 'csv' else 0  # la cabecera CSV no cuenta
+    with open(temporal, 'w', encoding='utf-8', newline='') as archivo:
+        for linea in exportacion.lineas(diagnosticos, formato):
+            archivo.write(linea)
+            filas += 1
+            avance(max(filas, 0))
+    os.replace(temporal, destino)
+    avance(filas, total, f'{filas} diagnóstico(s) exportado(s)', forzar=True)
+    return {'archivo': destino.name, 'filas': filas, 'bytes': destino.stat().st_size}
+
+
+@tarea('importar_registros')
+def importar_registros(trabajo, avance):
+    # parametros: tipo, archivo (ruta en el servidor), formato. El progreso guardado
+    # en ProgresoImportacion hace que un reintento continúe donde se quedó.
+    parametros = trabajo.parametros
+    if not os.path.isfile(parametros.get('archivo', '')):
+        raise ErrorPermanente(f"No existe el archivo {parametros.get('archivo')!r}.")
+    try:
+        resultado = importar(
+            parametros['archivo'], parametros.get('tipo'), formato=parametros.get('formato'),
+            al_avanzar=lambda procesados, importados, _: avance(
+                procesados, mensaje=f'{procesados} registros, {importados} importados'
+            ),
+        )
+    except ValueError as error:
+        raise ErrorPermanente(str(error))
+    return resultado._asdict()
+
+
+@tarea('cargar_base_conocimiento')
+def cargar_base_conocimiento(trabajo, avance):
+    # parametros: archivo (ruta en el servidor), formato
+    parametros = trabajo.parametros
+    try:
+        catalogos, enfermedades = leer_archivo(parametros.get('archivo', ''), parametros.get('formato'))
+    except (OSError, ValueError) as error:
+        raise ErrorPermanente(str(error))
+    avance(0, len(enfermedades), 'Cargando enfermedades', forzar=True)
+    cambios = cargar(catalogos, enfermedades)
+    return {
+        'enfermedades': len(enfermedades),
+        'enfermedades_nuevas': len(cambios.enfermedades_nuevas),
+        'catalogos_nuevos': {clave: len(nombres) for clave, nombres in cambios.catalogos_nuevos.items()},
+        'relaciones_nuevas': sum(len(n) for nuevas in cambios.relaciones_nuevas.values() for n in nuevas.values()),
+    }
+
+
+@tarea('reconstruir_analitica')
+def reconstruir_analitica(trabajo, avance):
+    avance(0, mensaje='Recalculando resúmenes diarios', forzar=True)
+    analitica.reconstruir()
+    return {}
@@ -15,6 +15,9 @@ urlpatterns = [
 
     path('pacientes/', views.lista_pacientes, name='lista_pacientes'),
     path('pacientes/nuevo/', views.crear_paciente, name='crear_paciente'),
+    path('pacientes/<int:id>/', views.detalle_paciente, name='detalle_paciente'),
+    path('pacientes/buscar/', views.buscar_pacientes, name='buscar_pacientes'),
+    path('pacientes/api/buscar/', views.api_buscar_pacientes, name='api_buscar_pacientes'),
     
     path('administradores/', views.lista_admins, name='lista_admins'),
     path('administradores/nuevo/', views.crear_admin, name='crear_admin'),
@@ -35,9 +38,29 @@ urlpatterns = [
     path('signos/eliminar/<int:id>/', views.eliminar_signo, name='eliminar_signo'),
 
     path('diagnosticos/', views.lista_diagnosticos, name='lista_diagnosticos'),
+    path('diagnosticos/exportar/', views.exportar_diagnosticos, name='exportar_diagnosticos'),
+    path('diagnosticos/exportar/segundo-plano/', views.exportar_diagnosticos_segundo_plano, name='exportar_diagnosticos_segundo_plano'),
     path('diagnosticos/nuevo/', views.crear_diagnostico, name='crear_diagnostico'),
     path('diagnosticos/editar/<int:id>/', views.editar_diagnostico, name='editar_diagnostico'),
     path('diagnosticos/eliminar/<int:id>/', views.eliminar_diagnostico, name='eliminar_diagnostico'),
 
     path('inferencia/', views.motor_inferencia, name='motor_inferencia'),
+    path('inferencia/api/lote/', views.api_inferencia_lote, name='api_inferencia_lote'),
+    path('inferencia/api/sesion/reiniciar/', views.api_sesion_inferencia_reiniciar, name='api_sesion_inferencia_reiniciar'),
+    path('inferencia/api/sesion/alternar/', views.api_sesion_inferencia_alternar, name='api_sesion_inferencia_alternar'),
+
+    path('catalogos/<str:catalogo>/buscar/', views.api_catalogo_buscar, name='api_catalogo_buscar'),
+
+    path('analitica/', views.analitica_view, name='analitica'),
+    path('analitica/api/diagnosticos/', views.api_analitica_diagnosticos, name='api_analitica_diagnosticos'),
+    path('analitica/api/sintomas/', views.api_analitica_sintomas, name='api_analitica_sintomas'),
+
+    path('metrics', views.metricas_prometheus, name='metricas'),
+    path('perfiles/', views.lista_perfiles, name='lista_perfiles'),
+    path('perfiles/agregado/', views.perfil_agregado, name='perfil_agregado'),
+    path('perfiles/<str:id_captura>/', views.descargar_perfil, name='descargar_perfil'),
+
+    path('trabajos/api/', views.api_trabajos, name='api_trabajos'),
+    path('trabajos/api/<int:id>/', views.api_trabajo, name='api_trabajo'),
+    path('trabajos/<int:id>/descargar/', views.descargar_trabajo, name='descargar_trabajo'),
 ]
\ No newline at end of file
@@ -1,36 +1,76 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
-from .models import Paciente, Diagnostico, Enfermedad, Sintoma, Signo
+from .models import Paciente, Diagnostico, Enfermedad, Sintoma, Signo, Trabajo
 from django.contrib.auth.models import User
 from .forms import PacienteForm, RegistroUsuarioForm
 from django.contrib import messages
 from django.contrib.auth.models import Group
-from .forms import EnfermedadForm, SintomaForm, SignoForm, DiagnosticoForm, InferenciaForm
+from .forms import EnfermedadForm, SintomaForm, SignoForm, DiagnosticoForm, InferenciaForm, METODOS
 from django.shortcuts import get_object_or_404
+from django.db import router, transaction
 from django.db.models import Count
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.utils import timezone
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.crypto import constant_time_compare
+from django.utils.text import slugify
+from django.urls import reverse
+from django.views.decorators.http import require_POST
+import datetime
+import json
+from .base_datos import solo_lectura
+from .conocimiento import obtener_base, cambios_en_lote
+from . import analitica, bayes, busqueda, cache_inferencia, contadores, exportacion, historial, metricas, perfilador, trabajos
+from .sesion_inferencia import SesionInferencia, TIPOS
+from .recomendador import recomendar_pruebas
+from .paginacion import apaginar_por_cursor, tam_pagina
+from .catalogos import CATALOGOS
+
+
+# ==========================================
+# VISTAS ASÍNCRONAS
+# El panel, los listados y la API de inferencia por lotes son async def: con
+# un servidor ASGI (ver README) esperan a la base de datos sin ocupar un hilo
+# por petición. Todo lo que muestra la plantilla se carga antes con el ORM
+# asíncrono (listas, select_related, prefetch) y se renderiza en el bucle de
+# eventos sin pasar a otro hilo: una consulta perezosa en la plantilla lanza
+# SynchronousOnlyOperation en lugar de esconder un N+1. Con WSGI funcionan igual.
+# ==========================================
+async def _arender(request, plantilla, contexto):
+    # @login_required ya cargó el usuario con auser(); la plantilla usa ese objeto sin consultar
+    request.user = await request.auser()
+    return render(request, plantilla, contexto)
+
 
 # 1. Vista del Dashboard (Protegida con login)
 @login_required
-def dashboard_view(request):
+@solo_lectura
+async def dashboard_view(request):
     # Recopilamos datos para mostrar métricas
-    total_pacientes = Paciente.objects.count()
-    total_diagnosticos = Diagnostico.objects.count()
-    # Últimos 5 diagnósticos
-    ultimos_diagnosticos = Diagnostico.objects.select_related('paciente', 'enfermedad_diagnosticada').order_by('-fecha_diagnostico')[:5]
+    # Totales mantenidos por señales (una lectura indexada en lugar de COUNT(*))
+    totales = await contadores.aleer()
+    # Últimos 5 diagnósticos (recorren el índice de fecha); la plantilla muestra también el médico
+    ultimos_diagnosticos = [
+        d async for d in Diagnostico.objects.select_related('paciente', 'medico', 'enfermedad_diagnosticada')
+        .order_by('-fecha_diagnostico', '-id')[:5]
+    ]
 
     context = {
-        'total_pacientes': total_pacientes,
-        'total_diagnosticos': total_diagnosticos,
+        'total_pacientes': totales['pacientes'],
+        'total_diagnosticos': totales['diagnosticos'],
         'ultimos_diagnosticos': ultimos_diagnosticos
     }
-    return render(request, 'gestion/dashboard.html', context)
+    return await _arender(request, 'gestion/dashboard.html', context)
 
 
 @login_required
-def lista_medicos(request):
+@solo_lectura
+async def lista_medicos(request):
     # Filtramos usuarios que pertenecen al grupo 'Medicos'
-    medicos = User.objects.filter(groups__name='Medicos')
-    return render(request, 'gestion/lista_usuarios.html', {
+    medicos = [u async for u in User.objects.filter(groups__name='Medicos')]
+    return await _arender(request, 'gestion/lista_usuarios.html', {
         'usuarios': medicos, 
         'titulo': 'Gestión de Médicos',
         'rol': 'Médico'
@@ -38,10 +78,50 @@ def lista_medicos(request):
 
 # LISTA DE PACIENTES (Tu modelo Paciente)
 @login_required
-def lista_pacientes(request):
-    pacientes = Paciente.objects.all()
+@solo_lectura
+async def lista_pacientes(request):
+    # Paginación por cursor sobre (apellido, nombre, id): cada página cuesta lo mismo
+    pagina = await apaginar_por_cursor(
+        Paciente.objects.all(), ('apellido', 'nombre', 'id'),
+        cursor=request.GET.get('cursor', ''), tam=tam_pagina(request.GET.get('tam')),
+    )
     # Usaremos una plantilla diferente porque los campos son distintos
-    return render(request, 'gestion/lista_pacientes.html', {'pacientes': pacientes})
+    return await _arender(request, 'gestion/lista_pacientes.html', {'pacientes': pagina.objetos, 'pagina': pagina})
+
+# HISTORIA CLÍNICA: línea de tiempo del paciente (ver historial.py)
+@login_required
+def detalle_paciente(request, id):
+    paciente = get_object_or_404(Paciente, id=id)
+    return render(request, 'gestion/detalle_paciente.html', {
+        'paciente': paciente,
+        # Consulta perezosa: solo se ejecuta si el fragmento no está en caché
+        'diagnosticos': historial.diagnosticos_del_paciente(paciente.id),
+        'generacion': historial.generacion(),
+        'cache_alias': historial.alias_cache(),
+        'cache_ttl': historial.ttl_cache(),
+    })
+
+# BÚSQUEDA DE PACIENTES (índice de texto completo, ver busqueda.py)
+@login_required
+@solo_lectura
+def buscar_pacientes(request):
+    texto = request.GET.get('q', '').strip()
+    if not texto:
+        return redirect('lista_pacientes')
+    return render(request, 'gestion/lista_pacientes.html', {
+        'pacientes': busqueda.buscar_pacientes(texto),
+        'busqueda': texto,
+        'max_resultados': getattr(settings, 'BUSQUEDA_PACIENTES_MAX', 50),
+    })
+
+@login_required
+@solo_lectura
+def api_buscar_pacientes(request):
+    pacientes = busqueda.buscar_pacientes(request.GET.get('q', ''))
+    return JsonResponse({'resultados': [
+        {'id': p.id, 'nombre': p.nombre, 'apellido': p.apellido, 'email': p.email, 'telefono': p.telefono}
+        for p in pacientes
+    ]})
 
 # LISTA DE ADMINS (Solo accesible por superusuarios)
 @login_required
@@ -64,7 +144,8 @@ def crear_paciente(request):
         if form.is_valid():
             paciente = form.save(commit=False)
             paciente.creado_por = request.user # Asignamos quien lo creó
-            paciente.save()
+            with transaction.atomic():  # El alta y su contador del panel, juntos
+                paciente.save()
             messages.success(request, 'Paciente registrado correctamente.')
             return redirect('lista_pacientes')
     else:
@@ -130,9 +211,15 @@ def crear_admin(request):
 # |-----------------------CRUD ENFERMEDADES-----------------------|
 
 @login_required
-def lista_enfermedades(request):
-    enfermedades = Enfermedad.objects.all().order_by('nombre')
-    return render(request, 'gestion/lista_enfermedades.html', {'enfermedades': enfermedades})
+@solo_lectura
+async def lista_enfermedades(request):
+    # Una consulta por página más una por relación (prefetch); los totales salen de las columnas num_*
+    enfermedades = Enfermedad.objects.prefetch_related('sintomas', 'signos', 'pruebas_lab')
+    pagina = await apaginar_por_cursor(
+        enfermedades, ('nombre', 'id'),
+        cursor=request.GET.get('cursor', ''), tam=tam_pagina(request.GET.get('tam')),
+    )
+    return await _arender(request, 'gestion/lista_enfermedades.html', {'enfermedades': pagina.objetos, 'pagina': pagina})
 
 # 2. CREAR (CREATE)
 @login_required
@@ -140,7 +227,9 @@ def crear_enfermedad(request):
     if request.method == 'POST':
         form = EnfermedadForm(request.POST)
         if form.is_valid():
-            form.save()
+            # Un solo incremento de versión por el guardado y sus cuatro relaciones
+            with cambios_en_lote():
+                form.save()
             messages.success(request, 'Enfermedad registrada correctamente.')
             return redirect('lista_enfermedades')
     else:
@@ -159,7 +248,8 @@ def editar_enfermedad(request, id):
     if request.method == 'POST':
         form = EnfermedadForm(request.POST, instance=enfermedad)
         if form.is_valid():
-            form.save()
+            with cambios_en_lote():
+                form.save()
             messages.success(request, 'Enfermedad actualizada.')
             return redirect('lista_enfermedades')
     else:
@@ -185,9 +275,10 @@ def eliminar_enfermedad(request, id):
 # 1. CRUD SÍNTOMAS
 # ==========================================
 @login_required
-def lista_sintomas(request):
-    sintomas = Sintoma.objects.all().order_by('nombre')
-    return render(request, 'gestion/lista_sintomas.html', {'items': sintomas, 'tipo': 'Síntoma'})
+@solo_lectura
+async def lista_sintomas(request):
+    sintomas = [s async for s in Sintoma.objects.all().order_by('nombre')]
+    return await _arender(request, 'gestion/lista_sintomas.html', {'items': sintomas, 'tipo': 'Síntoma'})
 
 @login_required
 def crear_sintoma(request):
@@ -223,9 +314,10 @@ def eliminar_sintoma(request, id):
 # 2. CRUD SIGNOS
 # ==========================================
 @login_required
-def lista_signos(request):
-    signos = Signo.objects.all().order_by('nombre')
-    return render(request, 'gestion/lista_signos.html', {'items': signos, 'tipo': 'Signo'})
+@solo_lectura
+async def lista_signos(request):
+    signos = [s async for s in Signo.objects.all().order_by('nombre')]
+    return await _arender(request, 'gestion/lista_signos.html', {'items': signos, 'tipo': 'Signo'})
 
 @login_required
 def crear_signo(request):
@@ -261,10 +353,63 @@ def eliminar_signo(request, id):
 # 3. CRUD DIAGNÓSTICOS (El más importante)
 # ==========================================
 @login_required
-def lista_diagnosticos(request):
+@solo_lectura
+async def lista_diagnosticos(request):
     # Optimizamos la consulta con select_related para traer datos del paciente y medico en una sola query
-    diagnosticos = Diagnostico.objects.select_related('paciente', 'medico', 'enfermedad_diagnosticada').all().order_by('-fecha_diagnostico')
-    return render(request, 'gestion/lista_diagnosticos.html', {'diagnosticos': diagnosticos})
+    diagnosticos = Diagnostico.objects.select_related('paciente', 'medico', 'enfermedad_diagnosticada').all()
+    # Paginación por cursor sobre (fecha_diagnostico, id), respaldada por un índice compuesto
+    pagina = await apaginar_por_cursor(
+        diagnosticos, ('-fecha_diagnostico', '-id'),
+        cursor=request.GET.get('cursor', ''), tam=tam_pagina(request.GET.get('tam')),
+    )
+    return await _arender(request, 'gestion/lista_diagnosticos.html', {'diagnosticos': pagina.objetos, 'pagina': pagina})
+
+def _parametros_exportacion(datos):
+    # formato=csv|ndjson&desde=AAAA-MM-DD&hasta=AAAA-MM-DD&enfermedad=ID (repetible)
+    formato = datos.get('formato', 'csv')
+    if formato not in exportacion.FORMATOS:
+        raise ValueError(f'"formato" debe ser uno de: {", ".join(exportacion.FORMATOS)}.')
+    try:
+        desde = datetime.date.fromisoformat(datos['desde']) if datos.get('desde') else None
+        hasta = datetime.date.fromisoformat(datos['hasta']) if datos.get('hasta') else None
+        ids_enfermedades = [int(valor) for valor in datos.getlist('enfermedad') if valor]
+    except ValueError:
+        raise ValueError('Fechas (AAAA-MM-DD) o ids de enfermedad inválidos.')
+    return formato, desde, hasta, ids_enfermedades
+
+@login_required
+@solo_lectura
+def exportar_diagnosticos(request):
+    try:
+        formato, desde, hasta, ids_enfermedades = _parametros_exportacion(request.GET)
+    except ValueError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+
+    # Se fija ya la base de datos: el streaming se consume después de salir de @solo_lectura
+    diagnosticos = exportacion.diagnosticos_a_exportar(desde, hasta, ids_enfermedades)
+    diagnosticos = diagnosticos.using(router.db_for_read(Diagnostico))
+    # El historial nunca se arma en memoria: cada línea (o lote, bajo ASGI) se envía según se genera
+    generar = exportacion.alineas if isinstance(request, ASGIRequest) else exportacion.lineas
+    respuesta = StreamingHttpResponse(generar(diagnosticos, formato), content_type=exportacion.FORMATOS[formato])
+    nombre = f"diagnosticos_{timezone.localdate():%Y%m%d}.{formato}"
+    respuesta['Content-Disposition'] = f'attachment; filename="{nombre}"'
+    return respuesta
+
+@login_required
+@require_POST
+def exportar_diagnosticos_segundo_plano(request):
+    # Mismos parámetros que exportar_diagnosticos; el archivo lo genera procesar_trabajos
+    try:
+        formato, desde, hasta, ids_enfermedades = _parametros_exportacion(request.POST)
+    except ValueError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+    trabajo = trabajos.encolar('exportar_diagnosticos', {
+        'formato': formato,
+        'desde': desde.isoformat() if desde else None,
+        'hasta': hasta.isoformat() if hasta else None,
+        'enfermedades': ids_enfermedades,
+    }, usuario=request.user)
+    return JsonResponse(_trabajo_json(trabajo), status=202)
 
 @login_required
 def crear_diagnostico(request):
@@ -273,8 +418,10 @@ def crear_diagnostico(request):
         if form.is_valid():
             diagnostico = form.save(commit=False)
             diagnostico.medico = request.user  # ASIGNACIÓN AUTOMÁTICA DEL MÉDICO
-            diagnostico.save()
-            form.save_m2m() # Importante cuando hay ManyToMany en commit=False
+            # Diagnóstico, síntomas y los contadores que actualizan las señales, en una transacción
+            with transaction.atomic():
+                diagnostico.save()
+                form.save_m2m() # Importante cuando hay ManyToMany en commit=False
             messages.success(request, 'Diagnóstico registrado exitosamente.')
             return redirect('lista_diagnosticos')
     else:
@@ -308,10 +455,22 @@ def eliminar_diagnostico(request, id):
 # ==========================================
 # 1. MOTOR DE INFERENCIA
 # ==========================================
+METODO_POR_DEFECTO = getattr(settings, 'INFERENCIA_METODO', 'coincidencia')
+
+
+def _rankear(base, ids_sintomas, ids_signos, limite, metodo):
+    # 'coincidencia': proporción de criterios de la enfermedad presentes (con caché)
+    # 'bayes': probabilidad estimada con el historial de diagnósticos
+    if metodo == 'bayes':
+        return bayes.rankear(ids_sintomas, limite=limite)
+    return cache_inferencia.rankear(base, ids_sintomas, ids_signos, limite=limite)
+
+
 @login_required
 def motor_inferencia(request):
     resultado = None
     diagnostico_sugerido = []
+    pruebas_discriminantes = []
 
     if request.method == 'POST':
         form = InferenciaForm(request.POST)
@@ -323,42 +482,28 @@ def motor_inferencia(request):
             # Convertimos a sets (conjuntos) para hacer operaciones matemáticas rápidas
             ids_sintomas_input = set(s.id for s in sintomas_input)
             ids_signos_input = set(s.id for s in signos_input)
-            
-            todas_enfermedades = Enfermedad.objects.prefetch_related('sintomas', 'signos')
-
-            ranking = []
 
             # 2. EL ALGORITMO DE PREDICCIÓN
-            for enfermedad in todas_enfermedades:
-                # Obtenemos los IDs de los síntomas/signos reales de la enfermedad
-                ids_sintomas_reales = set(s.id for s in enfermedad.sintomas.all())
-                ids_signos_reales = set(s.id for s in enfermedad.signos.all())
-
-                # Unión de características de la enfermedad (El total de puntos posibles)
-                total_caracteristicas_enfermedad = len(ids_sintomas_reales) + len(ids_signos_reales)
-
-                if total_caracteristicas_enfermedad > 0:
-                    # Intersección: ¿Cuántos coinciden?
-                    coincidencias_sintomas = len(ids_sintomas_input.intersection(ids_sintomas_reales))
-                    coincidencias_signos = len(ids_signos_input.intersection(ids_signos_reales))
-                    
-                    total_coincidencias = coincidencias_sintomas + coincidencias_signos
-
-                    # Cálculo de Probabilidad (Simple Ratio)
-                    # Fórmula: (Coincidencias / Total de la Enfermedad) * 100
-                    porcentaje = (total_coincidencias / total_caracteristicas_enfermedad) * 100
-                    
-                    # Solo agregamos si hay alguna coincidencia relevante (>0%)
-                    if porcentaje > 0:
-                        ranking.append({
-                            'enfermedad': enfermedad,
-                            'porcentaje': round(porcentaje, 1),
-                            'coincidencias': total_coincidencias,
-                            'total_items': total_caracteristicas_enfermedad
-                        })
-
-            # 3. Ordenamos de mayor a menor probabilidad
-            diagnostico_sugerido = sorted(ranking, key=lambda x: x['porcentaje'], reverse=True)
+            # Snapshot en memoria de la base de conocimiento (solo se consulta su versión).
+            # El backend (INFERENCIA_BACKEND) solo devuelve enfermedades con al menos una coincidencia
+            # Las combinaciones repetidas se sirven desde la caché de rankings
+            base = obtener_base()
+            ranking = _rankear(
+                base, ids_sintomas_input, ids_signos_input,
+                limite=getattr(settings, 'INFERENCIA_MAX_RESULTADOS', None),
+                metodo=form.cleaned_data['metodo'] or METODO_POR_DEFECTO,
+            )
+
+            # 3. Registros compactos (nombre, coincidencias, pruebas) armados desde el snapshot:
+            # la página se renderiza sin consultas extra, sin importar cuántas enfermedades coincidan
+            diagnostico_sugerido = base.resultados(ranking, ids_sintomas_input, ids_signos_input)
+
+            # 4. Pruebas que mejor distinguen entre las candidatas más probables
+            n_candidatas = getattr(settings, 'INFERENCIA_CANDIDATOS_DISCRIMINAR', 10)
+            pruebas_discriminantes = recomendar_pruebas(
+                base, [fila[0] for fila in ranking[:n_candidatas]],
+                incluir_postmortem=form.cleaned_data['caso_fatal'],
+            )
             resultado = True
 
     else:
@@ -367,5 +512,340 @@ def motor_inferencia(request):
     return render(request, 'gestion/motor_inferencia.html', {
         'form': form,
         'resultado': resultado,
-        'diagnostico_sugerido': diagnostico_sugerido
-    })
\ No newline at end of file
+        'diagnostico_sugerido': diagnostico_sugerido,
+        'pruebas_discriminantes': pruebas_discriminantes,
+    })
+
+# ==========================================
+# 2. API JSON: INFERENCIA POR LOTES
+# Recibe muchos casos {sintomas: [...], signos: [...]} en una sola petición.
+# La base de conocimiento se obtiene una vez para todo el lote.
+# ==========================================
+def _lista_ids(valor):
+    if valor is None:
+        return []
+    if not isinstance(valor, list):
+        raise ValueError
+    return [int(v) for v in valor]
+
+
+def _resultado_json(resultado):
+    return {
+        'enfermedad_id': resultado.enfermedad_id,
+        'enfermedad': resultado.nombre,
+        'porcentaje': resultado.porcentaje,
+        'coincidencias': resultado.coincidencias,
+        'total_items': resultado.total_items,
+    }
+
+
+def _inferir_lote(entradas, limite, min_score, metodo):
+    base = obtener_base()
+    resultados = []
+    for ids_sintomas, ids_signos in entradas:
+        # El ranking viene ordenado: el filtro por puntuación conserva el top-k
+        ranking = [fila for fila in _rankear(base, ids_sintomas, ids_signos, limite, metodo) if fila[1] >= min_score]
+        resultados.append({
+            'diagnosticos': [_resultado_json(r) for r in base.resultados(ranking, ids_sintomas, ids_signos)]
+        })
+    return base.version, resultados
+
+
+@login_required
+@require_POST
+async def api_inferencia_lote(request):
+    try:
+        datos = json.loads(request.body)
+        casos = datos['casos']
+        if not isinstance(casos, list):
+            raise ValueError
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Se esperaba un JSON con la lista "casos".'}, status=400)
+
+    max_casos = getattr(settings, 'INFERENCIA_LOTE_MAX_CASOS', 1000)
+    if len(casos) > max_casos:
+        return JsonResponse({'error': f'Máximo {max_casos} casos por petición.'}, status=400)
+
+    try:
+        limite = datos.get('limit')
+        limite = int(limite) if limite is not None else None
+        min_score = float(datos.get('min_score') or 0)
+        metodo = datos.get('metodo') or METODO_POR_DEFECTO
+        if metodo not in METODOS:
+            raise ValueError
+        if limite is not None and limite < 1:
+            raise ValueError
+        entradas = [(_lista_ids(caso.get('sintomas')), _lista_ids(caso.get('signos'))) for caso in casos]
+    except (ValueError, TypeError, AttributeError):
+        return JsonResponse({'error': 'Parámetros inválidos: "limit", "min_score", "metodo" o ids de un caso.'}, status=400)
+
+    # El ranking es CPU sobre el snapshot (y consultas en 'bayes'): fuera del bucle de eventos
+    version, resultados = await sync_to_async(_inferir_lote)(entradas, limite, min_score, metodo)
+    return JsonResponse({'version': version, 'resultados': resultados})
+
+# ==========================================
+# 3. API JSON: SESIÓN DE INFERENCIA INCREMENTAL
+# La página del motor llama a estos endpoints cada vez que se marca o desmarca
+# una casilla; el servidor actualiza los contadores del paciente actual.
+# ==========================================
+def _respuesta_sesion(request, sesion, caso_fatal=False):
+    sesion.guardar(request.session)
+    base = sesion.base
+    ranking = sesion.ranking(limite=getattr(settings, 'INFERENCIA_MAX_RESULTADOS', None))
+    n_candidatas = getattr(settings, 'INFERENCIA_CANDIDATOS_DISCRIMINAR', 10)
+    pruebas = recomendar_pruebas(base, [fila[0] for fila in ranking[:n_candidatas]], incluir_postmortem=caso_fatal)
+    diagnosticos = []
+    for resultado in base.resultados(ranking, sesion.seleccion['sintoma'], sesion.seleccion['signo']):
+        item = _resultado_json(resultado)
+        item['sintomas_coincidentes'] = list(resultado.sintomas_coincidentes)
+        item['signos_coincidentes'] = list(resultado.signos_coincidentes)
+        item['pruebas_lab'] = list(resultado.pruebas_lab)
+        diagnosticos.append(item)
+    return JsonResponse({
+        'version': base.version,
+        'diagnosticos': diagnosticos,
+        'pruebas_discriminantes': [
+            {'tipo': p.tipo, 'id': p.prueba_id, 'nombre': p.nombre, 'enfermedades': list(p.enfermedades)}
+            for p in pruebas
+        ],
+    })
+
+
+@login_required
+@require_POST
+def api_sesion_inferencia_reiniciar(request):
+    try:
+        datos = json.loads(request.body or '{}')
+        ids_sintomas = _lista_ids(datos.get('sintomas'))
+        ids_signos = _lista_ids(datos.get('signos'))
+        caso_fatal = bool(datos.get('caso_fatal', False))
+    except (ValueError, TypeError, AttributeError):
+        return JsonResponse({'error': 'Se esperaban las listas "sintomas" y "signos".'}, status=400)
+
+    return _respuesta_sesion(request, SesionInferencia(obtener_base(), ids_sintomas, ids_signos), caso_fatal)
+
+
+@login_required
+@require_POST
+def api_sesion_inferencia_alternar(request):
+    try:
+        datos = json.loads(request.body)
+        tipo = datos['tipo']
+        caracteristica_id = int(datos['id'])
+        activo = bool(datos.get('activo', True))
+        caso_fatal = bool(datos.get('caso_fatal', False))
+        if tipo not in TIPOS:
+            raise ValueError
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': 'Se esperaba {"tipo": "sintoma"|"signo", "id": n, "activo": bool}.'}, status=400)
+
+    sesion = SesionInferencia.desde_sesion(request.session, obtener_base())
+    sesion.alternar(tipo, caracteristica_id, activo)
+    return _respuesta_sesion(request, sesion, caso_fatal)
+
+
+# ==========================================
+# 4. API JSON: BÚSQUEDA EN CATÁLOGOS (typeahead de los formularios)
+# Se responde desde el índice de prefijos en memoria del snapshot: solo se
+# consulta la versión de la base de conocimiento.
+# ==========================================
+@login_required
+def api_catalogo_buscar(request, catalogo):
+    if catalogo not in CATALOGOS:
+        return JsonResponse({'error': f'Catálogo desconocido: {catalogo}.'}, status=404)
+    try:
+        limite = min(int(request.GET.get('limit', 20)), 100)
+        if limite < 1:
+            raise ValueError
+    except ValueError:
+        return JsonResponse({'error': 'Parámetro "limit" inválido.'}, status=400)
+
+    indice = obtener_base().indice_catalogo(catalogo)
+    return JsonResponse({'resultados': [
+        {'id': item_id, 'nombre': nombre}
+        for item_id, nombre in indice.buscar(request.GET.get('q', ''), limite)
+    ]})
+
+
+# ==========================================
+# 5. ANALÍTICA DE DIAGNÓSTICOS
+# La página y sus endpoints JSON leen solo los resúmenes diarios
+# (ver analitica.py); nunca agregan sobre la tabla de diagnósticos.
+# ==========================================
+def _parametros_analitica(request):
+    # ?desde=AAAA-MM-DD&hasta=AAAA-MM-DD&top=N; lanza ValueError con el mensaje para el cliente
+    desde, hasta = analitica.rango_por_defecto(getattr(settings, 'ANALITICA_DIAS', 30))
+    try:
+        if request.GET.get('hasta'):
+            hasta = datetime.date.fromisoformat(request.GET['hasta'])
+        if request.GET.get('desde'):
+            desde = datetime.date.fromisoformat(request.GET['desde'])
+        elif request.GET.get('hasta'):
+            desde = hasta - datetime.timedelta(days=getattr(settings, 'ANALITICA_DIAS', 30) - 1)
+    except ValueError:
+        raise ValueError('Las fechas deben tener el formato AAAA-MM-DD.')
+    if desde > hasta:
+        raise ValueError('"desde" no puede ser posterior a "hasta".')
+    if (hasta - desde).days >= getattr(settings, 'ANALITICA_RANGO_MAX_DIAS', 731):
+        raise ValueError('El rango de fechas es demasiado amplio.')
+    try:
+        top = int(request.GET.get('top', 10))
+        if not 1 <= top <= 50:
+            raise ValueError
+    except ValueError:
+        raise ValueError('Parámetro "top" inválido (1-50).')
+    return desde, hasta, top
+
+
+@login_required
+def analitica_view(request):
+    return render(request, 'gestion/analitica.html', {
+        'agrupaciones': analitica.AGRUPACIONES,
+        'periodos': analitica.PERIODOS,
+    })
+
+
+@login_required
+@solo_lectura
+def api_analitica_diagnosticos(request):
+    agrupar = request.GET.get('agrupar', 'enfermedad')
+    periodo = request.GET.get('periodo', 'dia')
+    if agrupar not in analitica.AGRUPACIONES:
+        return JsonResponse({'error': f'"agrupar" debe ser uno de: {", ".join(analitica.AGRUPACIONES)}.'}, status=400)
+    if periodo not in analitica.PERIODOS:
+        return JsonResponse({'error': f'"periodo" debe ser uno de: {", ".join(analitica.PERIODOS)}.'}, status=400)
+    try:
+        desde, hasta, top = _parametros_analitica(request)
+    except ValueError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+
+    datos = analitica.serie_diagnosticos(desde, hasta, agrupar, periodo, top)
+    return JsonResponse({'desde': desde.isoformat(), 'hasta': hasta.isoformat(),
+                         'agrupar': agrupar, 'periodo': periodo, **datos})
+
+
+@login_required
+@solo_lectura
+def api_analitica_sintomas(request):
+    try:
+        desde, hasta, top = _parametros_analitica(request)
+    except ValueError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+
+    return JsonResponse({'desde': desde.isoformat(), 'hasta': hasta.isoformat(),
+                         'sintomas': analitica.sintomas_frecuentes(desde, hasta, top)})
+
+
+# ==========================================
+# 6. MÉTRICAS (Prometheus)
+# Sin @login_required: el scraper se autentica con METRICAS['TOKEN'];
+# desde el navegador, cualquier usuario staff.
+# ==========================================
+def metricas_prometheus(request):
+    _, _, token = metricas.configuracion()
+    con_token = bool(token) and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+    if not (con_token or request.user.is_staff):
+        return HttpResponse('Acceso denegado.', status=403, content_type='text/plain; charset=utf-8')
+    return HttpResponse(metricas.registro.exposicion() + metricas.exposicion_cache_inferencia(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+# ==========================================
+# 7. PERFILES DE PETICIONES (solo staff, ver perfilador.py)
+# ==========================================
+@login_required
+def lista_perfiles(request):
+    if not request.user.is_staff:
+        return redirect('dashboard')
+    vista = request.GET.get('vista') or None
+    capturas = perfilador.capturas()
+    return render(request, 'gestion/perfiles.html', {
+        'capturas': perfilador.mas_lentas(limite=50, vista=vista),
+        'vistas': sorted({c['vista'] for c in capturas}),
+        'vista': vista,
+        'config': perfilador.configuracion(),
+    })
+
+
+@login_required
+def descargar_perfil(request, id_captura):
+    if not request.user.is_staff:
+        return redirect('dashboard')
+    ruta = perfilador.ruta_archivo(id_captura)
+    if ruta is None:
+        raise Http404
+    return FileResponse(open(ruta, 'rb'), as_attachment=True, filename=ruta.name)
+
+
+@login_required
+def perfil_agregado(request):
+    # Pilas plegadas de todas las capturas de una vista, listas para flamegraph.pl / speedscope
+    if not request.user.is_staff:
+        return redirect('dashboard')
+    vista = request.GET.get('vista', '')
+    response = HttpResponse(perfilador.pilas_agregadas(vista), content_type='text/plain; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{slugify(vista) or "perfil"}.collapsed"'
+    return response
+
+
+# ==========================================
+# 8. TRABAJOS EN SEGUNDO PLANO (ver trabajos.py)
+# La interfaz consulta /trabajos/api/<id>/ cada pocos segundos hasta que el
+# trabajo termina. Cada usuario ve sus trabajos; el staff, todos.
+# ==========================================
+def _trabajos_visibles(usuario):
+    return Trabajo.objects.all() if usuario.is_staff else Trabajo.objects.filter(creado_por=usuario)
+
+
+def _trabajo_json(trabajo):
+    datos = {
+        'id': trabajo.id,
+        'tipo': trabajo.tipo,
+        'estado': trabajo.estado,
+        'avance': trabajo.avance,
+        'total': trabajo.total,
+        'porcentaje': round(100 * trabajo.avance / trabajo.total, 1) if trabajo.total else None,
+        'mensaje': trabajo.mensaje,
+        'intentos': trabajo.intentos,
+        'max_intentos': trabajo.max_intentos,
+        # Solo la última línea de la traza: el detalle completo queda en la base de datos
+        'error': trabajo.error.strip().splitlines()[-1] if trabajo.error.strip() else None,
+        'resultado': trabajo.resultado,
+        'creado': trabajo.creado.isoformat(),
+        'iniciado': trabajo.iniciado.isoformat() if trabajo.iniciado else None,
+        'terminado': trabajo.terminado.isoformat() if trabajo.terminado else None,
+        'url': reverse('api_trabajo', args=[trabajo.id]),
+    }
+    if trabajo.tipo == 'exportar_diagnosticos' and trabajo.estado == Trabajo.COMPLETADO:
+        datos['descarga'] = reverse('descargar_trabajo', args=[trabajo.id])
+    return datos
+
+
+@login_required
+def api_trabajo(request, id):
+    trabajo = get_object_or_404(_trabajos_visibles(request.user), id=id)
+    return JsonResponse(_trabajo_json(trabajo))
+
+
+@login_required
+def api_trabajos(request):
+    # ?estado=pendiente|en_curso|completado|fallido
+    recientes = _trabajos_visibles(request.user).order_by('-id')
+    estado = request.GET.get('estado')
+    if estado:
+        if estado not in dict(Trabajo.ESTADOS):
+            return JsonResponse({'error': f'"estado" debe ser uno de: {", ".join(dict(Trabajo.ESTADOS))}.'}, status=400)
+        recientes = recientes.filter(estado=estado)
+    return JsonResponse({'trabajos': [_trabajo_json(t) for t in recientes[:50]]})
+
+
+@login_required
+def descargar_trabajo(request, id):
+    trabajo = get_object_or_404(
+        _trabajos_visibles(request.user), id=id, tipo='exportar_diagnosticos', estado=Trabajo.COMPLETADO
+    )
+    ruta = trabajos.archivo_exportacion(trabajo)
+    if not ruta.exists():
+        raise Http404
+    nombre = f"diagnosticos_{timezone.localdate(trabajo.terminado):%Y%m%d}.{trabajo.parametros.get('formato', 'csv')}"
+    return FileResponse(open(ruta, 'rb'), as_attachment=True, filename=nombre,
+                        content_type=exportacion.FORMATOS[trabajo.parametros.get('formato', 'csv')])